@@ -1,3 +1,35 @@
 from django.test import TestCase
+from core.testing import QueryBudgetMixin
+from users.models import User
+from .models import Company
 
-# Create your tests here.
+
+class CompanyAdminQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Max SQL queries for the company admin, independent of tenant count"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user(
+            'admin1', company=cls.company, is_staff=True, is_superuser=True
+        )
+    
+    def setUp(self):
+        self.client.force_login(self.admin)
+    
+    def grow_companies(self, size):
+        existing = Company.objects.count()
+        Company.objects.bulk_create([
+            Company(name=f'Farm {index}') for index in range(existing, size + 1)
+        ])
+    
+    def test_admin_changelist(self):
+        self.assertQueryBudget(
+            6, lambda: self.client.get('/admin/companies/company/'), self.grow_companies
+        )
+    
+    def test_admin_change_form(self):
+        self.assertQueryBudget(
+            6, lambda: self.client.get(f'/admin/companies/company/{self.company.pk}/change/'),
+            self.grow_companies
+        )
@@ -0,0 +1,48 @@
+"""
+MySQL backend that takes its connections from a per-process pool (core.dbpool).
+
+Configure the pool with the POOL entry of the database settings: SIZE,
+MAX_LIFETIME, PING_AFTER, TIMEOUT and LEAK_AFTER (seconds). Run it with
+CONN_MAX_AGE = 0: Django then "closes" the connection at the end of every
+request, which hands it back to the pool, and the next request on any
+thread reuses it without a handshake.
+"""
+from functools import partial
+from django.db.backends.mysql import base
+from core.dbpool import PoolExhausted, get_pool
+
+Database = base.Database
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    
+    @property
+    def pool(self):
+        settings_dict = self.settings_dict
+        # The test runner points NAME at the test database: that is another pool
+        key = (self.alias,) + tuple(settings_dict[name] for name in ('HOST', 'PORT', 'NAME', 'USER'))
+        options = {name.lower(): value for name, value in settings_dict.get('POOL', {}).items()}
+        return get_pool(key, partial(super().get_new_connection, self.get_connection_params()), **options)
+    
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.acquire()
+        except PoolExhausted as e:
+            raise Database.OperationalError(str(e))
+    
+    def init_connection_state(self):
+        # Session settings stay with a pooled connection: set them once, when it is opened
+        if getattr(self.connection, 'session_initialised', False):
+            return
+        super().init_connection_state()
+        self.connection.session_initialised = True
+    
+    def _close(self):
+        if self.connection is None:
+            return
+        # Closed inside atomic(): its transaction may still be open, so it isn't handed on
+        reusable = self.autocommit and not self.in_atomic_block
+        if reusable and self.errors_occurred:
+            reusable = self.is_usable()
+        with self.wrap_database_errors:
+            self.pool.release(self.connection, reusable)
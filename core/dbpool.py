@@ -0,0 +1,249 @@
+"""
+Bounded pool of raw database connections, shared by the threads of a process.
+
+The database is a hosted MySQL reached over the internet: opening a
+connection costs a TCP and TLS handshake, authentication and the
+init_command, several round trips before the first query. The pooled backend
+(core.db_backends.mysql) takes connections from here instead of opening
+them, and hands them back when Django closes them at the end of a request.
+
+- At most `size` connections are open; a thread that finds none free waits
+  up to `timeout` seconds, then gets `PoolExhausted`.
+- A connection idle for more than `ping_after` seconds is pinged before it
+  is handed out (pre-ping); a dead one is dropped and the next one tried.
+- Connections older than `max_lifetime` are closed instead of reused, well
+  before the server's wait_timeout or a proxy drops them.
+- A connection held for more than `leak_after` seconds is logged once with
+  the code that took it; one held by a thread that has exited is closed and
+  its slot reclaimed.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from core.querylog import call_site
+
+logger = logging.getLogger('core.dbpool')
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool around `connect()`, which opens one raw DB-API connection"""
+    
+    def __init__(self, connect, size=10, max_lifetime=1800, ping_after=1, timeout=10, leak_after=30):
+        self.connect = connect
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.timeout = timeout
+        self.leak_after = leak_after
+        self.pid = os.getpid()
+        self._lock = threading.Condition()
+        # (connection, opened at, last released at), most recently used last
+        self._idle = deque()
+        # id(connection) -> [connection, opened at, checked out at, thread, call site, reported]
+        self._in_use = {}
+        # Slots reserved by threads opening or pinging a connection
+        self._pending = 0
+        # Threads waiting for a connection, in arrival order
+        self._waiting = deque()
+        self._swept_at = 0
+        self.counters = dict.fromkeys([
+            'checkouts', 'connects', 'reuses', 'ping_failures', 'expired',
+            'timeouts', 'leaks_reported', 'leaks_reclaimed',
+        ], 0)
+        self.wait_seconds = 0
+        self.connect_seconds = 0
+    
+    def acquire(self):
+        """A healthy connection, reused when possible. Raises PoolExhausted after `timeout`"""
+        deadline = time.monotonic() + self.timeout
+        # Only the call site is kept for leak reports, not the whole stack
+        site = call_site() if self.leak_after else ''
+        with self._lock:
+            self.counters['checkouts'] += 1
+        while True:
+            connection, opened_at, stale = self._reserve(deadline)
+            # Network round trips (connect, ping) happen outside the lock, in the reserved slot
+            try:
+                if connection is None:
+                    started = time.monotonic()
+                    connection = self.connect()
+                    opened_at = time.monotonic()
+                    counter = 'connects'
+                elif stale and not self._ping(connection):
+                    self._discard(connection)
+                    connection, counter = None, 'ping_failures'
+                else:
+                    counter = 'reuses'
+            except BaseException:
+                with self._lock:
+                    self._pending -= 1
+                    self._lock.notify_all()
+                raise
+            
+            with self._lock:
+                self._pending -= 1
+                self.counters[counter] += 1
+                if connection is None:
+                    self._lock.notify_all()
+                    continue
+                if counter == 'connects':
+                    self.connect_seconds += opened_at - started
+                self._in_use[id(connection)] = [
+                    connection, opened_at, time.monotonic(), threading.current_thread(), site, False
+                ]
+            return connection
+    
+    def _reserve(self, deadline):
+        """
+        Reserve a slot: (idle connection, opened at, needs a ping), or
+        (None, None, False) to open a new one. Idle connections past their
+        lifetime are closed on the way. Threads that had to wait are served
+        first come, first served.
+        """
+        with self._lock:
+            started = time.monotonic()
+            ticket = None
+            while True:
+                # An exhausted pool looks for leaked slots before anyone waits
+                self._sweep(time.monotonic(), force=self.open >= self.size)
+                if not self._waiting or self._waiting[0] is ticket:
+                    reserved = self._take()
+                    if reserved is not None:
+                        if ticket is not None:
+                            self._waiting.popleft()
+                            self._lock.notify_all()
+                        self.wait_seconds += time.monotonic() - started
+                        return reserved
+                
+                if ticket is None:
+                    ticket = object()
+                    self._waiting.append(ticket)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    self._lock.notify_all()
+                    self.counters['timeouts'] += 1
+                    raise PoolExhausted(f'No database connection free after {self.timeout}s (pool size {self.size})')
+                self._lock.wait(remaining)
+    
+    def _take(self):
+        """An idle connection or a free slot, reserved; None when the pool is exhausted"""
+        while self._idle:
+            connection, opened_at, released_at = self._idle.pop()
+            now = time.monotonic()
+            if now - opened_at > self.max_lifetime:
+                self.counters['expired'] += 1
+                self._discard(connection)
+                continue
+            self._pending += 1
+            return connection, opened_at, now - released_at > self.ping_after
+        if self.open < self.size:
+            self._pending += 1
+            return None, None, False
+        return None
+    
+    def release(self, connection, reusable=True):
+        """Give a connection back; it is closed instead if not reusable or past its lifetime"""
+        with self._lock:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is None:
+                # Reclaimed as a leak in the meantime, or from another pool
+                self._discard(connection)
+                return
+            now = time.monotonic()
+            if not reusable or now - entry[1] > self.max_lifetime:
+                if reusable:
+                    self.counters['expired'] += 1
+                self._discard(connection)
+            else:
+                self._idle.append((connection, entry[1], now))
+            self._lock.notify_all()
+    
+    def _sweep(self, now, force=False):
+        """Report long-held connections and reclaim those of exited threads (at most once a second unless forced)"""
+        if not self.leak_after or (now - self._swept_at < 1 and not force):
+            return
+        self._swept_at = now
+        for key, entry in list(self._in_use.items()):
+            connection, _, checked_out_at, thread, site, reported = entry
+            if not thread.is_alive():
+                del self._in_use[key]
+                self.counters['leaks_reclaimed'] += 1
+                logger.warning('Reclaimed database connection of exited thread %s, taken at %s', thread.name, site)
+                self._discard(connection)
+            elif not reported and now - checked_out_at > self.leak_after:
+                entry[5] = True
+                self.counters['leaks_reported'] += 1
+                logger.warning(
+                    'Database connection held for %.0fs by thread %s, taken at %s',
+                    now - checked_out_at, thread.name, site
+                )
+    
+    @staticmethod
+    def _ping(connection):
+        try:
+            connection.ping()
+            return True
+        except Exception:
+            return False
+    
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+    
+    @property
+    def open(self):
+        return len(self._idle) + len(self._in_use) + self._pending
+    
+    def close_idle(self):
+        """Close every idle connection (shutdown, or after the server restarted)"""
+        with self._lock:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+    
+    def stats(self):
+        """Sizes and counters since the process started, for readiness and the benchmark"""
+        with self._lock:
+            now = time.monotonic()
+            self._sweep(now)
+            held = [now - entry[2] for entry in self._in_use.values()]
+            counters = self.counters
+            return dict(
+                counters,
+                size=self.size,
+                open=self.open,
+                idle=len(self._idle),
+                in_use=len(self._in_use),
+                waiting=len(self._waiting),
+                longest_held_s=round(max(held, default=0), 2),
+                avg_wait_ms=round(self.wait_seconds / counters['checkouts'] * 1000, 3) if counters['checkouts'] else 0,
+                avg_connect_ms=round(self.connect_seconds / counters['connects'] * 1000, 2) if counters['connects'] else 0,
+            )
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, **options):
+    """
+    The process's pool for `key`, created on first use. A forked child
+    (gunicorn worker) never reuses its parent's pool: the sockets would be
+    shared between processes.
+    """
+    pool = _pools.get(key)
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or pool.pid != os.getpid():
+                pool = _pools[key] = ConnectionPool(connect, **options)
+    return pool
@@ -0,0 +1,156 @@
+"""
+In-process change feed for the server-sent events endpoint.
+
+Views publish stock changes, new orders and soft-deletes once their
+transaction commits; every open `/events/` connection of the same company
+gets a copy. The broker is a local stand-in for an external pub/sub: it
+only fans out inside one ASGI process, so run the SSE endpoint on the same
+workers that handle writes (or swap the broker for Redis pub/sub).
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+HEARTBEAT_SECONDS = 15
+QUEUE_SIZE = 100
+
+
+class Subscriber:
+    """One open SSE connection: a bounded queue fed from any thread"""
+    
+    def __init__(self, company_id, loop):
+        self.company_id = company_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    
+    def put(self, message):
+        # Runs on the subscriber's event loop. A consumer that fell this far
+        # behind gets its backlog replaced by a single resync hint.
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = 'event: resync\ndata: {}\n\n'
+        self.queue.put_nowait(message)
+
+
+class EventBroker:
+    """Fan out events to the subscribers of a company"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._ids = itertools.count(1)
+    
+    def subscribe(self, company_id):
+        subscriber = Subscriber(company_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[company_id].add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.company_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.company_id]
+    
+    def publish(self, company_id, event, data):
+        """Thread-safe: may be called from sync views or the event loop"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(company_id, ()))
+        if not subscribers:
+            return
+        
+        message = f'id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data)}\n\n'
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.put, message)
+            except RuntimeError:
+                # The connection's loop is gone
+                self.unsubscribe(subscriber)
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'companies': len(self._subscribers),
+                'connections': sum(len(subs) for subs in self._subscribers.values()),
+                'queued': sum(sub.queue.qsize() for subs in self._subscribers.values() for sub in subs),
+            }
+
+
+broker = EventBroker()
+
+
+def publish_on_commit(company_id, event, data):
+    """Publish once the surrounding transaction commits (immediately outside one)"""
+    transaction.on_commit(lambda: broker.publish(company_id, event, data))
+
+
+@sync_to_async
+def _user_from_session(session_key):
+    from django.contrib.auth import get_user
+    engine = import_module(settings.SESSION_ENGINE)
+    user = get_user(SimpleNamespace(session=engine.SessionStore(session_key)))
+    return user if user.is_authenticated else None
+
+
+async def _send_plain(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def sse_application(scope, receive, send):
+    """ASGI app for GET /events/: stream the logged-in user's company events"""
+    if scope['method'] != 'GET':
+        return await _send_plain(send, 405, b'Method not allowed')
+    
+    cookies = SimpleCookie()
+    for name, value in scope['headers']:
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    session = cookies.get(settings.SESSION_COOKIE_NAME)
+    user = await _user_from_session(session.value) if session else None
+    if user is None:
+        return await _send_plain(send, 403, b'Authentication required')
+    
+    subscriber = broker.subscribe(user.company_id)
+    
+    async def stream():
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                message = ': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': message.encode(), 'more_body': True})
+    
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+    
+    tasks = [asyncio.ensure_future(stream()), asyncio.ensure_future(disconnected())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,106 @@
+"""
+Index usage check for the hot tenant queries.
+
+Every list screen filters by company first; `HOT_QUERIES` pairs each of
+those queries with the composite index it is meant to run on. `check()`
+EXPLAINs them on the configured database and reports the index the planner
+actually chose, so a migration that drops an index (or a queryset change
+that stops matching one) is caught before it reaches production.
+`manage.py check_indexes` runs it and fails on a miss.
+"""
+import re
+from datetime import timedelta
+from django.db import connections
+from django.utils import timezone
+
+
+def product_list(company):
+    from products.models import Product
+    return Product.objects.for_company(company).active()
+
+
+def dashboard(company):
+    from products.models import Product
+    return Product.objects.for_company(company)
+
+
+def low_stock(company):
+    from products.views import ForecastService
+    return ForecastService.low_stock(company, 14)
+
+
+def product_sync(company):
+    from orders.views import SyncCursor
+    from products.models import Product
+    return SyncCursor.changed(Product.objects.for_company(company), 'last_updated_at', None, timezone.now())
+
+
+def order_range(company):
+    from orders.views import OrderArchiveService
+    now = timezone.now()
+    return OrderArchiveService.orders_for(company, now - timedelta(days=30), now)[0]
+
+
+def order_sync(company):
+    from orders.models import Order
+    from orders.views import SyncCursor
+    return SyncCursor.changed(Order.objects.for_company(company), 'updated_at', None, timezone.now())
+
+
+def company_users(company):
+    from users.models import User
+    return User.objects.for_company(company)
+
+
+# (name, queryset builder taking a company id, model label, indexed fields)
+HOT_QUERIES = [
+    ('product list', product_list, 'products.Product', ['company', 'is_active', 'created_at']),
+    ('dashboard', dashboard, 'products.Product', ['company', 'created_at']),
+    ('low stock', low_stock, 'products.Product', ['company', 'days_until_stockout']),
+    ('product sync', product_sync, 'products.Product', ['company', 'last_updated_at', 'id']),
+    ('orders by date', order_range, 'orders.Order', ['created_by', 'created_at']),
+    ('order sync', order_sync, 'orders.Order', ['created_by', 'updated_at', 'id']),
+    ('company users', company_users, 'users.User', ['company', 'username']),
+]
+
+
+def index_name(model_label, fields):
+    """Name of the Meta.indexes entry of a model covering exactly `fields`"""
+    from django.apps import apps
+    model = apps.get_model(model_label)
+    for index in model._meta.indexes:
+        if list(index.fields) == list(fields):
+            return index.name
+    raise LookupError(f'{model_label} has no index on ({", ".join(fields)})')
+
+
+def explain(queryset, using='default'):
+    """
+    (plan text, indexes used). MySQL names the chosen index in the `key`
+    column; other backends (SQLite, PostgreSQL) only in the plan text.
+    """
+    connection = connections[using]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        header = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+    plan = '\n'.join(' | '.join('' if value is None else str(value) for value in row) for row in rows)
+    if 'key' in header:
+        position = header.index('key')
+        return plan, {row[position] for row in rows if row[position]}
+    return plan, None
+
+
+def check(company=1, using='default'):
+    """One (name, expected index, used, plan) per hot query; `used` is False on a miss"""
+    results = []
+    for name, build, model_label, fields in HOT_QUERIES:
+        expected = index_name(model_label, fields)
+        plan, indexes = explain(build(company).using(using), using)
+        if indexes is None:
+            used = re.search(rf'\b{re.escape(expected)}\b', plan) is not None
+        else:
+            used = expected in indexes
+        results.append((name, expected, used, plan))
+    return results
@@ -0,0 +1,142 @@
+"""
+In-process sampling profiler.
+
+A superuser switches it on for a window of seconds from /admin/profiler/;
+only the worker process that served that request is profiled. While it
+runs, a background thread reads every request thread's stack each
+PROFILER_INTERVAL_MS. `ProfilerMiddleware` tells it which view each
+thread is running, so samples are attributed to e.g. OrderCreateAPIView or
+IndexView. The result is collapsed stacks
+("view;frame;frame count" lines), the input format of flamegraph.pl and
+speedscope. When switched off the middleware costs two attribute reads.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.utils import timezone
+from core.querylog import view_name
+
+_PROJECT_DIR = str(settings.BASE_DIR) + os.sep
+_SITE_PACKAGES = 'site-packages' + os.sep
+
+
+class SamplingProfiler:
+    """Collect collapsed stacks of request threads for a time window"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._labels = {}
+        self.views = {}
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.until = 0
+        self.interval = 0
+    
+    @property
+    def active(self):
+        return time.monotonic() < self.until
+    
+    def start(self, seconds, interval_ms):
+        """Start a new window (dropping the previous results) unless one is running"""
+        with self._lock:
+            if self.active:
+                return False
+            self.stacks = Counter()
+            self.samples = 0
+            self.interval = interval_ms / 1000
+            self.started_at = timezone.now()
+            self.until = time.monotonic() + seconds
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+    
+    def stop(self):
+        self.until = 0
+    
+    def _run(self):
+        while self.active:
+            self.sample()
+            time.sleep(self.interval)
+    
+    def sample(self):
+        """Record the stack of every thread currently serving a request, except the caller"""
+        own = threading.get_ident()
+        frames = sys._current_frames()
+        for ident, view in list(self.views.items()):
+            frame = frames.get(ident)
+            if frame is None or ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self.label(frame.f_code))
+                frame = frame.f_back
+            stack.append(view)
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+    
+    def label(self, code):
+        """module path:function for a code object, cached"""
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if _SITE_PACKAGES in filename:
+                filename = filename.split(_SITE_PACKAGES, 1)[1]
+            elif filename.startswith(_PROJECT_DIR):
+                filename = filename[len(_PROJECT_DIR):]
+            label = self._labels[code] = f'{filename}:{code.co_name}'
+        return label
+    
+    def collapsed(self):
+        """The samples as collapsed stack lines, heaviest first"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+    
+    def top_views(self):
+        """(view, samples) pairs, busiest first"""
+        views = Counter()
+        for stack, count in self.stacks.items():
+            views[stack.split(';', 1)[0]] += count
+        return views.most_common()
+
+
+profiler = SamplingProfiler()
+
+
+class ProfilerMiddleware:
+    """Tell the profiler which view the current thread runs while a window is open"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            view = profiler.views.pop(threading.get_ident(), None) if profiler.views else None
+        if view is not None and getattr(response, 'streaming', False):
+            # Exports format their rows while the server iterates the response
+            response.streaming_content = self.attributed(response.streaming_content, view)
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if profiler.active:
+            profiler.views[threading.get_ident()] = view_name(request)
+    
+    @staticmethod
+    def attributed(content, view):
+        ident = threading.get_ident()
+        chunks = iter(content)
+        while True:
+            if profiler.active:
+                profiler.views[ident] = view
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                profiler.views.pop(ident, None)
+            yield chunk
@@ -0,0 +1,198 @@
+"""
+Slow query sampler.
+
+`SlowQueryMiddleware` wraps every query of a request in a timer. A query
+slower than SLOW_QUERY_MS is recorded with its normalised SQL, the view that
+ran it and the innermost project frame that issued it; a sample of them
+(SLOW_QUERY_EXPLAIN_RATE) is also EXPLAINed. Fast queries only pay for two
+clock reads. Samples live in a bounded in-process ring buffer
+(SLOW_QUERY_BUFFER_SIZE), so each worker keeps its own recent history.
+"""
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+_PROJECT_DIR = str(settings.BASE_DIR) + os.sep
+_THIS_FILE = os.path.abspath(__file__)
+# Shared plumbing (serializers, middleware): attribute its queries to the caller
+_CORE_DIR = 'core' + os.sep
+_ORM_DIR = os.path.join('django', 'db', '')
+
+
+def normalize_sql(sql):
+    """Strip literals and collapse IN lists so the same statement always looks the same"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def call_site():
+    """
+    Where the query came from, as path:line in function: the innermost frame
+    in an app (orders, products, users, admin modules), else in core, else
+    the library code outside the ORM (e.g. django/contrib/admin for changelists)
+    """
+    fallback = library = ''
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_PROJECT_DIR) and 'site-packages' not in filename:
+            path = os.path.relpath(filename, _PROJECT_DIR)
+            site = f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+            if not path.startswith(_CORE_DIR):
+                return site
+            if filename != _THIS_FILE:
+                fallback = fallback or site
+        elif not library and 'site-packages' in filename and _ORM_DIR not in filename:
+            path = filename.split('site-packages' + os.sep, 1)[1]
+            library = f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return fallback or library
+
+
+def view_name(request):
+    """Admin URL name or view class/function name of the resolved view"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return request.path
+    if match.namespace == 'admin':
+        return match.view_name
+    view_class = getattr(match.func, 'view_class', None)
+    if view_class is not None:
+        return view_class.__name__
+    return getattr(match.func, '__name__', match._func_path)
+
+
+class SlowQueryLog:
+    """Bounded, thread-safe ring buffer of slow query samples"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = None
+    
+    def record(self, entry):
+        with self._lock:
+            if self._entries is None:
+                self._entries = deque(maxlen=settings.SLOW_QUERY_BUFFER_SIZE)
+            self._entries.append(entry)
+    
+    def entries(self):
+        """Recorded samples, newest first"""
+        with self._lock:
+            return list(reversed(self._entries or ()))
+    
+    def summary(self):
+        """One row per normalised statement, slowest total time first"""
+        groups = {}
+        for entry in self.entries():
+            group = groups.setdefault(entry['sql'], {
+                'sql': entry['sql'], 'count': 0, 'total_ms': 0, 'max_ms': 0,
+                'views': set(), 'call_sites': set()
+            })
+            group['count'] += 1
+            group['total_ms'] += entry['duration_ms']
+            group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+            group['views'].add(entry['view'])
+            group['call_sites'].add(entry['call_site'])
+        return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+    
+    def clear(self):
+        with self._lock:
+            if self._entries is not None:
+                self._entries.clear()
+
+
+slow_queries = SlowQueryLog()
+
+
+class QuerySampler:
+    """Execute wrapper installed on the connection for the duration of one request"""
+    
+    def __init__(self, request, threshold_ms, explain_rate):
+        self.request = request
+        self.threshold = threshold_ms / 1000
+        self.explain_rate = explain_rate
+        self.explaining = False
+    
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        if duration >= self.threshold:
+            self.record(sql, params, many, context, duration)
+        return result
+    
+    def record(self, sql, params, many, context, duration):
+        explain = ''
+        if not many and self.explain_rate and random.random() < self.explain_rate:
+            explain = self.explain(context['connection'], sql, params)
+        slow_queries.record({
+            'at': timezone.now(),
+            'duration_ms': round(duration * 1000, 2),
+            'sql': normalize_sql(sql),
+            'view': view_name(self.request),
+            'call_site': call_site(),
+            'explain': explain,
+        })
+    
+    def explain(self, db, sql, params):
+        """EXPLAIN a SELECT as the database saw it; other statements are left alone"""
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return ''
+        self.explaining = True
+        try:
+            with db.cursor() as cursor:
+                cursor.execute(f'{db.ops.explain_query_prefix()} {sql}', params)
+                header = [column[0] for column in cursor.description or ()]
+                rows = cursor.fetchall()
+        except DatabaseError as e:
+            return f'EXPLAIN failed: {e}'
+        finally:
+            self.explaining = False
+        lines = [' | '.join(header)] if header else []
+        lines += [' | '.join('' if value is None else str(value) for value in row) for row in rows]
+        return '\n'.join(lines)
+
+
+class SlowQueryMiddleware:
+    """Sample the slow queries of every request into `slow_queries`"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        sampler = QuerySampler(request, settings.SLOW_QUERY_MS, settings.SLOW_QUERY_EXPLAIN_RATE)
+        with connection.execute_wrapper(sampler):
+            response = self.get_response(request)
+        if getattr(response, 'streaming', False):
+            # Exports run their queries while the server iterates the response
+            response.streaming_content = self.sampled(response.streaming_content, sampler)
+        return response
+    
+    @staticmethod
+    def sampled(content, sampler):
+        # The wrapper is installed only while a chunk is produced, never across a yield
+        chunks = iter(content)
+        while True:
+            with connection.execute_wrapper(sampler):
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+            yield chunk
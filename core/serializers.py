@@ -0,0 +1,121 @@
+import decimal
+from rest_framework import fields, relations
+from rest_framework.settings import api_settings
+
+# DRF fields whose to_representation returns database values unchanged
+PASSTHROUGH_FIELDS = (
+    fields.BooleanField,
+    fields.CharField,
+    fields.ChoiceField,
+    fields.IntegerField,
+    fields.ReadOnlyField,
+    relations.PrimaryKeyRelatedField,
+)
+
+
+def decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.decimal_places is None:
+        return field.to_representation
+    
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    
+    def convert(value):
+        if value is None:
+            return ''
+        return '{:f}'.format(value.quantize(exponent, rounding=field.rounding, context=context))
+    
+    return convert
+
+
+def datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != fields.ISO_8601 or field_timezone is None:
+        return field.to_representation
+    
+    def convert(value):
+        if not value:
+            return None
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    
+    return convert
+
+
+def converter_for(field):
+    if isinstance(field, fields.DecimalField):
+        return decimal_converter(field)
+    if isinstance(field, fields.DateTimeField):
+        return datetime_converter(field)
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path that produces the same JSON as a ModelSerializer
+    without running DRF's per-field machinery for every row.
+    
+    Field names, lookups and converters (Decimal, datetimes) are resolved
+    once from the serializer's declared fields. `serialize` reads plain
+    values_list() tuples; `serialize_objects` reads already loaded instances.
+    """
+    
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._columns = None
+    
+    @property
+    def columns(self):
+        # Built lazily: DRF fields need the app registry
+        if self._columns is None:
+            columns = []
+            for name, field in self.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                attrs = list(field.source_attrs)
+                if isinstance(field, relations.PrimaryKeyRelatedField):
+                    # read the raw foreign key instead of loading the object
+                    attrs[-1] += '_id'
+                lookup = '__'.join(field.source_attrs)
+                columns.append((name, lookup, attrs, converter_for(field)))
+            self._columns = columns
+        return self._columns
+    
+    def serialize(self, queryset):
+        """List of dicts for a queryset, read with a single values_list() query"""
+        columns = self.columns
+        names = [name for name, _, _, _ in columns]
+        converters = [
+            (index, convert) for index, (_, _, _, convert) in enumerate(columns) if convert is not None
+        ]
+        rows = queryset.values_list(*(lookup for _, lookup, _, _ in columns))
+        
+        data = []
+        for row in rows:
+            row = list(row)
+            for index, convert in converters:
+                if row[index] is not None:
+                    row[index] = convert(row[index])
+            data.append(dict(zip(names, row)))
+        return data
+    
+    def serialize_objects(self, objects):
+        """List of dicts for model instances that are already in memory"""
+        data = []
+        for obj in objects:
+            item = {}
+            for name, _, attrs, convert in self.columns:
+                value = obj
+                for attr in attrs:
+                    value = getattr(value, attr, None)
+                    if value is None:
+                        break
+                item[name] = convert(value) if convert is not None and value is not None else value
+            data.append(item)
+        return data
@@ -51,6 +51,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.querylog.SlowQueryMiddleware',
+    'core.profiler.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -76,12 +78,26 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # django.db.backends.mysql with a per-process connection pool (core/dbpool.py)
+        'ENGINE': 'core.db_backends.mysql',
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT', default='3306'),
+        # Hand the connection back to the pool after every request; the pool
+        # keeps it open and pings it before reuse after an idle period
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', default=0)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            # Connections per process, shared by its threads
+            'SIZE': int(os.environ.get('DB_POOL_SIZE', default=10)),
+            # Seconds; below the server's wait_timeout
+            'MAX_LIFETIME': int(os.environ.get('DB_POOL_MAX_LIFETIME', default=1800)),
+            'PING_AFTER': float(os.environ.get('DB_POOL_PING_AFTER', default=1)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', default=10)),
+            'LEAK_AFTER': float(os.environ.get('DB_POOL_LEAK_AFTER', default=60)),
+        },
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
             'charset': 'utf8mb4',
@@ -155,3 +171,47 @@ LOGGING = {
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Order archive: orders older than this many days are moved to ArchivedOrder
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', default=365))
+
+# Purge: soft-deleted products inactive this many days are removed for good
+PRODUCT_PURGE_AFTER_DAYS = int(os.environ.get('PRODUCT_PURGE_AFTER_DAYS', default=90))
+
+# Processes used to validate CSV order uploads; 1 validates inside the web worker
+ORDER_IMPORT_WORKERS = int(os.environ.get('ORDER_IMPORT_WORKERS', default=1))
+
+# Processes used to hash passwords in bulk user imports
+USER_IMPORT_WORKERS = int(os.environ.get('USER_IMPORT_WORKERS', default=os.cpu_count() or 1))
+
+# Most passwords one /api/users/import/ request may hash. Hashing is slow on
+# purpose (~0.14s each): 100 keep the request well under GUNICORN_TIMEOUT;
+# larger imports go through `manage.py import_users`
+USER_IMPORT_MAX_PASSWORDS = int(os.environ.get('USER_IMPORT_MAX_PASSWORDS', default=100))
+
+# Reservations: pending orders hold their stock this long before expiring
+ORDER_RESERVATION_MINUTES = int(os.environ.get('ORDER_RESERVATION_MINUTES', default=15))
+
+# Live updates: the index page subscribes to /events/ only when this is True.
+# The stream is served by the ASGI entry point and fans out in-process, so only
+# enable it when web runs under an ASGI server (the gunicorn WSGI workers 404 it)
+LIVE_EVENTS = os.environ.get('LIVE_EVENTS', default='False') == 'True'
+
+# /readyz reports not ready once this many live events wait for slow clients
+READYZ_MAX_EVENT_BACKLOG = int(os.environ.get('READYZ_MAX_EVENT_BACKLOG', default=10000))
+
+# Slow query sampler: queries over SLOW_QUERY_MS are kept (last SLOW_QUERY_BUFFER_SIZE
+# per worker) and this fraction of them is EXPLAINed; browse them at /admin/slow-queries/
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', default=200))
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_RATE', default=0.1))
+SLOW_QUERY_BUFFER_SIZE = int(os.environ.get('SLOW_QUERY_BUFFER_SIZE', default=500))
+
+# Sampling profiler (/admin/profiler/): stack sampling interval and longest window
+PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', default=10))
+PROFILER_MAX_SECONDS = int(os.environ.get('PROFILER_MAX_SECONDS', default=300))
+
+# Stock forecasting: weight of an ordered unit in a product's consumption rate
+# halves every this many days; /api/products/low-stock/ lists products expected
+# to run out within LOW_STOCK_DAYS
+STOCK_RATE_HALF_LIFE_DAYS = float(os.environ.get('STOCK_RATE_HALF_LIFE_DAYS', default=7))
+LOW_STOCK_DAYS = float(os.environ.get('LOW_STOCK_DAYS', default=14))
@@ -0,0 +1,86 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin that pins the number of SQL queries a view may run.
+    
+    Each check runs the request at every size in `sizes` and fails (listing
+    the captured queries) when the budget is exceeded or when the count grows
+    with the number of rows, which is what an N+1 looks like.
+    """
+    sizes = (1, 5, 20)
+    
+    def assertQueryBudget(self, budget, make_request, grow):
+        """
+        budget: max queries per request
+        make_request(): performs the request and returns the response
+            (service calls without a response count as successful)
+        grow(size): brings the data the view reads up to `size` rows
+        """
+        counts = []
+        for size in self.sizes:
+            grow(size)
+            with CaptureQueriesContext(connection) as context:
+                response = make_request()
+                # Streaming responses only hit the database while being consumed
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+            
+            status_code = getattr(response, 'status_code', 200)
+            self.assertLess(status_code, 400, f'{status_code} at {size} row(s)')
+            queries = [query['sql'] for query in context.captured_queries]
+            if len(queries) > budget:
+                self.fail(
+                    f'{len(queries)} queries at {size} row(s), budget is {budget}:\n'
+                    + '\n'.join(queries)
+                )
+            counts.append((size, queries))
+        
+        (first_size, first), (last_size, last) = counts[0], counts[-1]
+        if len(last) > len(first):
+            self.fail(
+                f'Query count grows with row count: {len(first)} at {first_size} row(s), '
+                f'{len(last)} at {last_size} row(s):\n' + '\n'.join(last)
+            )
+
+
+def _sqlite_concurrency(sender, connection, **kwargs):
+    """WAL (readers don't block the writer) and writers queued on the busy timeout"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+    # A deferred BEGIN that reads first fails at once with "database is locked"
+    # when it later needs the write lock; BEGIN IMMEDIATE takes it up front and
+    # waits for it (Django 4.1 has no setting for the transaction mode)
+    connection._start_transaction_under_autocommit = lambda: connection.cursor().execute('BEGIN IMMEDIATE')
+
+
+@contextmanager
+def throwaway_databases(busy_timeout=30):
+    """
+    Test databases for the load and benchmark commands. SQLite gets a
+    temporary file in WAL mode with a busy timeout and serialized write
+    transactions instead of the default shared in-memory database, whose
+    table locks fail concurrent requests with "database table is locked"
+    instead of making them wait.
+    """
+    directory = tempfile.TemporaryDirectory()
+    for conn in connections.all():
+        if conn.vendor == 'sqlite':
+            conn.settings_dict['TEST']['NAME'] = os.path.join(directory.name, f'{conn.alias}.sqlite3')
+            conn.settings_dict['OPTIONS'].setdefault('timeout', busy_timeout)
+    connection_created.connect(_sqlite_concurrency)
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        connection_created.disconnect(_sqlite_concurrency)
+        directory.cleanup()
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from rest_framework.serializers import ModelSerializer
+from core.testing import QueryBudgetMixin
+from companies.models import Company
+from orders.models import Cart, Order
+from orders.serializers import OrderSerializer
+from orders.views import OrderService
+from products.models import Product
+from products.serializers import ProductSerializer
+from users.models import User
+from .dbpool import ConnectionPool, PoolExhausted
+from .events import broker
+from .indexes import check
+from .profiler import profiler
+from .serializers import ValuesSerializer
+from .querylog import slow_queries
+from .views import MigrationState
+from .warmup import WARMUP_STEPS, warm
+
+
+class ProbeQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Health probes run every few seconds: they must stay (nearly) query-free"""
+    
+    def grow_companies(self, size):
+        existing = Company.objects.count()
+        Company.objects.bulk_create([
+            Company(name=f'Farm {index}') for index in range(existing, size)
+        ])
+    
+    def test_healthz(self):
+        self.assertQueryBudget(0, lambda: self.client.get('/healthz'), self.grow_companies)
+    
+    def test_readyz(self):
+        # Once migrations are known to be applied, only the ping remains
+        MigrationState.pending()
+        response = self.client.get('/readyz')
+        self.assertEqual(response.json()['status'], 'ok')
+        self.assertQueryBudget(1, lambda: self.client.get('/readyz'), self.grow_companies)
+
+
+@override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_EXPLAIN_RATE=1)
+class SlowQueryLogTests(QueryBudgetMixin, TestCase):
+    """With a zero threshold every query is sampled; the admin page itself stays cheap"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user(
+            'admin1', company=cls.company, role='admin', is_staff=True, is_superuser=True
+        )
+        Product.objects.create(company=cls.company, name='Layer Feed', price='9.99', stock=10)
+    
+    def setUp(self):
+        slow_queries.clear()
+        self.client.force_login(self.admin)
+    
+    def test_samples_view_and_call_site(self):
+        self.client.get('/api/products/')
+        entries = [entry for entry in slow_queries.entries() if entry['view'] == 'ProductListAPIView']
+        product_query = next(entry for entry in entries if 'products_product' in entry['sql'])
+        self.assertTrue(product_query['call_site'].startswith('products/'), product_query['call_site'])
+        self.assertTrue(product_query['explain'])
+        
+        response = self.client.get('/admin/slow-queries/?format=csv')
+        self.assertIn('ProductListAPIView', response.content.decode())
+    
+    def test_streamed_export(self):
+        product = Product.objects.get()
+        OrderService.process_order(product, 1, self.admin)
+        slow_queries.clear()
+        
+        response = self.client.get('/api/orders/export/')
+        export_queries = lambda: [
+            entry for entry in slow_queries.entries()
+            if entry['view'] == 'OrderExportAPIView' and 'orders_order' in entry['sql']
+        ]
+        # The order rows are read while the body is iterated, after the middleware returned
+        self.assertEqual(export_queries(), [])
+        b''.join(response.streaming_content)
+        entries = export_queries()
+        self.assertEqual(len(entries), 1)
+        self.assertTrue(entries[0]['call_site'].startswith('orders/'), entries[0]['call_site'])
+        self.assertTrue(entries[0]['explain'])
+    
+    def test_admin_page(self):
+        self.client.get('/api/products/')
+        # Session and user: the samples come from memory
+        with self.settings(SLOW_QUERY_MS=200):
+            self.assertQueryBudget(2, lambda: self.client.get('/admin/slow-queries/'), lambda size: None)
+
+
+class ProfilerTests(QueryBudgetMixin, TestCase):
+    """Samples are attributed to the view a thread runs and download as collapsed stacks"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user(
+            'admin1', company=cls.company, role='admin', is_staff=True, is_superuser=True
+        )
+    
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.addCleanup(profiler.stop)
+    
+    def test_collapsed_stacks(self):
+        self.client.post('/admin/profiler/', {'seconds': 60})
+        self.assertTrue(profiler.active)
+        profiler.stop()
+        
+        # Sample this thread from another one, as the profiler thread does
+        profiler.views[threading.get_ident()] = 'OrderCreateAPIView'
+        sampler = threading.Thread(target=profiler.sample)
+        sampler.start()
+        sampler.join()
+        del profiler.views[threading.get_ident()]
+        
+        response = self.client.get('/admin/profiler/?format=collapsed')
+        line = response.content.decode().splitlines()[0]
+        self.assertTrue(line.startswith('OrderCreateAPIView;'))
+        self.assertIn('core/tests.py:test_collapsed_stacks', line)
+        self.assertTrue(line.endswith(' 1'))
+    
+    def test_admin_page(self):
+        self.assertQueryBudget(2, lambda: self.client.get('/admin/profiler/'), lambda size: None)
+
+
+class WarmupTests(TestCase):
+    """The preloading master runs every warmup step; a renamed template must not break startup"""
+    
+    def test_warm(self):
+        self.assertEqual([name for name, _ in warm()], [name for name, _ in WARMUP_STEPS])
+
+
+class IndexUsageTests(TestCase):
+    """Every hot tenant query plans onto its composite index"""
+    
+    def test_hot_queries_use_their_index(self):
+        for name, expected, used, plan in check():
+            if name == 'product list' and connection.vendor == 'sqlite':
+                # SQLite gets a bare "is_active" predicate (MySQL gets "is_active = 1"),
+                # so it can only use the (company, created_at) prefix
+                self.assertIn('product_company_created', plan)
+                continue
+            self.assertTrue(used, f'{name}: expected {expected}\n{plan}')
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+    
+    def ping(self):
+        if not self.alive:
+            raise OSError('gone away')
+    
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(TestCase):
+    """Connections are reused, bounded, health-checked, retired and reclaimed"""
+    
+    def test_reuse_and_pre_ping(self):
+        pool = ConnectionPool(FakeConnection, size=2, ping_after=0)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        pool.release(first)
+        
+        first.alive = False
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        stats = pool.stats()
+        self.assertEqual((stats['connects'], stats['reuses'], stats['ping_failures']), (2, 1, 1))
+    
+    def test_bounded_with_max_lifetime(self):
+        pool = ConnectionPool(FakeConnection, size=1, timeout=0.05, max_lifetime=0)
+        connection = pool.acquire()
+        with self.assertRaises(PoolExhausted):
+            pool.acquire()
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['open'], 0)
+    
+    def test_reclaims_connection_of_exited_thread(self):
+        pool = ConnectionPool(FakeConnection, size=1, timeout=0.05, leak_after=30)
+        leaker = threading.Thread(target=pool.acquire)
+        leaker.start()
+        leaker.join()
+        with self.assertLogs('core.dbpool', 'WARNING'):
+            pool.release(pool.acquire())
+        self.assertEqual(pool.stats()['leaks_reclaimed'], 1)
+
+
+class LiveEventTests(TestCase):
+    """Writes reach the /events/ subscribers of their company once they commit"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.other = Company.objects.create(name='Golden Egg Productions')
+        cls.admin = User.objects.create_user('admin1', company=cls.company, role='admin')
+        cls.product = Product.objects.create(company=cls.company, name='Layer Feed', price=Decimal('9.99'), stock=10)
+    
+    def setUp(self):
+        # Subscribers live on an event loop; it runs only to deliver what was published
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+    
+    def subscribe(self, company):
+        async def subscribe():
+            return broker.subscribe(company.id)
+        subscriber = self.loop.run_until_complete(subscribe())
+        self.addCleanup(broker.unsubscribe, subscriber)
+        return subscriber
+    
+    def received(self, subscriber):
+        self.loop.run_until_complete(asyncio.sleep(0))
+        events = []
+        while not subscriber.queue.empty():
+            message = subscriber.queue.get_nowait()
+            fields = dict(line.split(': ', 1) for line in message.splitlines() if line)
+            events.append((fields['event'], json.loads(fields['data'])))
+        return events
+    
+    def test_published_on_commit_to_own_company(self):
+        own, other = self.subscribe(self.company), self.subscribe(self.other)
+        with self.captureOnCommitCallbacks() as callbacks:
+            order = OrderService.process_order(self.product, 3, self.admin)
+            self.assertEqual(self.received(own), [])
+        
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.received(own), [
+            ('stock', {'product': self.product.id, 'stock': 7}),
+            ('order', {'id': order.id, 'product': self.product.id, 'quantity': 3, 'status': 'pending'}),
+        ])
+        self.assertEqual(self.received(other), [])
+    
+    def test_rolled_back_write_not_published(self):
+        own = self.subscribe(self.company)
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                OrderService.process_order(self.product, 3, self.admin)
+                raise RuntimeError('rolled back')
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.received(own), [])
+    
+    def test_index_page_subscribes_only_when_served(self):
+        self.client.force_login(self.admin)
+        self.assertNotContains(self.client.get('/'), 'EventSource')
+        with self.settings(LIVE_EVENTS=True):
+            self.assertContains(self.client.get('/'), "new EventSource('/events/')")
+
+
+class ValuesSerializerTests(TestCase):
+    """The fast path returns exactly what the ModelSerializer returns"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user('admin1', company=cls.company, role='admin')
+        cls.products = [
+            Product.objects.create(company=cls.company, name='Layer Feed', price=Decimal('9.9'), stock=10,
+                                   consumption_rate=1.25, days_until_stockout=8.0),
+            # No forecast yet
+            Product.objects.create(company=cls.company, name='Egg Trays', price=Decimal('0.05'), stock=5),
+        ]
+        moment = datetime(2026, 3, 1, 9, 30, 15, 123456, tzinfo=dt_timezone(timedelta(hours=2)))
+        cart = Cart.objects.create(created_by=cls.admin, total=Decimal('29.70'))
+        cls.orders = [
+            Order.objects.create(product=cls.products[0], quantity=3, created_by=cls.admin, cart=cart,
+                                 status='success', shipped_at=moment),
+            Order.objects.create(product=cls.products[1], quantity=1, created_by=cls.admin,
+                                 reserved_until=moment.replace(microsecond=0)),
+        ]
+        # The second order loses its user (SET_NULL), its product is soft-deleted
+        Order.objects.filter(pk=cls.orders[1].pk).update(created_by=None)
+        Product.objects.filter(pk=cls.products[1].pk).update(is_active=False, stock=0)
+    
+    def assertSameOutput(self, serializer_class, queryset):
+        expected = json.loads(json.dumps(serializer_class(queryset, many=True).data))
+        fast = ValuesSerializer(serializer_class)
+        self.assertEqual(fast.serialize(queryset), expected)
+        self.assertEqual(fast.serialize_objects(list(queryset)), expected)
+    
+    def test_products(self):
+        self.assertSameOutput(ProductSerializer, Product.objects.order_by('id'))
+    
+    def test_orders(self):
+        self.assertSameOutput(OrderSerializer, Order.objects.select_related('product').order_by('id'))
+    
+    def test_null_foreign_keys(self):
+        class OrderOwnerSerializer(ModelSerializer):
+            class Meta:
+                model = Order
+                fields = ['id', 'cart', 'created_by', 'line_total', 'reserved_until']
+        
+        self.assertSameOutput(OrderOwnerSerializer, Order.objects.order_by('id'))
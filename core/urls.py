@@ -17,9 +17,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth.views import LogoutView
 from products.views import index_view, create_product
-from orders.views import create_order, export_orders
+from orders.views import create_order, export_orders, DeltaSyncAPIView
+from .views import healthz, readyz, slow_query_view, profiler_view
 
 urlpatterns = [
+    path('admin/slow-queries/', slow_query_view, name='admin-slow-queries'),
+    path('admin/profiler/', profiler_view, name='admin-profiler'),
     path('admin/', admin.site.urls),
     
     path('', index_view, name='index'),
@@ -29,6 +32,11 @@ urlpatterns = [
     
     path('api/products/', include('products.urls')),
     path('api/orders/', include('orders.urls')),
+    path('api/users/', include('users.urls')),
+    path('api/sync/', DeltaSyncAPIView.as_view(), name='api-sync'),
     
     path('logout/', LogoutView.as_view(next_page='index'), name='logout'),
+    
+    path('healthz', healthz, name='healthz'),
+    path('readyz', readyz, name='readyz'),
 ]
@@ -0,0 +1,190 @@
+import csv
+import time
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.views import View
+from django.views.decorators.cache import never_cache
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from core.events import broker
+from core.profiler import profiler
+from core.querylog import slow_queries
+
+
+class MigrationState:
+    """
+    Whether every migration is applied. Building the migration graph costs
+    milliseconds, so a positive answer is cached for the life of the process
+    (new migrations only arrive with a new deploy, i.e. a new process).
+    """
+    applied = False
+    
+    @classmethod
+    def pending(cls):
+        if cls.applied:
+            return 0
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        cls.applied = not plan
+        return len(plan)
+
+
+@method_decorator(never_cache, name='dispatch')
+class HealthView(View):
+    """Liveness: the process answers requests. Touches nothing else"""
+    
+    def get(self, request):
+        return JsonResponse({'status': 'ok'})
+
+
+@method_decorator(never_cache, name='dispatch')
+class ReadinessView(View):
+    """
+    Readiness: the database answers a timed ping, all migrations are applied
+    and the live event backlog is below READYZ_MAX_EVENT_BACKLOG. The
+    database entry also carries the connection pool metrics.
+    Returns 200 or 503 with one JSON entry per check.
+    """
+    
+    def get(self, request):
+        checks = {}
+        
+        started = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            checks['database'] = {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+        except DatabaseError as e:
+            checks['database'] = {'ok': False, 'error': str(e)}
+        # Pooled backend: this worker's connection pool (sizes, reuse, waits, leaks)
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            checks['database']['pool'] = pool.stats()
+        
+        if checks['database']['ok']:
+            try:
+                pending = MigrationState.pending()
+                checks['migrations'] = {'ok': not pending, 'pending': pending}
+            except DatabaseError as e:
+                checks['migrations'] = {'ok': False, 'error': str(e)}
+        else:
+            checks['migrations'] = {'ok': False, 'error': 'database unavailable'}
+        
+        events = broker.stats()
+        checks['events'] = dict(events, ok=events['queued'] <= settings.READYZ_MAX_EVENT_BACKLOG)
+        
+        ready = all(check['ok'] for check in checks.values())
+        return JsonResponse(
+            {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+            status=200 if ready else 503
+        )
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class SlowQueryView(View):
+    """
+    Admin page for this worker's slow query samples: a per-statement summary
+    and the recent samples with their EXPLAIN. `?format=csv` downloads the
+    samples, POST clears them. Company admins and superusers only.
+    """
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_superuser and request.user.role != 'admin':
+            raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get(self, request):
+        entries = slow_queries.entries()
+        if request.GET.get('format') == 'csv':
+            return self.csv_response(entries)
+        
+        context = dict(
+            admin.site.each_context(request),
+            title='Slow queries',
+            entries=entries,
+            summary=slow_queries.summary(),
+            threshold_ms=settings.SLOW_QUERY_MS,
+            buffer_size=settings.SLOW_QUERY_BUFFER_SIZE,
+        )
+        return TemplateResponse(request, 'admin/slow_queries.html', context)
+    
+    def post(self, request):
+        slow_queries.clear()
+        return redirect('admin-slow-queries')
+    
+    @staticmethod
+    def csv_response(entries):
+        response = HttpResponse(content_type='text/csv')
+        timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+        response['Content-Disposition'] = f'attachment; filename="slow_queries_{timestamp}.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['Time', 'Duration (ms)', 'View', 'Call Site', 'SQL', 'Explain'])
+        for entry in entries:
+            writer.writerow([
+                entry['at'].isoformat(), entry['duration_ms'], entry['view'],
+                entry['call_site'], entry['sql'], entry['explain']
+            ])
+        return response
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class ProfilerView(View):
+    """
+    Admin page for this worker's sampling profiler: POST starts a window of
+    `seconds` (or stops the running one), GET shows the samples per view and
+    `?format=collapsed` downloads them as collapsed stacks. Superusers only.
+    """
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get(self, request):
+        if request.GET.get('format') == 'collapsed':
+            response = HttpResponse(profiler.collapsed(), content_type='text/plain')
+            timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+            response['Content-Disposition'] = f'attachment; filename="profile_{timestamp}.collapsed"'
+            return response
+        
+        context = dict(
+            admin.site.each_context(request),
+            title='Profiler',
+            profiler=profiler,
+            active=profiler.active,
+            views=profiler.top_views(),
+            interval_ms=settings.PROFILER_INTERVAL_MS,
+            max_seconds=settings.PROFILER_MAX_SECONDS,
+        )
+        return TemplateResponse(request, 'admin/profiler.html', context)
+    
+    def post(self, request):
+        if 'stop' in request.POST:
+            profiler.stop()
+            return redirect('admin-profiler')
+        
+        try:
+            seconds = int(request.POST.get('seconds', 30))
+        except ValueError:
+            seconds = 0
+        if not 1 <= seconds <= settings.PROFILER_MAX_SECONDS:
+            messages.error(request, f'Profile for 1 to {settings.PROFILER_MAX_SECONDS} seconds.')
+        elif profiler.start(seconds, settings.PROFILER_INTERVAL_MS):
+            messages.success(request, f'Profiling this worker for {seconds} seconds.')
+        else:
+            messages.warning(request, 'The profiler is already running on this worker.')
+        return redirect('admin-profiler')
+
+
+healthz = HealthView.as_view()
+readyz = ReadinessView.as_view()
+slow_query_view = SlowQueryView.as_view()
+profiler_view = ProfilerView.as_view()
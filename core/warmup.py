@@ -0,0 +1,148 @@
+"""
+Application warmup for preforking servers.
+
+With gunicorn's `preload_app` (see gunicorn.conf.py) the master imports the
+project once and runs `warm()` before forking: URL patterns are compiled,
+templates are parsed into the cached loader and the serializers' field maps
+are built, so every worker starts with them in (copy-on-write) memory. Each
+worker then opens its own database connection in `post_fork`; connections
+are never made in the master, which would share a socket between workers.
+
+`python -m core.warmup` prints a startup report: import cost per package and
+module (from `python -X importtime` in a fresh interpreter) and the cost of
+each warmup step.
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+# Pages a worker renders first: the dashboard and the admin screens
+TEMPLATES = [
+    'index.html',
+    'admin/base.html',
+    'admin/base_site.html',
+    'admin/index.html',
+    'admin/login.html',
+    'admin/change_list.html',
+    'admin/change_form.html',
+    'admin/delete_selected_confirmation.html',
+    'admin/slow_queries.html',
+    'admin/profiler.html',
+]
+
+_IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)')
+
+
+def warm_urls():
+    """Compile every URL pattern, including the admin's, and build the reverse map"""
+    from django.urls import get_resolver, reverse
+    resolver = get_resolver()
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        getattr(pattern, 'reverse_dict', None)
+    reverse('index')
+    reverse('admin:index')
+
+
+def warm_templates():
+    """Parse the templates into the cached loader"""
+    from django.template.loader import get_template
+    for name in TEMPLATES:
+        get_template(name)
+
+
+def warm_serializers():
+    """Build DRF field maps and the fast-path serializers' column maps"""
+    from orders.serializers import OrderSerializer, order_values_serializer
+    from products.serializers import ProductSerializer, product_values_serializer
+    for serializer_class in (OrderSerializer, ProductSerializer):
+        serializer_class().fields
+    for values_serializer in (order_values_serializer, product_values_serializer):
+        values_serializer.columns
+
+
+WARMUP_STEPS = [
+    ('urls', warm_urls),
+    ('templates', warm_templates),
+    ('serializers', warm_serializers),
+]
+
+
+def warm():
+    """Run every warmup step; returns (step, seconds) pairs"""
+    timings = []
+    for name, step in WARMUP_STEPS:
+        started = time.perf_counter()
+        step()
+        timings.append((name, time.perf_counter() - started))
+    return timings
+
+
+def warm_connection():
+    """Open this process's database connection; returns the seconds it took"""
+    from django.db import connection
+    started = time.perf_counter()
+    connection.ensure_connection()
+    elapsed = time.perf_counter() - started
+    if getattr(connection, 'pool', None) is not None:
+        # Park it in the pool, where the first request picks it up
+        connection.close()
+    return elapsed
+
+
+def import_times(targets=('core.wsgi', 'core.urls')):
+    """
+    Import `targets` (the app, then the URLconf and with it every view) in a
+    fresh interpreter with -X importtime.
+    Returns (module, self seconds, cumulative seconds) in import order.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {", ".join(targets)}'],
+        capture_output=True, text=True, env=dict(os.environ), check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            own, cumulative, module = match.groups()
+            modules.append((module, int(own) / 1e6, int(cumulative) / 1e6))
+    return modules
+
+
+def report(out=sys.stdout, top=15):
+    """Print the startup report"""
+    modules = import_times()
+    total = sum(own for _, own, _ in modules)
+    packages = {}
+    for module, own, _ in modules:
+        package = module.split('.')[0]
+        packages[package] = packages.get(package, 0) + own
+    
+    out.write(f'Imports: {len(modules)} modules, {total * 1000:.0f} ms\n\n')
+    out.write(f'{"Package":<32}{"ms":>9}\n')
+    for package, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        out.write(f'{package:<32}{seconds * 1000:>9.1f}\n')
+    
+    out.write(f'\n{"Module (with its imports)":<48}{"ms":>9}\n')
+    slowest = sorted(modules, key=lambda module: module[2], reverse=True)
+    for module, _, cumulative in slowest[:top]:
+        out.write(f'{module:<48}{cumulative * 1000:>9.1f}\n')
+    
+    started = time.perf_counter()
+    import core.wsgi  # noqa: F401
+    out.write(f'\nApplication load (this process): {(time.perf_counter() - started) * 1000:.0f} ms\n')
+    # urls includes importing the URLconf and the views behind it
+    for name, seconds in warm():
+        out.write(f'Warmup {name:<16}{seconds * 1000:>9.1f} ms\n')
+    from django.db import DatabaseError
+    try:
+        out.write(f'Warmup {"db connection":<16}{warm_connection() * 1000:>9.1f} ms\n')
+    except DatabaseError as e:
+        out.write(f'Warmup db connection failed: {e}\n')
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    report()
@@ -0,0 +1,40 @@
+"""
+gunicorn settings: the master loads and warms the app once, workers fork from it.
+
+Workers start with Django, the URLconf, compiled templates and serializer
+field maps already in memory (see core/warmup.py) and open their database
+connection before accepting requests, so restarts and new replicas don't
+put cold-start latency on the first requests.
+"""
+import os
+import time
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 3))
+# Threads per worker share the worker's database connection pool (DB_POOL_SIZE)
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+preload_app = True
+
+_started = time.perf_counter()
+
+
+def when_ready(server):
+    # The app is already imported (preload_app); warm it before the first fork
+    from core.warmup import warm
+    timings = warm()
+    server.log.info(
+        'App loaded in %.0f ms, warmup: %s',
+        (time.perf_counter() - _started) * 1000,
+        ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, seconds in timings)
+    )
+
+
+def post_fork(server, worker):
+    from django.db import DatabaseError
+    from core.warmup import warm_connection
+    try:
+        server.log.info('Worker %s: database connection in %.0f ms', worker.pid, warm_connection() * 1000)
+    except DatabaseError as e:
+        # Readiness reports it; the first request retries the connection
+        server.log.warning('Worker %s: database connection failed: %s', worker.pid, e)
@@ -1,58 +1,99 @@
 import csv
 from datetime import date
+from django import forms
 from django.contrib import admin
+from django.db import transaction
 from django.http import HttpResponse
 from django.utils import timezone
-from .models import Order
+from .models import ArchivedOrder, Cart, Order
 from products.models import Product
-from .views import OrderService
+from products.views import StockService
+from .views import HOLDS_STOCK, OrderService
+
+
+class OrderAdminForm(forms.ModelForm):
+    """Rejects an edit the product's stock can't cover (new orders are checked by Order.clean)"""
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        product, quantity = cleaned_data.get('product'), cleaned_data.get('quantity')
+        if self.instance.pk and product and quantity:
+            deltas = OrderService.stock_deltas(
+                self.initial, product.id, quantity, cleaned_data.get('status', self.instance.status)
+            )
+            if -deltas.get(product.id, 0) > product.stock:
+                raise forms.ValidationError(f'Insufficient stock. Available: {product.stock}')
+        return cleaned_data
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'product', 'quantity', 'status', 'created_by', 'created_at', 'shipped_at']
+    form = OrderAdminForm
+    list_display = ['id', 'product', 'quantity', 'unit_price', 'line_total', 'status', 'created_by', 'created_at', 'shipped_at']
     list_filter = ['status', 'created_at', 'product__company']
     search_fields = ['product__name', 'created_by__username']
-    readonly_fields = ['created_by', 'created_at', 'shipped_at']
+    readonly_fields = ['cart', 'unit_price', 'line_total', 'created_by', 'created_at', 'shipped_at', 'reserved_until']
+    list_select_related = ['product__company', 'created_by__company']
     
-    actions = ['export_as_csv']
+    actions = ['export_as_csv', 'cancel_orders']
     
     def export_as_csv(self, request, queryset):
 
-        response = OrderService.generate_csv_response( orders=queryset, filename_prefix='admin_orders')
+        response = OrderService.generate_export_response(queryset, request, filename_prefix='admin_orders')
         self.message_user(request, f'{queryset.count()} order(s) exported.')
         return response
     
     export_as_csv.short_description = "Export selected orders as CSV"
     
+    def cancel_orders(self, request, queryset):
+        """Bulk action: cancel orders and return their stock (same role rules as editing)"""
+        count = OrderService.cancel(queryset, request.user)
+        self.message_user(request, f'{count} order(s) cancelled.')
+    
+    cancel_orders.short_description = "Cancel selected orders and restock"
+    
     
     def save_model(self, request, obj, form, change):
-        """Auto-fill created_by when creating new order"""
+        """
+        Auto-fill created_by when creating new order. Stock follows the
+        order through StockService (guarded update plus ledger row): a new
+        order deducts it, a quantity or product change moves the
+        difference, cancelling gives it back.
+        """
+        initial = form.initial if change else {}
         if not change:
             obj.created_by = request.user
-        super().save_model(request, obj, form, change)
+        deltas = OrderService.stock_deltas(initial, obj.product_id, obj.quantity, obj.status)
+        if not change:
+            reason = 'order'
+        elif initial.get('status') in HOLDS_STOCK and obj.status not in HOLDS_STOCK:
+            reason = 'cancellation'
+        else:
+            reason = 'adjustment'
+        
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            # Ascending ids, like every other multi-product stock change; a
+            # concurrent order taking the stock since validation raises and
+            # rolls the edit back
+            for product_id in sorted(deltas):
+                product = obj.product if product_id == obj.product_id else Product.objects.get(pk=product_id)
+                StockService.adjust(product, deltas[product_id], reason, user=request.user, order=obj)
+            if not change:
+                OrderService.notify_created(obj)
     
     def get_queryset(self, request):
         """
         Data Isolation: Users only see orders from their company.
         """
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(created_by__company=request.user.company)
+        return super().get_queryset(request).visible_to(request.user)
     
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         """
         Filter product dropdown to show only user's company products.
         """
         if db_field.name == "product":
-            if not request.user.is_superuser:
-                kwargs["queryset"] = Product.objects.filter(
-                    company=request.user.company,
-                    is_active=True
-                )
-            else:
-                kwargs["queryset"] = Product.objects.filter(is_active=True)
+            kwargs["queryset"] = Product.objects.visible_to(request.user).active().select_related('company')
         
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
     
@@ -130,3 +171,93 @@ class OrderAdmin(admin.ModelAdmin):
     def has_module_permission(self, request):
         """Allow staff users (admin/operator) to access this module"""
         return request.user.is_staff or request.user.is_superuser
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Read-only view of orders moved out of the hot table"""
+    list_display = ['id', 'product_name', 'quantity', 'line_total', 'status', 'created_by', 'created_at', 'shipped_at']
+    list_filter = ['status', 'archive_month']
+    search_fields = ['product_name', 'created_by__username']
+    list_select_related = ['created_by__company']
+    date_hierarchy = 'created_at'
+    
+    actions = ['export_as_csv']
+    
+    def export_as_csv(self, request, queryset):
+        response = OrderService.generate_export_response(queryset, request, filename_prefix='admin_archived_orders')
+        self.message_user(request, f'{queryset.count()} archived order(s) exported.')
+        return response
+    
+    export_as_csv.short_description = "Export selected orders as CSV"
+    
+    def get_queryset(self, request):
+        """
+        Data Isolation: Users only see archived orders from their company.
+        """
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(created_by__company=request.user.company)
+    
+    def has_add_permission(self, request):
+        """Orders only get here through the archive_orders command"""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+    
+    def has_module_permission(self, request):
+        """Allow staff users (admin/operator) to access this module"""
+        return request.user.is_staff or request.user.is_superuser
+
+
+class CartLineInline(admin.TabularInline):
+    model = Order
+    fields = ['id', 'product', 'quantity', 'unit_price', 'line_total', 'status']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product__company')
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    """Read-only view of multi-product carts and their lines"""
+    list_display = ['id', 'total', 'created_by', 'created_at']
+    search_fields = ['created_by__username']
+    list_select_related = ['created_by__company']
+    readonly_fields = ['total', 'created_by', 'created_at']
+    date_hierarchy = 'created_at'
+    inlines = [CartLineInline]
+    
+    def get_queryset(self, request):
+        """
+        Data Isolation: Users only see carts from their company.
+        """
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(created_by__company=request.user.company)
+    
+    def has_add_permission(self, request):
+        """Carts are placed through the order form and API"""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
+    
+    def has_module_permission(self, request):
+        """Allow staff users (admin/operator) to access this module"""
+        return request.user.is_staff or request.user.is_superuser
@@ -0,0 +1,51 @@
+"""
+Row validation for the CSV order import.
+
+This module deliberately imports nothing from Django: it runs inside
+process-pool workers, which only get the company's product catalog
+(normalised name -> product id) and never touch the database.
+"""
+
+_catalog = {}
+
+
+def product_key(name):
+    """Catalog key: product names match case-insensitively, ignoring extra spaces"""
+    return ' '.join(name.split()).casefold()
+
+
+def init_worker(catalog):
+    """Process-pool initializer: install the catalog once per worker"""
+    global _catalog
+    _catalog = catalog
+
+
+def validate_rows(rows, catalog=None):
+    """
+    Validate one chunk of (line, product name, quantity, raw row) tuples.
+    Returns (valid, errors): valid holds (line, product id, quantity),
+    errors hold (line, raw row, message).
+    """
+    catalog = _catalog if catalog is None else catalog
+    valid = []
+    errors = []
+
+    for line, name, quantity, raw in rows:
+        product_id = catalog.get(product_key(name or ''))
+        if product_id is None:
+            errors.append((line, raw, f'Unknown or inactive product: {name!r}'))
+            continue
+
+        try:
+            quantity = int((quantity or '').strip())
+        except ValueError:
+            errors.append((line, raw, f'Invalid quantity: {quantity!r}'))
+            continue
+
+        if quantity < 1:
+            errors.append((line, raw, 'Quantity must be at least 1'))
+            continue
+
+        valid.append((line, product_id, quantity))
+
+    return valid, errors
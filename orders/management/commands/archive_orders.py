@@ -0,0 +1,39 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from orders.views import OrderArchiveService
+
+
+class Command(BaseCommand):
+    help = (
+        "Move orders older than ORDER_ARCHIVE_AFTER_DAYS to the archive table in "
+        "small batches, pausing between batches so live traffic never waits on "
+        "long locks."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.2, help='Seconds to sleep between batches')
+        parser.add_argument('--max-batches', type=int, default=0, help='Stop after this many batches (0 = no limit)')
+    
+    def handle(self, *args, **options):
+        cutoff = OrderArchiveService.cutoff(options['older_than_days'])
+        total = batches = 0
+        
+        while True:
+            count = OrderArchiveService.archive_batch(cutoff, options['batch_size'])
+            if not count:
+                break
+            
+            total += count
+            batches += 1
+            self.stdout.write(f'Batch {batches}: {count} order(s) archived ({total} total)')
+            
+            if options['max_batches'] and batches >= options['max_batches']:
+                break
+            time.sleep(options['pause'])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} order(s) placed before {cutoff:%Y-%m-%d %H:%M} archived.'
+        ))
@@ -0,0 +1,74 @@
+import csv
+import io
+import os
+import time
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+from companies.models import Company
+from users.models import User
+from orders.models import Order
+from orders.views import OrderImportService
+from products.models import Product, StockMovement
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the CSV order import as validation workers scale: generates an "
+        "order sheet (with a few bad rows) and imports it into a throwaway test "
+        "database, reporting rows/s for validation alone and end to end."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--workers', type=int, nargs='+',
+                            default=sorted({1, 2, 4, os.cpu_count() or 1}))
+        parser.add_argument('--batch-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            company = Company.objects.create(name='Bench Co')
+            user = User.objects.create_user('bench', company=company, role='operator')
+            Product.objects.bulk_create([
+                Product(company=company, name=f'Product {index}', price='1.00', stock=0)
+                for index in range(options['products'])
+            ])
+            sheet = self.sheet(options['rows'], options['products'])
+            
+            for workers in options['workers']:
+                Order.objects.all().delete()
+                StockMovement.objects.all().delete()
+                Product.objects.update(stock=options['rows'])
+                self.run(sheet, user, workers, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+    
+    def sheet(self, rows, products):
+        stream = io.StringIO()
+        writer = csv.writer(stream)
+        writer.writerow(['Product', 'Quantity'])
+        for index in range(rows):
+            if index % 100 == 99:
+                writer.writerow(['No such product', 1])
+            else:
+                writer.writerow([f'product {index % products}', 1 + index % 3])
+        return stream.getvalue()
+    
+    def run(self, sheet, user, workers, options):
+        _, rows = OrderImportService.read_rows(io.StringIO(sheet))
+        started = time.perf_counter()
+        OrderImportService.validate(rows, OrderImportService.catalog(user.company), workers)
+        validate_seconds = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        _, created, errors = OrderImportService.import_csv(
+            io.StringIO(sheet), user, workers=workers, batch_size=options['batch_size']
+        )
+        total_seconds = time.perf_counter() - started
+        
+        self.stdout.write(
+            f'workers={workers:<3} validate {len(rows) / validate_seconds:10.0f} rows/s   '
+            f'end to end {len(rows) / total_seconds:8.0f} rows/s   '
+            f'({created} created, {len(errors)} rejected)'
+        )
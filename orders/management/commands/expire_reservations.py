@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from orders.views import ReservationService
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire pending orders whose reservation has lapsed and give their stock "
+        "back, in small batches. With --watch, keep sweeping every N seconds."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between batches')
+        parser.add_argument('--watch', type=float, default=0,
+                            help='Run forever, sweeping every this many seconds (0 = sweep once)')
+    
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                count = ReservationService.expire_batch(options['batch_size'])
+                if not count:
+                    break
+                total += count
+                time.sleep(options['pause'])
+            
+            if total or not options['watch']:
+                self.stdout.write(self.style.SUCCESS(f'{total} reservation(s) expired.'))
+            if not options['watch']:
+                break
+            time.sleep(options['watch'])
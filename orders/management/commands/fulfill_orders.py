@@ -0,0 +1,101 @@
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from orders.views import FulfillmentService
+
+RETRY_PAUSE = 0.2
+MAX_RETRIES = 5
+
+
+class Command(BaseCommand):
+    help = (
+        "Ship pending orders in batches: claim them, mark them shipped and send "
+        "their confirmation emails. --workers runs several claimers in parallel; "
+        "separate processes are safe too. With --watch, keep polling for new orders."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=1, help='Parallel worker threads')
+        parser.add_argument('--watch', type=float, default=0,
+                            help='Run forever, polling every this many seconds when idle (0 = drain once)')
+        parser.add_argument('--verbose-batches', action='store_true', help='Report every batch')
+    
+    def handle(self, *args, **options):
+        self.options = options
+        self.lock = threading.Lock()
+        self.batches = []
+        self.retries = 0
+        
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=self.work, args=(number,), name=f'fulfillment-{number}')
+            for number in range(1, options['workers'] + 1)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.report(time.perf_counter() - started)
+    
+    def work(self, number):
+        """One worker: ship batches until none are left (or forever with --watch)"""
+        failures = 0
+        try:
+            while True:
+                batch_started = time.perf_counter()
+                try:
+                    shipped = FulfillmentService.ship_batch(self.options['batch_size'])
+                except DatabaseError as e:
+                    # Deadlock or lock wait timeout: the batch rolled back, its orders stay pending
+                    failures += 1
+                    if failures > MAX_RETRIES:
+                        raise
+                    with self.lock:
+                        self.retries += 1
+                    self.stderr.write(f'worker {number}: batch failed ({e}), retrying')
+                    time.sleep(RETRY_PAUSE)
+                    continue
+                
+                failures = 0
+                if shipped:
+                    duration = time.perf_counter() - batch_started
+                    with self.lock:
+                        self.batches.append((number, len(shipped), duration))
+                    if self.options['verbose_batches']:
+                        self.stdout.write(
+                            f'worker {number}: {len(shipped)} shipped in {duration * 1000:.0f} ms '
+                            f'({len(shipped) / duration:.0f} orders/s)'
+                        )
+                    continue
+                
+                if not self.options['watch']:
+                    break
+                time.sleep(self.options['watch'])
+        finally:
+            connection.close()
+    
+    def report(self, elapsed):
+        shipped = sum(count for _, count, _ in self.batches)
+        if not shipped:
+            self.stdout.write(self.style.SUCCESS('No pending orders to ship.'))
+            return
+        
+        durations = sorted(duration for _, _, duration in self.batches)
+        per_worker = {}
+        for number, count, _ in self.batches:
+            per_worker[number] = per_worker.get(number, 0) + count
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'{shipped} order(s) shipped in {len(durations)} batch(es), {elapsed:.2f}s '
+            f'({shipped / elapsed:.0f} orders/s).'
+        ))
+        self.stdout.write(
+            f'Batch latency: median {durations[len(durations) // 2] * 1000:.0f} ms, '
+            f'max {durations[-1] * 1000:.0f} ms'
+        )
+        self.stdout.write('Per worker: ' + ', '.join(
+            f'{number}: {count}' for number, count in sorted(per_worker.items())
+        ) + f'; {self.retries} batch(es) retried')
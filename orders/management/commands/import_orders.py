@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from users.models import User
+from orders.views import OrderImportService
+
+
+class Command(BaseCommand):
+    help = (
+        "Import orders from a CSV file (Product, Quantity columns) for the company "
+        "of --user. Rows are validated across a process pool and committed in "
+        "batched transactions; rejected rows are written to an error CSV."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import')
+        parser.add_argument('--user', required=True, help='Username the orders are placed as')
+        parser.add_argument('--workers', type=int, default=settings.ORDER_IMPORT_WORKERS,
+                            help='Validation processes (default ORDER_IMPORT_WORKERS)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--errors', help='Where to write rejected rows (default: <path>.errors.csv)')
+    
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.select_related('company').get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}")
+        if user.role == 'viewer' or not user.company:
+            raise CommandError(f'{user.username} cannot place orders')
+        
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                header, created, errors = OrderImportService.import_csv(
+                    stream, user, workers=options['workers'], batch_size=options['batch_size']
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        
+        if errors:
+            errors_path = options['errors'] or f"{options['path']}.errors.csv"
+            with open(errors_path, 'w', encoding='utf-8', newline='') as stream:
+                OrderImportService.write_errors(stream, header, errors)
+            self.stdout.write(self.style.WARNING(f'{len(errors)} row(s) rejected, see {errors_path}'))
+        
+        self.stdout.write(self.style.SUCCESS(f'{created} order(s) imported.'))
@@ -0,0 +1,242 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from django.conf import settings
+from django.contrib.staticfiles.handlers import StaticFilesHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum
+from django.test import Client
+from django.test.testcases import LiveServerThread
+from django.test.utils import modify_settings
+from core.testing import throwaway_databases
+from companies.models import Company
+from users.models import User
+from orders.models import Order
+from products.models import Product
+from products.views import StockService
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the app on a local live server backed by a throwaway test database "
+        "and drive concurrent viewers, operators and admins against it. Reports "
+        "throughput, p50/p95/p99 latency and error rate per operation, then "
+        "checks every product for oversold stock. Fails when the error rate is "
+        "above --max-error-rate."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--viewers', type=int, default=8, help='Clients browsing the index page')
+        parser.add_argument('--operators', type=int, default=8, help='Clients placing orders')
+        parser.add_argument('--admins', type=int, default=1, help='Clients exporting orders')
+        parser.add_argument('--bulk-ratio', type=float, default=0.2,
+                            help='Share of operator requests that are bulk orders')
+        parser.add_argument('--bulk-size', type=int, default=10)
+        parser.add_argument('--products', type=int, default=20)
+        parser.add_argument('--stock', type=int, default=500, help='Initial stock per product')
+        parser.add_argument('--slots', type=int, default=0,
+                            help='Put every product in flash-sale mode with this many stock slots')
+        parser.add_argument('--max-error-rate', type=float, default=0.01,
+                            help='Share of requests per operation that may fail (5xx or no response)')
+    
+    def handle(self, *args, **options):
+        with throwaway_databases():
+            self.seed(options)
+            server = self.start_server()
+            try:
+                results, elapsed = self.drive(f'http://{server.host}:{server.port}', options)
+            finally:
+                self.stop_server(server)
+            failed = self.report(results, elapsed, options['max_error_rate'])
+            oversold = self.check_oversell(options['stock'])
+        
+        if oversold:
+            raise CommandError(f'Stock mismatch on {len(oversold)} product(s): the stock guard let orders through.')
+        if failed:
+            raise CommandError(
+                f'Error rate above {options["max_error_rate"]:.1%} for: {", ".join(failed)}. '
+                'Latencies of those operations are not meaningful.'
+            )
+    
+    # ===== Setup =====
+    def seed(self, options):
+        company = Company.objects.create(name='Load Test Farm')
+        self.users = {}
+        for role in ('viewer', 'operator', 'admin'):
+            self.users[role] = User.objects.create_user(
+                f'load_{role}', email=f'{role}@loadtest.local', company=company,
+                role=role, is_staff=role != 'viewer',
+            )
+        
+        Product.objects.bulk_create([
+            Product(company=company, name=f'Product {index}', price='9.99',
+                    stock=options['stock'], created_by=self.users['admin'])
+            for index in range(options['products'])
+        ])
+        self.product_ids = list(Product.objects.values_list('id', flat=True))
+        
+        if options['slots']:
+            for product in Product.objects.all():
+                StockService.configure_slots(product, options['slots'])
+    
+    def start_server(self):
+        # Same dance as LiveServerTestCase, for an in-memory SQLite database
+        # (throwaway_databases() puts SQLite in a file, so normally nothing to share)
+        connections_override = {
+            conn.alias: conn for conn in connections.all()
+            if conn.vendor == 'sqlite' and conn.is_in_memory_db()
+        }
+        for conn in connections_override.values():
+            conn.inc_thread_sharing()
+        
+        self.modified_settings = modify_settings(ALLOWED_HOSTS={'append': 'localhost'})
+        self.modified_settings.enable()
+        
+        server = LiveServerThread('localhost', StaticFilesHandler, connections_override=connections_override)
+        server.daemon = True
+        server.start()
+        server.is_ready.wait()
+        if server.error:
+            raise server.error
+        return server
+    
+    def stop_server(self, server):
+        server.terminate()
+        for conn in server.connections_override.values():
+            conn.dec_thread_sharing()
+        self.modified_settings.disable()
+    
+    # ===== Load =====
+    def session_cookies(self, base_url, user):
+        """Log the user in and pick up the CSRF cookie from the index page"""
+        client = Client()
+        client.force_login(user)
+        cookies = {settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value}
+        
+        with urlopen(self.request(base_url + '/', cookies)) as response:
+            for header in response.headers.get_all('Set-Cookie') or []:
+                for name, morsel in SimpleCookie(header).items():
+                    cookies[name] = morsel.value
+        return cookies
+    
+    def request(self, url, cookies, data=None):
+        headers = {'Cookie': '; '.join(f'{name}={value}' for name, value in cookies.items())}
+        if data is not None:
+            headers['Content-Type'] = 'application/json'
+            headers['X-CSRFToken'] = cookies.get(settings.CSRF_COOKIE_NAME, '')
+            data = json.dumps(data).encode()
+        return Request(url, data=data, headers=headers)
+    
+    def drive(self, base_url, options):
+        results = defaultdict(list)
+        deadline = time.perf_counter() + options['duration']
+        
+        def viewer(cookies):
+            return 'index', self.request(base_url + '/', cookies)
+        
+        def operator(cookies):
+            if random.random() < options['bulk_ratio']:
+                payload = [
+                    {'product': random.choice(self.product_ids), 'quantity': random.randint(1, 3)}
+                    for _ in range(options['bulk_size'])
+                ]
+                return 'order_bulk', self.request(base_url + '/api/orders/', cookies, payload)
+            payload = {'product': random.choice(self.product_ids), 'quantity': random.randint(1, 5)}
+            return 'order_single', self.request(base_url + '/api/orders/', cookies, payload)
+        
+        def admin(cookies):
+            return 'export', self.request(base_url + '/api/orders/export/', cookies)
+        
+        def client(role, make_request):
+            cookies = self.session_cookies(base_url, self.users[role])
+            while time.perf_counter() < deadline:
+                operation, request = make_request(cookies)
+                started = time.perf_counter()
+                try:
+                    with urlopen(request, timeout=60) as response:
+                        response.read()
+                        outcome = 'ok'
+                except HTTPError as e:
+                    # 4xx is the app saying no (e.g. out of stock), 5xx is a failure
+                    outcome = 'rejected' if e.code < 500 else 'error'
+                except Exception:
+                    outcome = 'error'
+                results[operation].append((time.perf_counter() - started, outcome))
+        
+        threads = []
+        for role, make_request in (('viewer', viewer), ('operator', operator), ('admin', admin)):
+            for _ in range(options[f'{role}s']):
+                threads.append(threading.Thread(target=client, args=(role, make_request)))
+        
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
+    
+    # ===== Report =====
+    def report(self, results, elapsed, max_error_rate):
+        """
+        One line per operation; latencies only count answered requests (an
+        error can return fast or hit the timeout). Returns the operations
+        whose error rate is above `max_error_rate`.
+        """
+        self.stdout.write(
+            f"{'operation':<14}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'rejected':>10}{'errors':>8}"
+        )
+        failed = []
+        for operation in sorted(results):
+            samples = results[operation]
+            latencies = sorted(latency for latency, outcome in samples if outcome != 'error')
+            outcomes = [outcome for _, outcome in samples]
+            error_rate = outcomes.count('error') / len(samples)
+            
+            def percentile(p):
+                if not latencies:
+                    return float('nan')
+                return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+            
+            line = (
+                f'{operation:<14}{len(samples):>9}{len(latencies) / elapsed:>9.1f}'
+                f'{percentile(0.50):>9.1f}{percentile(0.95):>9.1f}{percentile(0.99):>9.1f}'
+                f"{outcomes.count('rejected') / len(samples):>10.1%}"
+                f'{error_rate:>8.1%}'
+            )
+            if error_rate > max_error_rate:
+                failed.append(operation)
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        return failed
+    
+    def check_oversell(self, initial_stock):
+        """Compare ordered units with the stock left; returns one line per mismatched product"""
+        StockService.sync_slots()
+        ordered = dict(
+            Order.objects.filter(status__in=['pending', 'success'])
+            .values_list('product').annotate(total=Sum('quantity'))
+        )
+        
+        oversold = []
+        for product in Product.objects.all():
+            sold = ordered.get(product.id, 0)
+            if sold > initial_stock or sold + product.stock != initial_stock:
+                oversold.append(f'{product.name}: {initial_stock} initial, {sold} ordered, {product.stock} left')
+        
+        if oversold:
+            self.stdout.write(self.style.ERROR('Stock mismatch detected:'))
+            for line in oversold:
+                self.stdout.write(f'  {line}')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'No oversell: {sum(ordered.values())} unit(s) ordered across {len(self.product_ids)} product(s).'
+            ))
+        return oversold
@@ -0,0 +1,77 @@
+# Generated by Django 4.1.13 on 2026-10-19 06:10
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_prices(apps, schema_editor):
+    """
+    Snapshot the current product price onto existing orders (the best value
+    we have), in id-ordered batches that each commit on their own so the
+    tables are never locked for the whole run.
+    """
+    Product = apps.get_model('products', 'Product')
+    price = Subquery(Product.objects.filter(id=OuterRef('product_id')).values('price')[:1])
+    
+    for model_name in ('Order', 'ArchivedOrder'):
+        model = apps.get_model('orders', model_name)
+        pending = model.objects.filter(unit_price__isnull=True, product__isnull=False)
+        last_id = 0
+        while True:
+            ids = list(pending.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:BACKFILL_BATCH_SIZE])
+            if not ids:
+                break
+            model.objects.filter(id__in=ids).update(
+                unit_price=price,
+                line_total=ExpressionWrapper(
+                    F('quantity') * price,
+                    output_field=DecimalField(max_digits=14, decimal_places=2)
+                ),
+            )
+            last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    # Backfill batches commit one by one
+    atomic = False
+
+    dependencies = [
+        ('products', '0006_product_deactivated_at'),
+        ('orders', '0004_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, max_digits=14),
+        ),
+    ]
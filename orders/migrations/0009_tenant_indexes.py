@@ -0,0 +1,17 @@
+# Generated by Django 4.1.13 on 2026-10-19 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_cancelled_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_by', 'created_at'], name='order_created_by_created'),
+        ),
+    ]
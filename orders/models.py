@@ -4,21 +4,65 @@ from django.core.exceptions import ValidationError
 
 # Create your models here.
 
+class OrderQuerySet(models.QuerySet):
+    """Tenant scoping for orders, which belong to the company of the user who placed them"""
+    
+    def for_company(self, company):
+        """A company's orders, newest first (per-user (created_by, created_at) index)"""
+        return self.filter(created_by__company=company).order_by('-created_at')
+    
+    def visible_to(self, user):
+        """Everything for superusers, the user's company otherwise (ordering untouched)"""
+        if user.is_superuser:
+            return self
+        return self.filter(created_by__company=user.company)
+
+
+class Cart(models.Model):
+    """Order header: the lines (orders) placed together in one checkout"""
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL,
+                                   on_delete=models.SET_NULL,
+                                   null=True,
+                                   related_name='carts')
+    
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Cart #{self.id} - ${self.total}"
+
+
 class Order(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
         ('success', 'Success'),
         ('failed', 'Failed'),
+        ('expired', 'Expired'),
+        ('cancelled', 'Cancelled'),
     )
     
     product = models.ForeignKey( 'products.Product',
                                 on_delete=models.CASCADE,
                                 related_name='orders')
     
+    # Set when the order is one line of a multi-product cart
+    cart = models.ForeignKey('orders.Cart',
+                             on_delete=models.CASCADE,
+                             null=True, blank=True,
+                             related_name='lines')
+    
     quantity = models.PositiveIntegerField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES,
                               default='pending')
     
+    # Price snapshot taken when the order is placed, so revenue never needs
+    # the product table and survives later price changes
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    line_total = models.DecimalField(max_digits=14, decimal_places=2)
+    
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL,
                                     on_delete=models.SET_NULL,
                                     null=True,
@@ -26,10 +70,27 @@ class Order(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     shipped_at = models.DateTimeField(null=True, blank=True)
+    # change tracking for delta sync; bulk .update() calls must set it too
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Pending orders hold their stock until this moment, then the
+    # expire_reservations sweep gives it back
+    reserved_until = models.DateTimeField(null=True, blank=True)
+    
+    objects = OrderQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
-
+        indexes = [
+            models.Index(fields=['created_at']),
+            # for_company(): the company's users, then each one's orders by date
+            models.Index(fields=['created_by', 'created_at'], name='order_created_by_created'),
+            # delta sync: each of the company's users' changes since the cursor
+            models.Index(fields=['created_by', 'updated_at', 'id'], name='order_created_by_updated'),
+            # expiry sweep: oldest expired holds first
+            models.Index(fields=['status', 'reserved_until']),
+        ]
+    
     def __str__(self):
         return f"Order #{self.id} - {self.product.name} - (x{self.quantity})"
     
@@ -41,11 +102,71 @@ class Order(models.Model):
         if self.product and not self.product.is_active: # checking the if the product is active
             raise ValidationError("Cannot order inactive products.")
         
-        if self.product and self.quantity > self.product.stock: # checking the if the quantity is available
+        # checking the if the quantity is available (only when placing, stock is already deducted afterwards)
+        if self.product and self._state.adding and self.quantity > self.product.stock:
             raise ValidationError(
                 f"Insufficient stock. Available: {self.product.stock}"
             )
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The product the price was snapshotted for, to notice a product change on save
+        if 'product_id' in instance.__dict__:
+            instance._loaded_product_id = instance.product_id
+        return instance
+    
     def save(self, *args, **kwargs):
+        product_changed = (
+            not self._state.adding
+            and getattr(self, '_loaded_product_id', self.product_id) != self.product_id
+        )
+        if self.unit_price is None or product_changed:
+            self.unit_price = self.product.price
+        self.line_total = self.unit_price * self.quantity
         self.full_clean()
         super().save(*args, **kwargs)
+        self._loaded_product_id = self.product_id
+
+
+class ArchivedOrder(models.Model):
+    """
+    Order moved out of the hot table by the archive_orders command.
+    Keeps the original order number and a copy of the product name so
+    it survives the product being purged.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    
+    product = models.ForeignKey('products.Product',
+                                on_delete=models.SET_NULL,
+                                null=True,
+                                related_name='archived_orders')
+    product_name = models.CharField(max_length=255)
+    
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    # Empty only for orders archived before prices were recorded whose product is gone
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    line_total = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL,
+                                   on_delete=models.SET_NULL,
+                                   null=True,
+                                   related_name='archived_orders')
+    
+    created_at = models.DateTimeField()
+    shipped_at = models.DateTimeField(null=True, blank=True)
+    
+    # First day of the month the order was placed in (the archive partition)
+    archive_month = models.DateField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['created_by', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Archived order #{self.id} - {self.product_name} - (x{self.quantity})"
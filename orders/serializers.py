@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from core.serializers import ValuesSerializer
 from .models import Order
 from products.models import Product
 from django.utils import timezone
@@ -8,8 +9,9 @@ class OrderSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Order
-        fields = ['id', 'product', 'product_name', 'quantity', 'status', 'created_at', 'shipped_at']
-        read_only_fields = ['created_at', 'shipped_at']
+        fields = ['id', 'product', 'product_name', 'quantity', 'unit_price', 'line_total',
+                  'status', 'created_at', 'shipped_at', 'reserved_until']
+        read_only_fields = ['unit_price', 'line_total', 'created_at', 'shipped_at', 'reserved_until']
         
     def validate(self, data):
         product = data.get('product')
@@ -21,12 +23,16 @@ class OrderSerializer(serializers.ModelSerializer):
         
         # Check if user's company matches product's company
         user = self.context['request'].user
-        if product.company != user.company:
+        if product.company_id != user.company_id:
             raise serializers.ValidationError("You can only order products from your company.")
         
-        # check stock avilability
+        # check stock avilability (reserved stock is already deducted)
         if quantity > product.stock:
             raise serializers.ValidationError(
                 f"the order quantity is not available on the stock. Available: {product.stock}")
         
-        return data
\ No newline at end of file
+        return data
+
+
+# Fast path with the same output for responses and listings of many orders
+order_values_serializer = ValuesSerializer(OrderSerializer)
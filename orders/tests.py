@@ -1,3 +1,696 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+from importlib import import_module
+from unittest import mock
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from core.testing import QueryBudgetMixin
+from companies.models import Company
+from users.models import User
+from products.models import Product, StockMovement
+from products.views import ForecastService, StockService
+from .models import ArchivedOrder, Cart, Order
+from .views import (
+    FulfillmentService, OrderArchiveService, OrderImportService, OrderService, ReservationService
+)
 
-# Create your tests here.
+# Order creation: session/user/company lookups plus one savepoint, then per line
+PER_REQUEST = 4
+PER_LINE = 11
+
+class OrderQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Max SQL queries per order view, independent of how many orders exist"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user(
+            'admin1', company=cls.company, role='admin', is_staff=True, is_superuser=True
+        )
+        cls.products = Product.objects.bulk_create([
+            Product(company=cls.company, name=f'Product {index}', price='9.99',
+                    stock=100000, created_by=cls.admin)
+            for index in range(3)
+        ])
+    
+    def setUp(self):
+        self.client.force_login(self.admin)
+    
+    def grow_orders(self, size):
+        existing = Order.objects.count()
+        Order.objects.bulk_create([
+            Order(product=self.products[index % 3], quantity=1, status='success',
+                  unit_price='9.99', line_total='9.99', created_by=self.admin)
+            for index in range(existing, size)
+        ])
+    
+    def place(self, payload):
+        return self.client.post('/api/orders/', json.dumps(payload), content_type='application/json')
+    
+    def test_order_create_api_single(self):
+        self.assertQueryBudget(
+            PER_REQUEST + PER_LINE, lambda: self.place({'product': self.products[0].pk, 'quantity': 1}), self.grow_orders
+        )
+    
+    def test_order_create_api_bulk(self):
+        # Each line has a fixed cost, the total must not depend on existing orders
+        payload = [{'product': product.pk, 'quantity': 1} for product in self.products] * 3
+        self.assertQueryBudget(
+            PER_REQUEST + PER_LINE * len(payload), lambda: self.place(payload), self.grow_orders
+        )
+    
+    def test_order_reserve_api(self):
+        self.assertQueryBudget(
+            PER_REQUEST + PER_LINE,
+            lambda: self.client.post('/api/orders/reserve/', json.dumps({'product': self.products[0].pk, 'quantity': 1}),
+                                     content_type='application/json'),
+            self.grow_orders
+        )
+    
+    def test_order_confirm_api(self):
+        # Confirming many reservations is a fixed number of statements
+        def grow(size):
+            self.grow_orders(size)
+            Order.objects.update(status='pending', reserved_until=timezone.now() + timedelta(minutes=5))
+            self.order_ids = list(Order.objects.values_list('id', flat=True))
+        
+        self.assertQueryBudget(
+            9, lambda: self.client.post('/api/orders/confirm/', json.dumps({'order_ids': self.order_ids}),
+                                        content_type='application/json'), grow
+        )
+    
+    def test_order_cancel_api(self):
+        # One UPDATE for the orders and one for their products, however many
+        def grow(size):
+            self.grow_orders(size)
+            Order.objects.update(status='success')
+            self.order_ids = list(Order.objects.values_list('id', flat=True))
+        
+        self.assertQueryBudget(
+            13, lambda: self.client.post('/api/orders/cancel/', json.dumps({'order_ids': self.order_ids}),
+                                        content_type='application/json'), grow
+        )
+    
+    def test_cart_create_api(self):
+        # Locks, inserts and stock updates are batched: the cart's size doesn't matter
+        def grow(size):
+            existing = Product.objects.count()
+            Product.objects.bulk_create([
+                Product(company=self.company, name=f'Cart {index}', price='1.00', stock=1000)
+                for index in range(existing, size + 3)
+            ])
+            self.lines = [{'product': product_id, 'quantity': 1}
+                          for product_id in Product.objects.values_list('id', flat=True)]
+        
+        self.assertQueryBudget(
+            14, lambda: self.client.post('/api/orders/cart/', json.dumps({'lines': self.lines}),
+                                        content_type='application/json'), grow
+        )
+    
+    def test_fulfillment_batch(self):
+        # Claim, cart lines, one UPDATE and one read back, however big the batch
+        def grow(size):
+            self.grow_orders(size)
+            cart = Cart.objects.create(created_by=self.admin, total='19.98')
+            Order.objects.filter(id__in=list(Order.objects.values_list('id', flat=True)[:2])).update(cart=cart)
+            Order.objects.update(status='pending', shipped_at=None)
+        
+        self.assertQueryBudget(6, lambda: FulfillmentService.ship_batch(), grow)
+        self.assertFalse(Order.objects.filter(status='pending').exists())
+        self.assertFalse(Order.objects.filter(shipped_at__isnull=True).exists())
+    
+    def test_order_import_api(self):
+        # One batch: a fixed number of statements whatever the sheet's length
+        def grow(size):
+            lines = [f'Product {index % 3},1' for index in range(size)]
+            self.sheet = '\n'.join(['Product,Quantity'] + lines).encode()
+        
+        def upload():
+            return self.client.post('/api/orders/import/', {'file': SimpleUploadedFile('orders.csv', self.sheet)})
+        
+        self.assertQueryBudget(13, upload, grow)
+    
+    def grow_archive(self, size):
+        self.grow_orders(size)
+        existing = ArchivedOrder.objects.count()
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(id=100000 + index, product=self.products[index % 3], product_name='Old',
+                          quantity=1, status='success', created_by=self.admin,
+                          created_at=timezone.now() - timedelta(days=400),
+                          archive_month=date(2025, 1, 1))
+            for index in range(existing, size)
+        ])
+    
+    def test_order_export_view(self):
+        # Hot orders plus the archive: one query each
+        self.assertQueryBudget(5, lambda: self.client.get('/orders/export/'), self.grow_archive)
+    
+    def test_order_export_api(self):
+        self.assertQueryBudget(5, lambda: self.client.get('/api/orders/export/'), self.grow_archive)
+    
+    def test_order_revenue_api(self):
+        # Summed from stored line totals: one grouped query per table
+        self.assertQueryBudget(
+            5, lambda: self.client.get('/api/orders/revenue/?group=product'), self.grow_archive
+        )
+    
+    def test_order_export_api_recent_range(self):
+        # A range that ends before the archive starts only probes it
+        start = timezone.now().date().isoformat()
+        self.assertQueryBudget(
+            5, lambda: self.client.get(f'/api/orders/export/?start={start}'), self.grow_archive
+        )
+    
+    def test_admin_changelist(self):
+        self.assertQueryBudget(
+            8, lambda: self.client.get('/admin/orders/order/'), self.grow_orders
+        )
+    
+    def test_admin_change_form(self):
+        order = Order.objects.create(product=self.products[0], quantity=1, created_by=self.admin)
+        
+        def grow(size):
+            # Both the orders table and the product dropdown grow
+            self.grow_orders(size)
+            existing = Product.objects.count()
+            Product.objects.bulk_create([
+                Product(company=self.company, name=f'Extra {index}', price='1.00', stock=1)
+                for index in range(existing, size + 3)
+            ])
+        
+        self.assertQueryBudget(
+            10, lambda: self.client.get(f'/admin/orders/order/{order.pk}/change/'), grow
+        )
+    
+    def test_admin_archived_changelist(self):
+        self.assertQueryBudget(
+            7, lambda: self.client.get('/admin/orders/archivedorder/'), self.grow_archive
+        )
+    
+    @mock.patch('orders.views.SYNC_SETTLE_SECONDS', 0)
+    def test_delta_sync(self):
+        self.assertQueryBudget(4, lambda: self.client.get('/api/sync/'), self.grow_orders)
+
+
+class OrderTestCase(TestCase):
+    """Shared fixture for behaviour tests: one company, an admin, an operator and three products"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user('admin1', company=cls.company, role='admin', is_staff=True)
+        cls.operator = User.objects.create_user('operator1', company=cls.company, role='operator', is_staff=True)
+        cls.products = [
+            Product.objects.create(company=cls.company, name=f'Product {index}', price=Decimal('2.50'),
+                                   stock=50, created_by=cls.admin)
+            for index in range(3)
+        ]
+    
+    def setUp(self):
+        self.client.force_login(self.admin)
+    
+    def order(self, product, quantity=1, user=None, days_ago=0, status='success'):
+        order = OrderService.process_order(product, quantity, user or self.admin)
+        changes = {'status': status} if status != 'pending' else {}
+        if days_ago:
+            changes['created_at'] = timezone.now() - timedelta(days=days_ago)
+        if changes:
+            Order.objects.filter(pk=order.pk).update(**changes)
+            order.refresh_from_db()
+        return order
+    
+    def stock(self, product):
+        product.refresh_from_db(fields=['stock'])
+        return product.stock
+    
+    def export_rows(self, **params):
+        response = self.client.get('/api/orders/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+
+class OrderArchiveTests(OrderTestCase):
+    """archive_batch moves old orders out of the hot table; reads still see them"""
+    
+    def test_archive_batch_moves_rows(self):
+        old = [self.order(self.products[0], 2, days_ago=400), self.order(self.products[1], 3, days_ago=500)]
+        recent = self.order(self.products[2], 1)
+        cutoff = OrderArchiveService.cutoff()
+        
+        # Oldest first, one batch at a time
+        self.assertEqual(OrderArchiveService.archive_batch(cutoff, batch_size=1), 1)
+        self.assertEqual(list(ArchivedOrder.objects.values_list('id', flat=True)), [old[1].id])
+        self.assertEqual(OrderArchiveService.archive_batch(cutoff, batch_size=1), 1)
+        self.assertEqual(OrderArchiveService.archive_batch(cutoff, batch_size=1), 0)
+        
+        self.assertEqual(list(Order.objects.values_list('id', flat=True)), [recent.id])
+        archived = ArchivedOrder.objects.get(id=old[0].id)
+        self.assertEqual((archived.product_name, archived.quantity, archived.line_total),
+                         ('Product 0', 2, Decimal('5.00')))
+    
+    def test_exports_and_revenue_include_archive(self):
+        orders = [self.order(self.products[0], 2, days_ago=400), self.order(self.products[1], 1)]
+        OrderArchiveService.archive_batch(OrderArchiveService.cutoff())
+        
+        rows = self.export_rows()
+        self.assertEqual(sorted(int(row['Order ID']) for row in rows), sorted(order.id for order in orders))
+        
+        response = self.client.get('/api/orders/revenue/?group=product')
+        self.assertEqual((response.json()['orders'], response.json()['revenue']), (2, '7.50'))
+
+
+class OrderExportFormatTests(OrderTestCase):
+    """The export decodes to the same orders in every format and encoding"""
+    
+    def setUp(self):
+        super().setUp()
+        self.orders = [self.order(self.products[0], 2), self.order(self.products[1], 1, status='pending')]
+    
+    def body(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+    
+    def test_gzip_content_encoding(self):
+        response = self.client.get('/api/orders/export/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        plain = self.client.get('/api/orders/export/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(self.body(response)), self.body(plain))
+    
+    def test_ndjson(self):
+        response = self.client.get('/api/orders/export/?format=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in self.body(response).decode().splitlines()]
+        self.assertEqual(
+            sorted((record['id'], record['product'], record['quantity'], record['line_total'], record['status'])
+                   for record in records),
+            [(self.orders[0].id, 'Product 0', 2, '5.00', 'success'), (self.orders[1].id, 'Product 1', 1, '2.50', 'pending')]
+        )
+        
+        # Negotiated from the Accept header too
+        response = self.client.get('/api/orders/export/', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(len(self.body(response).decode().splitlines()), 2)
+    
+    def test_gzip_file(self):
+        response = self.client.get('/api/orders/export/?format=ndjson.gz', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+        records = [json.loads(line) for line in gzip.decompress(self.body(response)).decode().splitlines()]
+        self.assertEqual(sorted(record['id'] for record in records), sorted(order.id for order in self.orders))
+    
+    def test_unknown_format(self):
+        response = self.client.get('/api/orders/export/?format=xml')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unsupported export format', response.json()['error'])
+
+
+@mock.patch('orders.views.SYNC_SETTLE_SECONDS', 0)
+class DeltaSyncTests(OrderTestCase):
+    """Paging through /api/sync/ sees every change exactly once, then later changes again"""
+    
+    def setUp(self):
+        super().setUp()
+        self.orders = [self.order(self.products[index % 3]) for index in range(5)]
+        other = Company.objects.create(name='Golden Egg Productions')
+        outsider = User.objects.create_user('admin2', company=other, role='admin')
+        product = Product.objects.create(company=other, name='Other', price=Decimal('1.00'), stock=5)
+        self.order(product, user=outsider)
+        # Every row changed at the same instant: only the id breaks the tie
+        self.tied_at = timezone.now() - timedelta(hours=1)
+        Order.objects.update(updated_at=self.tied_at)
+        Product.objects.update(last_updated_at=self.tied_at)
+    
+    def sync(self, **params):
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def drain(self, cursor=None, limit=2):
+        """(product ids, order ids, cursor) seen paging until has_more is false"""
+        products, orders = [], []
+        for _ in range(10):
+            page = self.sync(**({'cursor': cursor} if cursor else {}), limit=limit)
+            products += [product['id'] for product in page['products']]
+            orders += [order['id'] for order in page['orders']]
+            cursor = page['cursor']
+            if not page['has_more']:
+                return products, orders, cursor
+        self.fail('sync never finished')
+    
+    def test_limit_validation(self):
+        for limit in ('0', '-1', 'x', '1.5', ''):
+            response = self.client.get('/api/sync/', {'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+            self.assertIn('limit', response.json()['error'])
+        self.assertEqual(self.client.get('/api/sync/?cursor=nope').status_code, 400)
+        
+        page = self.sync(limit=10 ** 6)
+        self.assertEqual(len(page['orders']), 5)
+        self.assertFalse(page['has_more'])
+    
+    def test_paging_with_tied_timestamps(self):
+        products, orders, _ = self.drain(limit=2)
+        self.assertEqual(products, [product.id for product in self.products])
+        self.assertEqual(orders, sorted(order.id for order in self.orders))
+    
+    def test_late_update_reappears(self):
+        _, _, cursor = self.drain(limit=2)
+        page = self.sync(cursor=cursor)
+        self.assertEqual((page['products'], page['orders'], page['has_more']), ([], [], False))
+        
+        changed = self.orders[0]
+        Order.objects.filter(pk=changed.pk).update(status='cancelled', updated_at=self.tied_at + timedelta(minutes=1))
+        products, orders, cursor = self.drain(cursor)
+        self.assertEqual((products, orders), ([], [changed.id]))
+        self.assertEqual(self.sync(cursor=cursor)['orders'], [])
+
+
+class OrderImportTests(OrderTestCase):
+    """CSV import: one order per good row, every bad row reported by line"""
+    
+    SHEET = (
+        'Order ID,Product,Quantity\n'
+        ',Product 0,2\n'
+        ',  product   1 ,1\n'       # names match case- and space-insensitively
+        ',Unknown,1\n'
+        ',Product 0,abc\n'
+        '\n'                         # blank lines are skipped but still counted
+        ',Product 0,0\n'
+        ',Product 2,30\n'
+        ',Product 2,30\n'            # only 20 left after the line above
+    )
+    
+    def upload(self, sheet):
+        return self.client.post('/api/orders/import/', {'file': SimpleUploadedFile('orders.csv', sheet.encode())})
+    
+    def test_counts_and_errors(self):
+        response = self.upload(self.SHEET)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual([(error['line'], error['error']) for error in data['errors']], [
+            (4, "Unknown or inactive product: 'Unknown'"),
+            (5, "Invalid quantity: 'abc'"),
+            (7, 'Quantity must be at least 1'),
+            (9, 'Insufficient stock. Available: 20'),
+        ])
+        self.assertEqual(
+            sorted(Order.objects.values_list('product__name', 'quantity', 'status', 'line_total')),
+            [('Product 0', 2, 'pending', Decimal('5.00')), ('Product 1', 1, 'pending', Decimal('2.50')),
+             ('Product 2', 30, 'pending', Decimal('75.00'))]
+        )
+        self.assertEqual([self.stock(product) for product in self.products], [48, 49, 20])
+    
+    def test_parallel_validation_and_batches_agree(self):
+        _, rows = OrderImportService.read_rows(io.StringIO(self.SHEET))
+        catalog = OrderImportService.catalog(self.company)
+        self.assertEqual(
+            OrderImportService.validate(rows, catalog, workers=2, chunk_size=2),
+            OrderImportService.validate(rows, catalog)
+        )
+        
+        _, created, errors = OrderImportService.import_csv(io.StringIO(self.SHEET), self.admin, batch_size=1)
+        self.assertEqual((created, [line for line, _, _ in errors]), (3, [4, 5, 7, 9]))
+    
+    def test_nothing_imported(self):
+        response = self.upload('Product,Quantity\nUnknown,1\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [{'line': 2, 'error': "Unknown or inactive product: 'Unknown'"}])
+        self.assertEqual(self.upload('Name,Amount\nProduct 0,1\n').status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class CartTests(OrderTestCase):
+    """A cart is placed whole or not at all"""
+    
+    def place(self, *lines):
+        return self.client.post('/api/orders/cart/', {
+            'lines': [{'product': product.id, 'quantity': quantity} for product, quantity in lines]
+        }, content_type='application/json')
+    
+    def assertNothingWritten(self):
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertEqual([self.stock(product) for product in self.products], [50, 50, 50])
+    
+    def test_place_cart(self):
+        response = self.place((self.products[0], 2), (self.products[1], 1), (self.products[0], 3))
+        self.assertEqual(response.status_code, 201)
+        cart = Cart.objects.get()
+        self.assertEqual(response.json()['cart']['total'], '15.00')
+        self.assertEqual(
+            list(cart.lines.order_by('product_id').values_list('product__name', 'quantity')),
+            [('Product 0', 5), ('Product 1', 1)]
+        )
+        self.assertEqual([self.stock(product) for product in self.products], [45, 49, 50])
+        self.assertEqual(StockMovement.objects.filter(reason='order').count(), 2)
+    
+    def test_failing_line_rolls_back_cart(self):
+        other = Company.objects.create(name='Golden Egg Productions')
+        foreign = Product.objects.create(company=other, name='Other', price=Decimal('1.00'), stock=5)
+        response = self.place((self.products[0], 2), (self.products[1], 51), (foreign, 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [
+            'Product 1: insufficient stock. Available: 50', f'Product {foreign.id}: not found.'
+        ])
+        self.assertNothingWritten()
+    
+    def test_failure_after_writes_rolls_back_stock(self):
+        adjust_locked = StockService.adjust_locked
+        
+        def deduct_then_fail(*args, **kwargs):
+            # Stock is already deducted when a flash-sale slot runs dry
+            adjust_locked(*args, **kwargs)
+            raise ValueError('Insufficient stock in flash-sale slots')
+        
+        with mock.patch.object(StockService, 'adjust_locked', side_effect=deduct_then_fail):
+            response = self.place((self.products[0], 2), (self.products[2], 4))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], ['Insufficient stock in flash-sale slots'])
+        self.assertNothingWritten()
+
+
+class ReservationTests(OrderTestCase):
+    """Lapsed holds give their stock back and take their demand out of the forecast"""
+    
+    def reserve(self, product, quantity, lapsed=True):
+        order = OrderService.process_order(product, quantity, self.operator, reserve=True)
+        if lapsed:
+            Order.objects.filter(pk=order.pk).update(reserved_until=timezone.now() - timedelta(minutes=1))
+        return order
+    
+    def test_expire_batch_returns_stock_and_rate(self):
+        product, other = self.products[0], self.products[1]
+        lapsed = [self.reserve(product, 4), self.reserve(product, 6), self.reserve(other, 5)]
+        held = self.reserve(product, 1, lapsed=False)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 39)
+        self.assertGreater(product.consumption_rate, 0)
+        
+        # Oldest lapsed holds first, batch by batch
+        self.assertEqual(ReservationService.expire_batch(batch_size=2), 2)
+        self.assertEqual(ReservationService.expire_batch(batch_size=2), 1)
+        self.assertEqual(ReservationService.expire_batch(batch_size=2), 0)
+        
+        self.assertEqual(
+            set(Order.objects.filter(status='expired').values_list('id', flat=True)), {order.id for order in lapsed}
+        )
+        self.assertEqual(list(Order.objects.filter(status='pending').values_list('id', flat=True)), [held.id])
+        self.assertEqual([self.stock(product), self.stock(other)], [49, 50])
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(reason='release').values_list('product_id', 'delta')),
+            sorted([(product.id, 10), (other.id, 5)])
+        )
+        
+        # Only the unit still held keeps counting as demand
+        product.refresh_from_db()
+        other.refresh_from_db()
+        expected = ForecastService.decay_constant() * 1
+        self.assertAlmostEqual(product.consumption_rate, expected, places=6)
+        self.assertAlmostEqual(product.days_until_stockout, 49 / product.consumption_rate, places=3)
+        self.assertAlmostEqual(other.consumption_rate, 0, places=6)
+        self.assertIsNone(other.days_until_stockout)
+    
+    def test_expired_hold_cannot_be_confirmed(self):
+        lapsed, held = self.reserve(self.products[0], 2), self.reserve(self.products[0], 3, lapsed=False)
+        confirmed = ReservationService.confirm(Order.objects.filter(id__in=[lapsed.id, held.id]))
+        self.assertEqual([order.id for order in confirmed], [held.id])
+        self.assertEqual(ReservationService.expire_batch(), 1)
+        self.assertEqual(self.stock(self.products[0]), 47)
+    
+    
+    def test_confirm_api(self):
+        lapsed, held = self.reserve(self.products[0], 2), self.reserve(self.products[0], 3, lapsed=False)
+        self.client.force_login(self.operator)
+        for body in ({}, {'order_ids': 'abc'}, {'order_ids': ['x']}, {'order_ids': [{}]}, [held.id]):
+            response = self.client.post('/api/orders/confirm/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('error', response.json())
+        
+        response = self.client.post('/api/orders/confirm/', {'order_ids': [str(lapsed.id), held.id]},
+                                    content_type='application/json')
+        self.assertEqual([order['id'] for order in response.json()['confirmed']], [held.id])
+        self.assertIsNone(Order.objects.get(pk=held.pk).reserved_until)
+
+
+class OrderCancelTests(OrderTestCase):
+    """Cancelling returns stock once per product, within the user's permissions"""
+    
+    def cancel(self, orders, user=None):
+        return self.cancel_ids([order.id for order in orders], user)
+    
+    def cancel_ids(self, order_ids, user=None):
+        self.client.force_login(user or self.admin)
+        return self.client.post('/api/orders/cancel/', {'order_ids': order_ids}, content_type='application/json')
+    
+    def test_restock_one_update_per_product(self):
+        orders = [self.order(self.products[0], quantity) for quantity in (1, 2, 3)]
+        orders.append(self.order(self.products[1], 4, status='pending'))
+        StockMovement.objects.all().delete()
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.cancel(orders)
+        self.assertEqual(response.json()['count'], 4)
+        product_updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE') and 'products_product' in query['sql'].split(' SET ')[0]
+        ]
+        self.assertEqual(len(product_updates), 1)
+        
+        self.assertEqual(
+            sorted(StockMovement.objects.values_list('product_id', 'delta', 'reason')),
+            [(self.products[0].id, 6, 'cancellation'), (self.products[1].id, 4, 'cancellation')]
+        )
+        self.assertEqual([self.stock(product) for product in self.products], [50, 50, 50])
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), {'cancelled'})
+        
+        # Already cancelled: nothing left to give back
+        self.assertEqual(self.cancel(orders).status_code, 404)
+        self.assertEqual(self.stock(self.products[0]), 50)
+    
+    def test_operator_cannot_cancel_another_day(self):
+        yesterday = self.order(self.products[0], 2, user=self.operator, days_ago=1)
+        today = self.order(self.products[0], 3, user=self.operator)
+        
+        response = self.cancel([yesterday, today], user=self.operator)
+        self.assertEqual((response.json()['count'], response.json()['skipped']), (1, 1))
+        self.assertEqual(Order.objects.get(pk=yesterday.pk).status, 'success')
+        self.assertEqual(self.stock(self.products[0]), 48)
+        
+        # An admin of the company can
+        self.assertEqual(self.cancel([yesterday]).json()['count'], 1)
+        self.assertEqual(self.stock(self.products[0]), 50)
+    
+    def test_other_company_and_viewer(self):
+        other = Company.objects.create(name='Golden Egg Productions')
+        outsider = User.objects.create_user('admin2', company=other, role='admin')
+        viewer = User.objects.create_user('viewer1', company=self.company, role='viewer')
+        order = self.order(self.products[0], 2)
+        
+        self.assertEqual(self.cancel([order], user=outsider).status_code, 404)
+        self.assertEqual(self.cancel([order], user=viewer).status_code, 403)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'success')
+    
+    def test_invalid_order_ids(self):
+        order = self.order(self.products[0], 2)
+        for body in ({}, {'order_ids': []}, {'order_ids': 'abc'}, {'order_ids': ['x']}, {'order_ids': [{}]},
+                     {'order_ids': [1.5]}, {'order_ids': [True]}, [order.id]):
+            response = self.client.post('/api/orders/cancel/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('error', response.json())
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'success')
+        
+        # The same id as a number and a string is one order
+        data = self.cancel_ids([order.id, str(order.id)]).json()
+        self.assertEqual((data['count'], data['skipped']), (1, 0))
+
+
+class OrderPriceSnapshotTests(OrderTestCase):
+    """Orders keep the price they were placed at, until they are moved to another product"""
+    
+    def test_snapshot_survives_price_change(self):
+        order = self.order(self.products[0], 2)
+        Product.objects.filter(pk=self.products[0].pk).update(price=Decimal('99.00'))
+        
+        order = Order.objects.get(pk=order.pk)
+        order.quantity = 3
+        order.save()
+        order.refresh_from_db()
+        self.assertEqual((order.unit_price, order.line_total), (Decimal('2.50'), Decimal('7.50')))
+        self.assertEqual(self.client.get('/api/orders/revenue/').json()['revenue'], '7.50')
+    
+    def test_admin_product_change_resnapshots(self):
+        superuser = User.objects.create_user('root', company=self.company, is_staff=True, is_superuser=True)
+        self.client.force_login(superuser)
+        order = self.order(self.products[0], 2, status='pending')
+        Product.objects.filter(pk=self.products[1].pk).update(price=Decimal('100.00'))
+        
+        self.client.post(f'/admin/orders/order/{order.pk}/change/', {
+            'product': self.products[1].pk, 'quantity': 2, 'status': 'pending',
+        })
+        order.refresh_from_db()
+        self.assertEqual((order.product_id, order.unit_price, order.line_total),
+                         (self.products[1].pk, Decimal('100.00'), Decimal('200.00')))
+        
+        # Editing anything else keeps the snapshot
+        Product.objects.filter(pk=self.products[1].pk).update(price=Decimal('1.00'))
+        self.client.post(f'/admin/orders/order/{order.pk}/change/', {
+            'product': self.products[1].pk, 'quantity': 3, 'status': 'pending',
+        })
+        order.refresh_from_db()
+        self.assertEqual((order.unit_price, order.line_total), (Decimal('100.00'), Decimal('300.00')))
+
+
+class PriceBackfillMigrationTests(TransactionTestCase):
+    """0005 fills unit_price and line_total of existing orders, batch by batch"""
+    
+    before = [('orders', '0004_order_updated_at'), ('products', '0006_product_deactivated_at')]
+    after = [('orders', '0005_order_unit_price'), ('products', '0006_product_deactivated_at')]
+    
+    def tearDown(self):
+        # Back to the latest schema for the tests that follow
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+    
+    def test_backfill(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        Company = apps.get_model('companies', 'Company')
+        Product = apps.get_model('products', 'Product')
+        Order = apps.get_model('orders', 'Order')
+        ArchivedOrder = apps.get_model('orders', 'ArchivedOrder')
+        
+        company = Company.objects.create(name='Sunrise Poultry Farm')
+        feed = Product.objects.create(company=company, name='Layer Feed', price=Decimal('9.99'), stock=10)
+        trays = Product.objects.create(company=company, name='Egg Trays', price=Decimal('0.50'), stock=10)
+        orders = [Order.objects.create(product=product, quantity=quantity, status='success')
+                  for product, quantity in ((feed, 1), (trays, 4), (feed, 3))]
+        ArchivedOrder.objects.create(id=10 ** 6, product=trays, product_name='Egg Trays', quantity=2,
+                                     status='success', created_at=timezone.now(), archive_month=date.today().replace(day=1))
+        
+        executor = MigrationExecutor(connection)
+        with mock.patch.object(import_module('orders.migrations.0005_order_unit_price'), 'BACKFILL_BATCH_SIZE', 2):
+            executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        
+        self.assertEqual(
+            list(apps.get_model('orders', 'Order').objects.order_by('id').values_list('id', 'unit_price', 'line_total')),
+            [(orders[0].id, Decimal('9.99'), Decimal('9.99')), (orders[1].id, Decimal('0.50'), Decimal('2.00')),
+             (orders[2].id, Decimal('9.99'), Decimal('29.97'))]
+        )
+        self.assertEqual(
+            list(apps.get_model('orders', 'ArchivedOrder').objects.values_list('unit_price', 'line_total')),
+            [(Decimal('0.50'), Decimal('1.00'))]
+        )
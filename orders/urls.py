@@ -1,9 +1,18 @@
 from django.urls import path
-from .views import OrderCreateAPIView, OrderExportAPIView
+from .views import (
+    CartCreateAPIView, OrderCancelAPIView, OrderConfirmAPIView, OrderCreateAPIView, OrderExportAPIView, OrderImportAPIView,
+    OrderReserveAPIView, OrderRevenueAPIView
+)
 
 app_name = 'orders'
 
 urlpatterns = [
     path('', OrderCreateAPIView.as_view(), name='api-create'),
     path('export/', OrderExportAPIView.as_view(), name='api-export'),
+    path('cart/', CartCreateAPIView.as_view(), name='api-cart'),
+    path('reserve/', OrderReserveAPIView.as_view(), name='api-reserve'),
+    path('confirm/', OrderConfirmAPIView.as_view(), name='api-confirm'),
+    path('cancel/', OrderCancelAPIView.as_view(), name='api-cancel'),
+    path('import/', OrderImportAPIView.as_view(), name='api-import'),
+    path('revenue/', OrderRevenueAPIView.as_view(), name='api-revenue'),
 ]
@@ -1,32 +1,161 @@
+import binascii
 import csv
+import io
+import json
 import logging
-from datetime import date
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.http import HttpResponse
+from rest_framework.negotiation import BaseContentNegotiation
+from django.http import StreamingHttpResponse
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.contrib import messages
+from django.conf import settings
 from django.utils import timezone
-from django.db import transaction
-from .models import Order
-from .serializers import OrderSerializer
+from django.utils.dateparse import parse_date
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from core.events import publish_on_commit
+from .importing import init_worker, product_key, validate_rows
+from .models import ArchivedOrder, Cart, Order
+from .serializers import OrderSerializer, order_values_serializer
 from products.models import Product
+from products.serializers import product_values_serializer
+from products.views import StockService
 
 logger = logging.getLogger('orders')
 
+EXPORT_HEADER = ['Order ID', 'Product', 'Quantity', 'Unit Price', 'Total', 'Status', 'Created By', 'Created At', 'Shipped At']
+# format -> (content type, OrderService line generator)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv_lines'),
+    'ndjson': ('application/x-ndjson', 'ndjson_lines'),
+}
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+IMPORT_CHUNK_SIZE = 2000
+
+# revenue report grouping -> expression on Order / ArchivedOrder columns
+REVENUE_GROUPS = {
+    'day': TruncDate('created_at'),
+    'month': TruncMonth('created_at'),
+    'product': F('product_id'),
+}
+
+# Orders in these statuses hold their stock; cancelled, expired and failed ones gave it back
+HOLDS_STOCK = ('pending', 'success')
+
+SYNC_PAGE_SIZE = 500
+SYNC_SETTLE_SECONDS = 2
+
+
+class SyncCursor:
+    """Opaque delta-sync position: (timestamp, id) of the last product and order seen"""
+    
+    @staticmethod
+    def encode(cursor):
+        data = {
+            name: [position[0].isoformat(), position[1]] if position else None
+            for name, position in cursor.items()
+        }
+        return urlsafe_b64encode(json.dumps(data).encode()).decode()
+    
+    @staticmethod
+    def decode(value):
+        """Raises ValueError for anything that isn't a cursor we issued"""
+        cursor = {'products': None, 'orders': None}
+        if not value:
+            return cursor
+        
+        try:
+            data = json.loads(urlsafe_b64decode(value.encode()))
+            for name in cursor:
+                if data.get(name):
+                    timestamp, row_id = data[name]
+                    cursor[name] = (datetime.fromisoformat(timestamp), int(row_id))
+        except (TypeError, KeyError, AttributeError, binascii.Error, json.JSONDecodeError) as e:
+            raise ValueError('Invalid cursor') from e
+        return cursor
+    
+    @staticmethod
+    def changed(queryset, field, position, settled):
+        """
+        Rows changed after `position`, oldest first. Products read along their
+        (company, field, id) index; orders have no company column, so each of
+        the company's users is probed on (created_by, field, id) and only the
+        rows changed since the cursor are sorted.
+        """
+        queryset = queryset.filter(**{f'{field}__lt': settled})
+        if position:
+            timestamp, row_id = position
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': row_id})
+            )
+        return queryset.order_by(field, 'id')
+
+
+class Echo:
+    """File-like object for csv.writer that hands each line back instead of buffering it"""
+    
+    def write(self, value):
+        return value
+
+
+def accepts_gzip(accept_encoding):
+    """True if an Accept-Encoding header allows gzip (and doesn't set q=0)"""
+    for coding in accept_encoding.split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """
+    Exports pick their own format from Accept / ?format=, so DRF must not
+    reject text/csv or ?format=ndjson. Error responses still render as JSON.
+    """
+    
+    def select_parser(self, request, parsers):
+        return parsers[0]
+    
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
 
 # ===== Shared Business Logic =====
+
+class CartError(ValueError):
+    """A cart was rejected; `errors` lists every line that failed"""
+    
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(' '.join(errors))
+
 class OrderService:
     """Service class to handle order business logic"""
     
     @staticmethod
-    def process_order(product, quantity, user):
-        """Process order: validate, create, deduct stock, log email"""
-        # Validate stock
+    def process_order(product, quantity, user, reserve=False):
+        """
+        Process order: validate, create it pending, deduct stock. The
+        fulfillment worker ships it and sends the confirmation email.
+        With `reserve` the order only holds its stock until
+        ReservationService confirms or expires it.
+        """
+        # Validate stock (held stock is already deducted, so this counts holds too)
         if quantity > product.stock:
             raise ValueError(f'Insufficient stock. Available: {product.stock}')
         
@@ -36,19 +165,179 @@ class OrderService:
                 product=product,
                 quantity=quantity,
                 created_by=user,
-                status='success',
-                shipped_at=timezone.now()
+                status='pending',
+                reserved_until=ReservationService.hold_until() if reserve else None
             )
             
-            # Deduct stock
-            product.stock -= quantity
-            product.save(update_fields=['stock'])
-            
-            # Log confirmation email
-            OrderService.log_confirmation_email(order, user)
+            # Deduct stock (guarded update + ledger row), rolls back the order if it fails
+            StockService.adjust(product, -quantity, 'order', user=user, order=order)
+            OrderService.notify_created(order)
         
         return order
     
+    @staticmethod
+    def place_cart(lines, user):
+        """
+        Place several products at once: a Cart header plus one order per
+        product, all or nothing. Quantities of a repeated product are merged.
+        The products are locked in ascending id order, so two carts sharing
+        products can never deadlock, and every line is checked before
+        anything is written. Raises CartError listing every failed line.
+        """
+        quantities = Counter()
+        for product_id, quantity in lines:
+            quantities[product_id] += quantity
+        if not quantities:
+            raise CartError(['The cart is empty.'])
+        
+        with transaction.atomic():
+            products = {
+                product.id: product
+                for product in Product.objects.for_company(user.company).active()
+                .select_for_update()
+                .filter(id__in=quantities)
+                .order_by('id')
+            }
+            
+            errors = []
+            for product_id, quantity in quantities.items():
+                product = products.get(product_id)
+                if product is None:
+                    errors.append(f'Product {product_id}: not found.')
+                elif quantity < 1:
+                    errors.append(f'{product.name}: quantity must be at least 1.')
+                elif quantity > product.stock:
+                    errors.append(f'{product.name}: insufficient stock. Available: {product.stock}')
+            if errors:
+                raise CartError(errors)
+            
+            cart = Cart.objects.create(
+                created_by=user,
+                total=sum(products[product_id].price * quantity for product_id, quantity in quantities.items())
+            )
+            Order.objects.bulk_create([
+                Order(cart=cart, product=products[product_id], quantity=quantity,
+                      unit_price=products[product_id].price,
+                      line_total=products[product_id].price * quantity,
+                      status='pending', created_by=user)
+                for product_id, quantity in quantities.items()
+            ])
+            # Read the lines back for their ids (bulk_create can't return them on MySQL)
+            orders = list(cart.lines.order_by('id'))
+            for order in orders:
+                order.product = products[order.product_id]
+            
+            StockService.adjust_locked(
+                products, {product_id: -quantity for product_id, quantity in quantities.items()},
+                'order', user=user, orders={order.product_id: order for order in orders}
+            )
+            
+            for order in orders:
+                OrderService.notify_created(order)
+        
+        return cart, orders
+    
+    @staticmethod
+    def parse_ids(data):
+        """
+        The `order_ids` of a bulk request body as a set of ints (numeric
+        strings from form posts included). Raises ValueError otherwise.
+        """
+        order_ids = data.get('order_ids') if hasattr(data, 'get') else None
+        if not order_ids:
+            raise ValueError('No order IDs provided')
+        if not isinstance(order_ids, list):
+            order_ids = [order_ids]
+        
+        parsed = set()
+        for value in order_ids:
+            if isinstance(value, str) and value.strip().isdecimal():
+                value = int(value)
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError('order_ids must be a list of integer order IDs')
+            parsed.add(value)
+        return parsed
+    
+    @staticmethod
+    def cancellable(orders, user):
+        """
+        Narrow `orders` to the ones `user` may cancel: superusers anything,
+        admins their company's orders, operators only orders placed today,
+        viewers nothing. Only placed or reserved orders can be cancelled.
+        """
+        orders = orders.filter(status__in=['pending', 'success'])
+        if user.is_superuser:
+            return orders
+        
+        orders = orders.for_company(user.company)
+        if user.role == 'admin':
+            return orders
+        if user.role == 'operator':
+            today = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+            return orders.filter(created_at__gte=today)
+        return orders.none()
+    
+    @staticmethod
+    def cancel(orders, user):
+        """
+        Cancel the orders of a queryset that `user` may cancel and give their
+        stock back: one UPDATE for the orders and one for all affected
+        products, in a single transaction. Returns the number cancelled.
+        """
+        # Resolve permissions first so the lock only touches order rows
+        order_ids = list(OrderService.cancellable(orders, user).values_list('id', flat=True))
+        if not order_ids:
+            return 0
+        
+        with transaction.atomic():
+            rows = list(
+                Order.objects.select_for_update()
+                .filter(id__in=order_ids, status__in=['pending', 'success'])
+                .order_by('id')
+                .values_list('id', 'product_id', 'quantity')
+            )
+            if not rows:
+                return 0
+            
+            Order.objects.filter(id__in=[order_id for order_id, _, _ in rows]).update(
+                status='cancelled', reserved_until=None, updated_at=timezone.now()
+            )
+            
+            restocked = Counter()
+            for _, product_id, quantity in rows:
+                restocked[product_id] += quantity
+            products = {
+                product.id: product
+                for product in Product.objects.select_for_update().filter(id__in=restocked).order_by('id')
+            }
+            StockService.adjust_locked(products, dict(restocked), 'cancellation', user=user)
+        
+        return len(rows)
+    
+    @staticmethod
+    def stock_deltas(initial, product_id, quantity, order_status):
+        """
+        Stock change per product id when an order goes from `initial`
+        (product id, quantity and status before the edit; empty for a new
+        order) to the given values. Zero changes are left out.
+        """
+        deltas = Counter()
+        if initial.get('status') in HOLDS_STOCK:
+            deltas[initial['product']] += initial['quantity']
+        if order_status in HOLDS_STOCK:
+            deltas[product_id] -= quantity
+        return {key: delta for key, delta in deltas.items() if delta}
+    
+    @staticmethod
+    def notify_created(order):
+        """Push a new order (or its new status) to the company's event stream after commit"""
+        publish_on_commit(order.product.company_id, 'order', {
+            'id': order.id,
+            'product': order.product_id,
+            'quantity': order.quantity,
+            'status': order.status,
+        })
+    
     @staticmethod
     def log_confirmation_email(order, user):
         """Log order confirmation email"""
@@ -61,35 +350,558 @@ class OrderService:
             f"Order Num. : #{order.id}\n"
             f"- Product: {product.name}\n"
             f"- Quantity : {order.quantity}\n"
-            f"- Total: ${product.price * order.quantity}\n"
+            f"- Total: ${order.line_total}\n"
             f"- Status: Success\n"
             f"- Shipped At: {order.shipped_at}\n"
             f"*****************************************************"
         )
     
     @staticmethod
-    def generate_csv_response(orders, filename_prefix='orders'):
-        """Generate CSV response for orders"""
-        response = HttpResponse(content_type='text/csv')
+    def log_cart_confirmation(cart, orders, user):
+        """Log one confirmation email for a whole cart"""
+        lines = ''.join(
+            f"- {order.product.name} x{order.quantity} @ ${order.unit_price} = ${order.line_total} (Order #{order.id})\n"
+            for order in orders
+        )
+        logger.info(
+            f"ORDER CONFIRMATION EMAIL\n"
+            f"hi there we want to let u know that your order is Successfully placed\n"
+            f"See more info: - \n"
+            f"To: {user.email or user.username}\n"
+            f"Cart Num. : #{cart.id}\n"
+            f"{lines}"
+            f"- Total: ${cart.total}\n"
+            f"- Status: Success\n"
+            f"- Shipped At: {orders[0].shipped_at}\n"
+            f"*****************************************************"
+        )
+    
+    @staticmethod
+    def export_records(orders):
+        """
+        Yield raw export tuples for one queryset of orders, or a list of them
+        (hot and archived orders). Rows come straight from values_list, so no
+        model instances or related objects are built.
+        """
+        querysets = orders if isinstance(orders, (list, tuple)) else [orders]
+        
+        for queryset in querysets:
+            product_field = 'product_name' if queryset.model is ArchivedOrder else 'product__name'
+            yield from queryset.values_list(
+                'id', product_field, 'quantity', 'unit_price', 'line_total', 'status',
+                'created_by__username', 'created_at', 'shipped_at'
+            ).iterator()
+    
+    @staticmethod
+    def export_rows(orders):
+        """Yield formatted CSV rows for orders"""
+        status_labels = dict(Order.STATUS_CHOICES)
+        
+        for order_id, product_name, quantity, unit_price, line_total, order_status, username, created_at, shipped_at in OrderService.export_records(orders):
+            yield [
+                order_id,
+                product_name,
+                quantity,
+                unit_price if unit_price is not None else 'N/A',
+                line_total if line_total is not None else 'N/A',
+                status_labels.get(order_status, order_status),
+                username or 'N/A',
+                created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                shipped_at.strftime('%Y-%m-%d %H:%M:%S') if shipped_at else 'N/A',
+            ]
+    
+    @staticmethod
+    def csv_lines(orders):
+        """Yield the export as CSV text, one line at a time"""
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_HEADER)
+        for row in OrderService.export_rows(orders):
+            yield writer.writerow(row)
+    
+    @staticmethod
+    def ndjson_lines(orders):
+        """Yield the export as newline-delimited JSON, one order per line"""
+        for order_id, product_name, quantity, unit_price, line_total, order_status, username, created_at, shipped_at in OrderService.export_records(orders):
+            yield json.dumps({
+                'id': order_id,
+                'product': product_name,
+                'quantity': quantity,
+                'unit_price': str(unit_price) if unit_price is not None else None,
+                'line_total': str(line_total) if line_total is not None else None,
+                'status': order_status,
+                'created_by': username,
+                'created_at': created_at.isoformat(),
+                'shipped_at': shipped_at.isoformat() if shipped_at else None,
+            }) + '\n'
+    
+    @staticmethod
+    def chunked(lines, compress=False):
+        """
+        Group text lines into ~64 KB byte chunks for the streaming response.
+        With compress=True the chunks are gzip-compressed incrementally, so
+        memory stays flat however large the export is.
+        """
+        compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16) if compress else None
+        buffer, size = [], 0
+        
+        for line in lines:
+            data = line.encode('utf-8')
+            buffer.append(data)
+            size += len(data)
+            if size >= EXPORT_CHUNK_SIZE:
+                chunk = b''.join(buffer)
+                buffer, size = [], 0
+                chunk = compressor.compress(chunk) if compressor else chunk
+                if chunk:
+                    yield chunk
+        
+        chunk = b''.join(buffer)
+        if compressor:
+            chunk = compressor.compress(chunk) + compressor.flush()
+        if chunk:
+            yield chunk
+    
+    @staticmethod
+    def generate_export_response(orders, request, filename_prefix='orders'):
+        """
+        Stream orders in the format the client asked for:
+        - `?format=csv|ndjson|csv.gz|ndjson.gz`, else the Accept header
+          (application/x-ndjson for NDJSON, CSV otherwise)
+        - `.gz` formats download a gzip file; otherwise the body is gzip
+          Content-Encoded when Accept-Encoding allows it
+        Raises ValueError for an unknown format.
+        """
+        export_format = (request.GET.get('format') or '').lower()
+        gzip_file = export_format.endswith('.gz')
+        export_format = export_format.removesuffix('.gz')
+        if not export_format:
+            accept = request.META.get('HTTP_ACCEPT', '')
+            export_format = 'ndjson' if 'application/x-ndjson' in accept else 'csv'
+        
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(
+                f'Unsupported export format "{export_format}". Use csv, ndjson, csv.gz or ndjson.gz.'
+            )
+        
+        content_type, lines = EXPORT_FORMATS[export_format]
+        lines = getattr(OrderService, lines)(orders)
+        encode = not gzip_file and accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        
+        response = StreamingHttpResponse(
+            OrderService.chunked(lines, compress=gzip_file or encode),
+            content_type='application/gzip' if gzip_file else content_type,
+        )
+        if encode:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        
         timestamp = timezone.now().strftime("%Y%m%d_%H%M%S")
-        response['Content-Disposition'] = f'attachment; filename="{filename_prefix}_{timestamp}.csv"'
+        filename = f'{filename_prefix}_{timestamp}.{export_format}' + ('.gz' if gzip_file else '')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    @staticmethod
+    def parse_date_range(params):
+        """
+        Read optional `start` / `end` dates (YYYY-MM-DD, both inclusive) from
+        query params. Returns aware datetimes [start, end), raises ValueError.
+        """
+        bounds = []
+        for name in ('start', 'end'):
+            value = params.get(name)
+            if not value:
+                bounds.append(None)
+                continue
+            
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(f'Invalid {name} date "{value}", expected YYYY-MM-DD.')
+            if name == 'end':
+                day += timedelta(days=1)
+            bounds.append(timezone.make_aware(datetime.combine(day, time.min)))
+        
+        return tuple(bounds)
+    
+    @staticmethod
+    def revenue(orders, group='day'):
+        """
+        Revenue of successful orders grouped by day, month or product, summed
+        from the stored line totals so no product rows are read. `orders` is
+        a queryset or a list of them (hot and archived orders).
+        Raises ValueError for an unknown grouping.
+        """
+        if group not in REVENUE_GROUPS:
+            raise ValueError(f'Unknown grouping "{group}". Use one of: {", ".join(REVENUE_GROUPS)}.')
+        
+        totals = {}
+        querysets = orders if isinstance(orders, (list, tuple)) else [orders]
+        for queryset in querysets:
+            rows = (
+                queryset.filter(status='success').order_by()
+                .values(key=REVENUE_GROUPS[group])
+                .annotate(orders=Count('id'), units=Sum('quantity'), revenue=Sum('line_total'))
+            )
+            for row in rows:
+                total = totals.setdefault(row['key'], {'orders': 0, 'units': 0, 'revenue': Decimal('0.00')})
+                total['orders'] += row['orders']
+                total['units'] += row['units']
+                total['revenue'] += (row['revenue'] or Decimal(0)).quantize(Decimal('0.01'))
+        
+        # Archived orders of purged products group under None, listed last
+        return sorted(totals.items(), key=lambda item: (item[0] is None, item[0]))
+
+
+class ReservationService:
+    """
+    Stock holds for pending orders. A reservation deducts stock like any
+    order, so every availability check (which reads Product.stock) already
+    counts active holds; confirming only hands the order to fulfillment,
+    expiring gives the stock back.
+    """
+    
+    @staticmethod
+    def hold_until():
+        return timezone.now() + timedelta(minutes=settings.ORDER_RESERVATION_MINUTES)
+    
+    @staticmethod
+    def confirm(orders):
+        """
+        Turn the unexpired reservations of a queryset into placed orders:
+        they stay pending, without a deadline, until fulfillment ships them.
+        Returns the confirmed orders.
+        """
+        with transaction.atomic():
+            now = timezone.now()
+            confirmed = list(
+                orders.select_for_update()
+                .filter(status='pending', reserved_until__gte=now)
+                .order_by('id')
+                .prefetch_related('product')
+            )
+            if not confirmed:
+                return []
+            
+            Order.objects.filter(id__in=[order.id for order in confirmed]).update(
+                reserved_until=None, updated_at=now
+            )
+            for order in confirmed:
+                order.reserved_until = None
+                OrderService.notify_created(order)
+        
+        return confirmed
+    
+    @staticmethod
+    def expire_batch(batch_size=500):
+        """
+        Expire up to `batch_size` of the oldest lapsed reservations in one
+        short transaction (an index range scan on status, reserved_until) and
+        give their stock back with one UPDATE for all affected products.
+        Returns the number of orders expired.
+        """
+        with transaction.atomic():
+            now = timezone.now()
+            rows = list(
+                Order.objects.select_for_update()
+                .filter(status='pending', reserved_until__lt=now)
+                .order_by('reserved_until', 'id')
+                .values_list('id', 'product_id', 'quantity')[:batch_size]
+            )
+            if not rows:
+                return 0
+            
+            Order.objects.filter(id__in=[order_id for order_id, _, _ in rows]).update(
+                status='expired', reserved_until=None, updated_at=now
+            )
+            
+            released = Counter()
+            for _, product_id, quantity in rows:
+                released[product_id] += quantity
+            products = {
+                product.id: product
+                for product in Product.objects.select_for_update().filter(id__in=released).order_by('id')
+            }
+            StockService.adjust_locked(products, dict(released), 'release')
         
-        writer = csv.writer(response)
-        writer.writerow(['Order ID', 'Product', 'Quantity', 'Status', 'Created By', 'Created At', 'Shipped At'])
+        return len(rows)
+
+
+class FulfillmentService:
+    """
+    Ship placed orders in the background (the fulfill_orders command).
+    Workers claim the oldest pending orders that are not reservations. Where
+    the database has SKIP LOCKED (MySQL 8, PostgreSQL) parallel workers take
+    disjoint batches; on MySQL 5.7 a worker waits for the other's short claim
+    transaction and then no longer sees those orders as pending. Either way
+    every order is shipped exactly once.
+    """
+    
+    @staticmethod
+    def ship_batch(batch_size=200):
+        """
+        Claim up to `batch_size` pending orders, plus the other lines of any
+        cart among them so each cart gets one email, mark them shipped with
+        one UPDATE and send their confirmations once committed.
+        Returns the shipped orders.
+        """
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        with transaction.atomic():
+            pending = Order.objects.select_for_update(skip_locked=skip_locked).filter(
+                status='pending', reserved_until__isnull=True
+            )
+            rows = list(pending.order_by('id').values_list('id', 'cart_id')[:batch_size])
+            if not rows:
+                return []
+            
+            order_ids = {order_id for order_id, _ in rows}
+            carts = {cart_id for _, cart_id in rows if cart_id}
+            if carts:
+                order_ids.update(pending.filter(cart_id__in=carts).order_by().values_list('id', flat=True))
+            
+            now = timezone.now()
+            Order.objects.filter(id__in=order_ids).update(status='success', shipped_at=now, updated_at=now)
         
+        shipped = list(
+            Order.objects.filter(id__in=order_ids)
+            .select_related('product', 'created_by', 'cart')
+            .order_by('id')
+        )
+        FulfillmentService.send_confirmations(shipped)
+        return shipped
+    
+    @staticmethod
+    def send_confirmations(orders):
+        """One email per cart or single order, and a status event per order"""
+        lines = {}
         for order in orders:
-            writer.writerow([
-                order.id,
-                order.product.name,
-                order.quantity,
-                order.get_status_display(),
-                order.created_by.username if order.created_by else 'N/A',
-                order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                order.shipped_at.strftime('%Y-%m-%d %H:%M:%S') if order.shipped_at else 'N/A',
-            ])
+            if order.cart_id:
+                lines.setdefault(order.cart_id, []).append(order)
+            elif order.created_by:
+                OrderService.log_confirmation_email(order, order.created_by)
+            OrderService.notify_created(order)
         
-        return response
+        for cart_lines in lines.values():
+            if cart_lines[0].created_by:
+                OrderService.log_cart_confirmation(cart_lines[0].cart, cart_lines, cart_lines[0].created_by)
+
 
+class OrderArchiveService:
+    """Move old orders to ArchivedOrder and read hot + archived orders together"""
+    
+    @staticmethod
+    def cutoff(days=None):
+        """Orders placed before this moment belong in the archive"""
+        if days is None:
+            days = settings.ORDER_ARCHIVE_AFTER_DAYS
+        return timezone.now() - timedelta(days=days)
+    
+    @staticmethod
+    def archive_batch(cutoff, batch_size=500):
+        """
+        Archive up to `batch_size` of the oldest orders placed before `cutoff`.
+        Each batch is its own short transaction that only locks the rows it
+        moves. Returns the number of orders archived.
+        """
+        with transaction.atomic():
+            orders = list(
+                Order.objects.select_for_update()
+                .filter(created_at__lt=cutoff)
+                .order_by('created_at', 'id')[:batch_size]
+            )
+            if not orders:
+                return 0
+            
+            OrderArchiveService.archive_orders(orders)
+        
+        return len(orders)
+    
+    @staticmethod
+    def archive_orders(orders):
+        """Copy a list of orders into ArchivedOrder and delete them; call inside a transaction"""
+        product_names = dict(
+            Product.objects.filter(id__in={order.product_id for order in orders})
+            .values_list('id', 'name')
+        )
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                id=order.id,
+                product_id=order.product_id,
+                product_name=product_names.get(order.product_id, ''),
+                quantity=order.quantity,
+                status=order.status,
+                unit_price=order.unit_price,
+                line_total=order.line_total,
+                created_by_id=order.created_by_id,
+                created_at=order.created_at,
+                shipped_at=order.shipped_at,
+                archive_month=order.created_at.date().replace(day=1),
+            )
+            for order in orders
+        ])
+        Order.objects.filter(id__in=[order.id for order in orders]).delete()
+    
+    @staticmethod
+    def orders_for(company, start=None, end=None):
+        """
+        Orders of a company placed in [start, end), newest first, as a list of
+        querysets: the hot table, plus the archive when the range reaches back
+        into it (one index probe on ArchivedOrder.created_at decides).
+        """
+        hot = Order.objects.for_company(company)
+        archived = ArchivedOrder.objects.filter(created_by__company=company)
+        
+        if start:
+            hot = hot.filter(created_at__gte=start)
+            archived = archived.filter(created_at__gte=start)
+        if end:
+            hot = hot.filter(created_at__lt=end)
+            archived = archived.filter(created_at__lt=end)
+        
+        querysets = [hot.order_by('-created_at')]
+        if start is None or ArchivedOrder.objects.filter(created_at__gte=start).exists():
+            querysets.append(archived.order_by('-created_at'))
+        
+        return querysets
+
+
+class OrderImportService:
+    """Bulk order import from CSV: validate across a process pool, commit in batches"""
+    
+    @staticmethod
+    def read_rows(stream):
+        """
+        Read a CSV with `Product` (name) and `Quantity` columns, as produced by
+        the export. Returns (header, rows) where rows are (line, product name,
+        quantity, raw row). Raises ValueError when a column is missing.
+        """
+        reader = csv.reader(stream)
+        header = next(reader, None) or []
+        columns = [column.strip().lower() for column in header]
+        if 'product' not in columns or 'quantity' not in columns:
+            raise ValueError('CSV needs "Product" and "Quantity" columns')
+        
+        product_column = columns.index('product')
+        quantity_column = columns.index('quantity')
+        rows = []
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            padded = row + [''] * (len(header) - len(row))
+            rows.append((reader.line_num, padded[product_column], padded[quantity_column], row))
+        return header, rows
+    
+    @staticmethod
+    def catalog(company):
+        """Normalised product name -> id for the company's active products"""
+        return {
+            product_key(name): product_id
+            for product_id, name in Product.objects.for_company(company).active().values_list('id', 'name')
+        }
+    
+    @staticmethod
+    def validate(rows, catalog, workers=1, chunk_size=IMPORT_CHUNK_SIZE):
+        """
+        Validate rows in chunks, in `workers` processes when there is more
+        than one chunk. Returns (valid, errors) in file order.
+        """
+        chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(catalog,)) as pool:
+                results = list(pool.map(validate_rows, chunks))
+        else:
+            results = [validate_rows(chunk, catalog) for chunk in chunks]
+        
+        valid = [row for chunk_valid, _ in results for row in chunk_valid]
+        errors = [error for _, chunk_errors in results for error in chunk_errors]
+        return valid, errors
+    
+    @staticmethod
+    def commit_batch(batch, user, raw_rows):
+        """
+        Create one batch of validated orders in a single transaction. The
+        batch's products are locked in ascending id order (so concurrent
+        imports cannot deadlock), rows that no longer fit the remaining stock
+        are rejected, and stock is deducted once per product with a single
+        UPDATE. Returns (orders created, errors).
+        """
+        errors = []
+        with transaction.atomic():
+            products = {
+                product.id: product
+                for product in Product.objects.for_company(user.company).active()
+                .select_for_update()
+                .filter(id__in={product_id for _, product_id, _ in batch})
+                .order_by('id')
+            }
+            available = {product_id: product.stock for product_id, product in products.items()}
+            
+            accepted = []
+            for line, product_id, quantity in batch:
+                if product_id not in products:
+                    errors.append((line, raw_rows[line], 'Product is no longer available'))
+                elif quantity > available[product_id]:
+                    errors.append((line, raw_rows[line],
+                                   f'Insufficient stock. Available: {available[product_id]}'))
+                else:
+                    available[product_id] -= quantity
+                    accepted.append((product_id, quantity))
+            
+            if not accepted:
+                return 0, errors
+            
+            Order.objects.bulk_create([
+                Order(product_id=product_id, quantity=quantity, status='pending',
+                      unit_price=products[product_id].price,
+                      line_total=products[product_id].price * quantity,
+                      created_by=user)
+                for product_id, quantity in accepted
+            ])
+            
+            totals = Counter()
+            for product_id, quantity in accepted:
+                totals[product_id] += quantity
+            StockService.adjust_locked(
+                products, {product_id: -quantity for product_id, quantity in totals.items()},
+                'order', user=user
+            )
+        
+        return len(accepted), errors
+    
+    @staticmethod
+    def import_csv(stream, user, workers=1, batch_size=500):
+        """
+        Import an order CSV for `user`'s company. Returns (header, created,
+        errors) with errors as (line, raw row, message) sorted by line.
+        """
+        header, rows = OrderImportService.read_rows(stream)
+        raw_rows = {line: raw for line, _, _, raw in rows}
+        valid, errors = OrderImportService.validate(
+            rows, OrderImportService.catalog(user.company), workers
+        )
+        
+        created = 0
+        for start in range(0, len(valid), batch_size):
+            batch = valid[start:start + batch_size]
+            try:
+                count, batch_errors = OrderImportService.commit_batch(batch, user, raw_rows)
+            except ValueError as e:
+                # Flash-sale slots can run dry between the check and the deduction
+                count, batch_errors = 0, [(line, raw_rows[line], str(e)) for line, _, _ in batch]
+            created += count
+            errors.extend(batch_errors)
+        
+        errors.sort(key=lambda error: error[0])
+        if created:
+            logger.info(f"ORDER IMPORT: {created} order(s) imported by {user.username}, {len(errors)} row(s) rejected")
+        return header, created, errors
+    
+    @staticmethod
+    def write_errors(stream, header, errors):
+        """Write rejected rows as CSV: line number, the original columns, error"""
+        writer = csv.writer(stream)
+        writer.writerow(['Line'] + list(header) + ['Error'])
+        for line, raw, message in errors:
+            writer.writerow([line] + list(raw) + [message])
 
 
 @method_decorator(login_required, name='dispatch')
@@ -103,18 +915,28 @@ class OrderCreateView(View):
             return redirect('index')
         
         try:
-            product_id = request.POST.get('product')
-            quantity = int(request.POST.get('quantity'))
+            # One product/quantity pair per form line; extra lines make it a cart
+            lines = [
+                (int(product_id), int(quantity))
+                for product_id, quantity in zip(request.POST.getlist('product'), request.POST.getlist('quantity'))
+                if product_id
+            ]
             
-            if not product_id or quantity <= 0:
+            if not lines or any(quantity <= 0 for _, quantity in lines):
                 messages.error(request, 'Invalid product or quantity.')
                 return redirect('index')
             
-            product = Product.objects.get( id=product_id, company=request.user.company, is_active=True)
+            if len(lines) > 1:
+                cart, orders = OrderService.place_cart(lines, request.user)
+                messages.success(request, f'Cart #{cart.id} placed successfully! {len(orders)} product(s), total ${cart.total}')
+                return redirect('index')
+            
+            product_id, quantity = lines[0]
+            product = Product.objects.for_company(request.user.company).active().get(id=product_id)
             order = OrderService.process_order(product, quantity, request.user)
             
             messages.success(request, f'Order #{order.id} placed successfully! {product.name} (x{quantity})')
-            
+        
         except Product.DoesNotExist:
             messages.error(request, 'Product not found.')
         except ValueError as e:
@@ -130,17 +952,26 @@ class OrderExportView(View):
     """Export user's company orders as CSV"""
     
     def get(self, request):
-        orders = Order.objects.filter(
-            created_by__company=request.user.company
-        ).select_related('product', 'created_by').order_by('-created_at')
+        try:
+            start, end = OrderService.parse_date_range(request.GET)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('index')
         
-        return OrderService.generate_csv_response(orders)
+        orders = OrderArchiveService.orders_for(request.user.company, start, end)
+        try:
+            return OrderService.generate_export_response(orders, request)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('index')
 
 
 class OrderCreateAPIView(generics.CreateAPIView):
     """API: Create one or more orders"""
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    # Reservations: orders stay pending and only hold their stock
+    reserve = False
     
     def create(self, request, *args, **kwargs):
         if request.user.role == 'viewer':
@@ -159,19 +990,21 @@ class OrderCreateAPIView(generics.CreateAPIView):
                 serializer = self.get_serializer(data=order_data)
                 try:
                     serializer.is_valid(raise_exception=True)
-                    order = serializer.save(created_by=request.user)
-                    
-                    # Use service to process order
-                    product = order.product
-                    product.stock -= order.quantity
-                    product.save(update_fields=['stock'])
                     
-                    order.status = 'success'
-                    order.shipped_at = timezone.now()
-                    order.save(update_fields=['status', 'shipped_at'])
+                    # Savepoint per order so a failed one leaves nothing behind
+                    with transaction.atomic():
+                        order = serializer.save(
+                            created_by=request.user,
+                            status='pending',
+                            reserved_until=ReservationService.hold_until() if self.reserve else None
+                        )
+                        
+                        # Deduct stock (guarded update + ledger row)
+                        StockService.adjust(order.product, -order.quantity, 'order',
+                                            user=request.user, order=order)
                     
-                    OrderService.log_confirmation_email(order, request.user)
-                    created_orders.append(serializer.data)
+                    OrderService.notify_created(order)
+                    created_orders.append(order)
                 except Exception as e:
                     errors.append(f"Order {index + 1}: {str(e)}")
         
@@ -183,21 +1016,258 @@ class OrderCreateAPIView(generics.CreateAPIView):
         
         return Response({
             'success': True,
-            'created': created_orders,
-            'message': f'{len(created_orders)} order(s) created'
+            'created': order_values_serializer.serialize_objects(created_orders),
+            'message': f'{len(created_orders)} order(s) {"reserved" if self.reserve else "created"}'
         }, status=status.HTTP_201_CREATED)
 
 
+class OrderReserveAPIView(OrderCreateAPIView):
+    """API: Reserve stock for one or more pending orders (confirm them before they expire)"""
+    reserve = True
+
+
+class OrderConfirmAPIView(generics.GenericAPIView):
+    """API: Confirm reserved (pending) orders"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        if request.user.role == 'viewer':
+            return Response(
+                {'error': 'Viewers cannot place orders'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            order_ids = OrderService.parse_ids(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        confirmed = ReservationService.confirm(
+            Order.objects.for_company(request.user.company).filter(id__in=order_ids)
+        )
+        
+        if not confirmed:
+            return Response(
+                {'error': 'No active reservations found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response({
+            'success': True,
+            'confirmed': order_values_serializer.serialize_objects(confirmed),
+            'message': f'{len(confirmed)} order(s) confirmed',
+            'count': len(confirmed)
+        }, status=status.HTTP_200_OK)
+
+
+class CartCreateAPIView(generics.GenericAPIView):
+    """API: Place a multi-product cart ({"lines": [{"product": id, "quantity": n}, ...]})"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        if request.user.role == 'viewer':
+            return Response(
+                {'error': 'Viewers cannot place orders'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            lines = [(int(line['product']), int(line['quantity'])) for line in request.data.get('lines', [])]
+        except (TypeError, KeyError, ValueError, AttributeError):
+            return Response(
+                {'error': 'Each line needs an integer "product" and "quantity"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            cart, orders = OrderService.place_cart(lines, request.user)
+        except CartError as e:
+            return Response({'success': False, 'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            return Response({'success': False, 'errors': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'success': True,
+            'cart': {
+                'id': cart.id,
+                'total': str(cart.total),
+                'created_at': cart.created_at,
+                'lines': order_values_serializer.serialize_objects(orders),
+            },
+            'message': f'Cart #{cart.id} placed with {len(orders)} product(s)'
+        }, status=status.HTTP_201_CREATED)
+
+
+class OrderCancelAPIView(generics.GenericAPIView):
+    """API: Cancel orders and return their stock (bulk operation)"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        if request.user.role == 'viewer':
+            return Response(
+                {'error': 'Viewers cannot cancel orders'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            order_ids = OrderService.parse_ids(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        count = OrderService.cancel(Order.objects.filter(id__in=order_ids), request.user)
+        
+        if not count:
+            return Response(
+                {'error': 'No orders you can cancel were found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response({
+            'success': True,
+            'message': f'{count} order(s) cancelled',
+            'count': count,
+            'skipped': len(order_ids) - count
+        }, status=status.HTTP_200_OK)
+
+
+class OrderImportAPIView(generics.GenericAPIView):
+    """API: Import orders from an uploaded CSV file (`file`)"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        if request.user.role == 'viewer':
+            return Response(
+                {'error': 'Viewers cannot place orders'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No CSV file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+            _, created, errors = OrderImportService.import_csv(
+                stream, request.user, workers=settings.ORDER_IMPORT_WORKERS
+            )
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        errors = [{'line': line, 'error': message} for line, _, message in errors]
+        if errors and not created:
+            return Response({'success': False, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'success': True,
+            'count': created,
+            'errors': errors,
+            'message': f'{created} order(s) imported, {len(errors)} row(s) rejected'
+        }, status=status.HTTP_201_CREATED)
+
+
+class OrderRevenueAPIView(generics.GenericAPIView):
+    """API: Revenue of the company's orders by day, month or product"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, *args, **kwargs):
+        group = request.query_params.get('group', 'day')
+        try:
+            start, end = OrderService.parse_date_range(request.query_params)
+            rows = OrderService.revenue(OrderArchiveService.orders_for(request.user.company, start, end), group)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'group': group,
+            'orders': sum(total['orders'] for _, total in rows),
+            'units': sum(total['units'] for _, total in rows),
+            'revenue': str(sum((total['revenue'] for _, total in rows), Decimal('0.00'))),
+            'rows': [
+                {
+                    group: key if group == 'product' else key.isoformat()[:10],
+                    'orders': total['orders'],
+                    'units': total['units'],
+                    'revenue': str(total['revenue']),
+                }
+                for key, total in rows
+            ],
+        }, status=status.HTTP_200_OK)
+
+
 class OrderExportAPIView(generics.GenericAPIView):
-    """API: Export orders as CSV"""
+    """API: Export orders as CSV or NDJSON, optionally gzip-compressed"""
     permission_classes = [IsAuthenticated]
+    content_negotiation_class = ExportContentNegotiation
     
     def get(self, request, *args, **kwargs):
-        orders = Order.objects.filter(
-            created_by__company=request.user.company
-        ).select_related('product', 'created_by')
+        try:
+            start, end = OrderService.parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return OrderService.generate_csv_response(orders)
+        orders = OrderArchiveService.orders_for(request.user.company, start, end)
+        try:
+            return OrderService.generate_export_response(orders, request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DeltaSyncAPIView(generics.GenericAPIView):
+    """
+    API: Products and orders of the user's company changed since a cursor.
+    
+    GET /api/sync/?cursor=<opaque>&limit=500
+    Omit the cursor for a full initial sync. Keep calling with the returned
+    cursor while `has_more` is true. Soft-deleted products come back with
+    is_active=false. Rows changed in the last SYNC_SETTLE_SECONDS are held
+    back until the next call so late commits with an earlier timestamp are
+    never skipped.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            cursor = SyncCursor.decode(request.query_params.get('cursor'))
+        except ValueError:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            limit = int(request.query_params.get('limit', SYNC_PAGE_SIZE))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response(
+                {'error': f'limit must be a whole number from 1 to {SYNC_PAGE_SIZE}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(limit, SYNC_PAGE_SIZE)
+        
+        settled = timezone.now() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+        company_id = request.user.company_id
+        
+        products = SyncCursor.changed(
+            Product.objects.for_company(company_id), 'last_updated_at', cursor['products'], settled
+        )[:limit + 1]
+        orders = SyncCursor.changed(
+            Order.objects.for_company(company_id).select_related('product'),
+            'updated_at', cursor['orders'], settled
+        )[:limit + 1]
+        
+        products, orders = list(products), list(orders)
+        has_more = len(products) > limit or len(orders) > limit
+        products, orders = products[:limit], orders[:limit]
+        
+        if products:
+            cursor['products'] = (products[-1].last_updated_at, products[-1].id)
+        if orders:
+            cursor['orders'] = (orders[-1].updated_at, orders[-1].id)
+        
+        return Response({
+            'products': product_values_serializer.serialize_objects(products),
+            'orders': order_values_serializer.serialize_objects(orders),
+            'cursor': SyncCursor.encode(cursor),
+            'has_more': has_more,
+        })
 
 
 # Convert class-based views to function-based for URL routing
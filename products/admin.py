@@ -1,27 +1,39 @@
-from django.contrib import admin
-from .models import Product
+from django.contrib import admin, messages
+from django.utils import timezone
+from .models import Product, StockMovement
+from .views import ProductService, StockService
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'company', 'price', 'stock', 'is_active', 'created_by', 'created_at']
+    list_display = ['name', 'company', 'price', 'stock', 'days_until_stockout', 'is_active', 'created_by', 'created_at']
     list_filter = ['company', 'is_active', 'created_at']
     search_fields = ['name', 'company__name']
-    readonly_fields = ['created_by', 'created_at', 'last_updated_at']
+    readonly_fields = ['created_by', 'created_at', 'last_updated_at', 'deactivated_at',
+                       'consumption_rate', 'rate_updated_at', 'days_until_stockout']
+    list_select_related = ['company', 'created_by__company']
     
-    actions = ['mark_inactive']
+    actions = ['mark_inactive', 'mark_active']
     
     def mark_inactive(self, request, queryset):
         """Bulk action: mark selected products inactive (soft-delete)"""
         # Only allow users to soft-delete their own company's products
-        if not request.user.is_superuser:
-            queryset = queryset.filter(company=request.user.company)
+        queryset = queryset.visible_to(request.user)
         
-        count = queryset.update(is_active=False)
+        count = ProductService.deactivate(queryset)
         self.message_user(request, f'{count} product(s) marked as inactive.')
     
     mark_inactive.short_description = "Mark selected products inactive"
     
+    def mark_active(self, request, queryset):
+        """Bulk action: restore soft-deleted products"""
+        queryset = queryset.visible_to(request.user)
+        
+        count = ProductService.restore(queryset)
+        self.message_user(request, f'{count} product(s) restored.')
+    
+    mark_active.short_description = "Restore selected inactive products"
+    
     def save_model(self, request, obj, form, change):
         """Auto-fill created_by and company when creating new product"""
         if not change:
@@ -29,17 +41,43 @@ class ProductAdmin(admin.ModelAdmin):
             # Auto-fill company from user if not set
             if not obj.company:
                 obj.company = request.user.company
-        super().save_model(request, obj, form, change)
+            # Slots are split from the initial stock once the product exists
+            slots, obj.stock_slots = obj.stock_slots, 0
+            super().save_model(request, obj, form, change)
+            if obj.stock:
+                StockMovement.objects.create(product=obj, delta=obj.stock,
+                                             reason='restock', created_by=request.user)
+            if slots:
+                StockService.configure_slots(obj, slots)
+            return
+        
+        # Stock edits are applied as a delta on the live value (orders may have
+        # moved it since the form was loaded) and recorded in the ledger
+        fields = [name for name in form.changed_data if name not in ('stock', 'stock_slots')]
+        if 'is_active' in fields:
+            obj.deactivated_at = None if obj.is_active else timezone.now()
+            fields.append('deactivated_at')
+        obj.save(update_fields=fields + ['last_updated_at'])
+        
+        # The stock delta goes onto the slot layout still in the database;
+        # configure_slots() then splits the resulting total over the new one
+        slots, obj.stock_slots = obj.stock_slots, form.initial.get('stock_slots', obj.stock_slots)
+        if 'stock' in form.changed_data:
+            delta = obj.stock - form.initial['stock']
+            try:
+                StockService.adjust(obj, delta, 'adjustment', user=request.user)
+            except ValueError as e:
+                self.message_user(request, str(e), messages.ERROR)
+        
+        if slots != obj.stock_slots:
+            StockService.configure_slots(obj, slots)
     
     def get_queryset(self, request):
         """
         Data isolation: Users only see products from their company.
         Superuser sees all products.
         """
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(company=request.user.company)
+        return super().get_queryset(request).visible_to(request.user)
     
     def has_change_permission(self, request, obj=None):
         """
@@ -81,3 +119,35 @@ class ProductAdmin(admin.ModelAdmin):
     def has_module_permission(self, request):
         """Allow staff users to access this module"""
         return request.user.is_staff or request.user.is_superuser
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """Read-only view of the stock ledger"""
+    list_display = ['product', 'delta', 'reason', 'order', 'created_by', 'created_at']
+    list_filter = ['reason', 'created_at', 'product__company']
+    search_fields = ['product__name', 'created_by__username']
+    list_select_related = ['product__company', 'order__product', 'created_by__company']
+    
+    def get_queryset(self, request):
+        """
+        Data isolation: Users only see movements of their company's products.
+        """
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(product__company=request.user.company)
+    
+    def has_add_permission(self, request):
+        """Ledger rows are only written by the stock service"""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def has_module_permission(self, request):
+        """Allow staff users to access this module"""
+        return request.user.is_staff or request.user.is_superuser
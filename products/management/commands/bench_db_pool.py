@@ -0,0 +1,140 @@
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from core.dbpool import ConnectionPool
+
+
+class LatencyConnection:
+    """Stand-in for a remote MySQL connection: every round trip sleeps one RTT"""
+    
+    def __init__(self, rtt, handshake_trips):
+        self.rtt = rtt
+        time.sleep(rtt * handshake_trips)
+    
+    def query(self):
+        time.sleep(self.rtt)
+    
+    def ping(self):
+        time.sleep(self.rtt)
+    
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-request latency of opening a database connection for every "
+        "request against taking one from the connection pool. By default the "
+        "database is a stand-in that sleeps --rtt-ms per round trip (a connection "
+        "costs --handshake-trips of them: TCP, TLS, authentication, init_command); "
+        "--database runs against a real MySQL alias instead."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--queries', type=int, default=3, help='Queries per request')
+        parser.add_argument('--rtt-ms', type=float, default=20, help='Stand-in round trip time')
+        parser.add_argument('--handshake-trips', type=int, default=5, help='Stand-in round trips per new connection')
+        parser.add_argument('--pool-size', type=int, default=8)
+        parser.add_argument('--ping-after', type=float, default=1, help='Seconds idle before a pre-ping')
+        parser.add_argument('--database', help='Benchmark this MySQL database alias instead of the stand-in')
+    
+    def handle(self, *args, **options):
+        if options['database']:
+            wrapper = connections[options['database']]
+            if wrapper.vendor != 'mysql':
+                raise CommandError(f'{options["database"]} is not a MySQL database.')
+            from django.db.backends.mysql.base import Database
+            params = wrapper.get_connection_params()
+            connect = lambda: Database.connect(**params)
+            
+            def query(connection):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchall()
+            
+            self.stdout.write(f'Database {options["database"]} ({wrapper.settings_dict["HOST"]})')
+        else:
+            rtt = options['rtt_ms'] / 1000
+            connect = lambda: LatencyConnection(rtt, options['handshake_trips'])
+            query = LatencyConnection.query
+            self.stdout.write(
+                f'Stand-in database: {options["rtt_ms"]:g} ms round trips, '
+                f'{options["handshake_trips"]} per new connection'
+            )
+        
+        def direct():
+            connection = connect()
+            try:
+                for _ in range(options['queries']):
+                    query(connection)
+            finally:
+                connection.close()
+        
+        pool = ConnectionPool(
+            connect, size=options['pool_size'], ping_after=options['ping_after'], leak_after=0
+        )
+        
+        def pooled():
+            connection = pool.acquire()
+            try:
+                for _ in range(options['queries']):
+                    query(connection)
+            finally:
+                pool.release(connection)
+        
+        results = {}
+        for mode, request in (('connect', direct), ('pooled', pooled)):
+            results[mode] = self.run(mode, request, options)
+        pool.close_idle()
+        
+        saved = results['connect'] - results['pooled']
+        self.stdout.write(self.style.SUCCESS(
+            f'Pooling saves {saved:.2f} ms per request ({saved / results["connect"] * 100:.0f}%).'
+        ))
+        stats = pool.stats()
+        self.stdout.write(
+            f'Pool: {stats["connects"]} connects, {stats["reuses"]} reuses, '
+            f'{stats["ping_failures"]} failed pings, avg wait {stats["avg_wait_ms"]} ms'
+        )
+    
+    def run(self, mode, request, options):
+        """Serve --requests requests from --threads threads; returns the mean latency in ms"""
+        remaining = iter(range(options['requests']))
+        lock = threading.Lock()
+        latencies, errors = [], []
+        
+        def worker():
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                started = time.perf_counter()
+                try:
+                    request()
+                    latencies.append(time.perf_counter() - started)
+                except Exception as e:
+                    errors.append(str(e))
+        
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        
+        latencies.sort()
+        mean = sum(latencies) / len(latencies) * 1000 if latencies else 0
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        
+        self.stdout.write(
+            f'{mode:>8}: {len(latencies) / elapsed:8.1f} requests/s  mean {mean:7.2f} ms  '
+            f'p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  errors {len(errors)}'
+        )
+        if errors:
+            self.stdout.write(f'  first error: {errors[0]}')
+        return mean
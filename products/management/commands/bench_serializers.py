@@ -0,0 +1,70 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+from companies.models import Company
+from users.models import User
+from orders.models import Order
+from orders.serializers import OrderSerializer, order_values_serializer
+from products.models import Product
+from products.serializers import ProductSerializer, product_values_serializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the DRF ModelSerializer path with the values_list() fast path "
+        "for product and order listings on a throwaway test database, and check "
+        "both produce identical JSON."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+    
+    def handle(self, *args, **options):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.seed(options['rows'])
+            products = Product.objects.order_by('-created_at')
+            orders = Order.objects.select_related('product').order_by('-created_at')
+            
+            self.compare('products', options['repeat'],
+                         lambda: ProductSerializer(products, many=True).data,
+                         lambda: product_values_serializer.serialize(products))
+            self.compare('orders', options['repeat'],
+                         lambda: OrderSerializer(orders, many=True).data,
+                         lambda: order_values_serializer.serialize(orders))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+    
+    def seed(self, rows):
+        company = Company.objects.create(name='Bench Co')
+        user = User.objects.create_user('bench', company=company, role='admin')
+        Product.objects.bulk_create([
+            Product(company=company, name=f'Product {index}', price='12.50', stock=100, created_by=user)
+            for index in range(rows)
+        ])
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        Order.objects.bulk_create([
+            Order(product_id=product_ids[index % len(product_ids)], quantity=1,
+                  unit_price='12.50', line_total='12.50',
+                  status='success', created_by=user)
+            for index in range(rows)
+        ])
+    
+    def compare(self, label, repeat, model_path, values_path):
+        if [dict(item) for item in model_path()] != values_path():
+            raise CommandError(f'{label}: fast path output differs from the ModelSerializer')
+        
+        timings = {}
+        for name, run in (('ModelSerializer', model_path), ('values fast path', values_path)):
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+            self.stdout.write(f'{label:>9} {name:<17}: {best * 1000:8.1f} ms')
+        
+        speedup = timings['ModelSerializer'] / timings['values fast path']
+        self.stdout.write(self.style.SUCCESS(f'{label:>9} speedup: {speedup:.1f}x, identical output'))
@@ -0,0 +1,108 @@
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from core.testing import throwaway_databases
+from companies.models import Company
+from users.models import User
+from orders.models import Order
+from orders.views import OrderService
+from products.models import Product
+from products.views import StockService
+
+
+class Command(BaseCommand):
+    help = (
+        "Multi-threaded load test: place concurrent orders on one product with "
+        "and without flash-sale stock slots and compare throughput. Runs "
+        "against a throwaway test database (use MySQL for meaningful numbers: "
+        "SQLite serializes all writers, so slots can't help there). Fails when "
+        "more than --max-error-rate of the orders error out."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--orders', type=int, default=400, help='Orders per run')
+        parser.add_argument('--slots', type=int, default=8)
+        parser.add_argument('--quantity', type=int, default=1, help='Units per order')
+        parser.add_argument('--max-error-rate', type=float, default=0.01)
+    
+    def handle(self, *args, **options):
+        failed = []
+        with throwaway_databases():
+            company = Company.objects.create(name='Bench Co')
+            user = User.objects.create_user('bench', company=company, role='operator')
+            
+            for slots in (0, options['slots']):
+                if not self.run(company, user, slots, options):
+                    failed.append(f'{slots} slots' if slots else 'single row')
+        
+        if failed:
+            raise CommandError(
+                f'Error rate above {options["max_error_rate"]:.1%} for: {", ".join(failed)}. '
+                'Throughput of those runs only counts the orders that succeeded.'
+            )
+    
+    def run(self, company, user, slots, options):
+        """One run; False when too many orders failed or the stock doesn't add up"""
+        total_orders, quantity = options['orders'], options['quantity']
+        initial = total_orders * quantity
+        product = Product.objects.create(
+            company=company, name=f'Flash sale x{slots}', price='1.00', stock=initial
+        )
+        if slots:
+            StockService.configure_slots(product, slots)
+        
+        remaining = iter(range(total_orders))
+        lock = threading.Lock()
+        latencies, errors = [], []
+        
+        def worker():
+            local_product = Product.objects.get(pk=product.pk)
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    started = time.perf_counter()
+                    try:
+                        OrderService.process_order(local_product, quantity, user)
+                        latencies.append(time.perf_counter() - started)
+                    except Exception as e:
+                        errors.append(str(e))
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        
+        StockService.sync_slots(Product.objects.filter(pk=product.pk))
+        product.refresh_from_db()
+        ordered = Order.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        error_rate = len(errors) / total_orders
+        mode = f'{slots} slots' if slots else 'single row'
+        
+        line = (
+            f'{mode:>12}: {len(latencies) / elapsed:8.1f} orders/s  '
+            f'p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  errors {len(errors)} ({error_rate:.1%})'
+        )
+        ok = error_rate <= options['max_error_rate']
+        self.stdout.write(line if ok else self.style.ERROR(line))
+        if errors:
+            self.stdout.write(f'  first error: {errors[0]}')
+        if ordered + product.stock != initial:
+            ok = False
+            self.stdout.write(self.style.ERROR(
+                f'  stock mismatch: {initial} initial, {ordered} ordered, {product.stock} left'
+            ))
+        return ok
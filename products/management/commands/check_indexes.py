@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.indexes import check
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot tenant queries (product list, dashboard, low stock, sync, "
+        "orders, users) and fail if one doesn't use its composite index. Run it in "
+        "CI against the production database engine after migrating."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--company', type=int, default=1, help='Company id to plan the queries for')
+    
+    def handle(self, *args, **options):
+        misses = 0
+        for name, expected, used, plan in check(options['company'], options['database']):
+            if used:
+                self.stdout.write(f'{name:<16} {expected}')
+                continue
+            misses += 1
+            self.stdout.write(self.style.ERROR(f'{name:<16} {expected} NOT USED'))
+            self.stdout.write(plan)
+        
+        if misses:
+            raise CommandError(f'{misses} hot query(ies) not using their index.')
+        self.stdout.write(self.style.SUCCESS('All hot queries use their indexes.'))
@@ -0,0 +1,47 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from products.views import ProductService
+
+
+class Command(BaseCommand):
+    help = (
+        "Permanently remove products soft-deleted more than PRODUCT_PURGE_AFTER_DAYS "
+        "ago, together with their orders (deleted, or moved to the archive with "
+        "--archive-orders). Works in small id-ordered batches with pauses so live "
+        "tables are never locked for long."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.PRODUCT_PURGE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--pause', type=float, default=0.2, help='Seconds to sleep between batches')
+        parser.add_argument('--max-batches', type=int, default=0, help='Stop after this many batches (0 = no limit)')
+        parser.add_argument('--archive-orders', action='store_true',
+                            help='Move the orders of purged products to the archive instead of deleting them')
+    
+    def handle(self, *args, **options):
+        cutoff = ProductService.purge_cutoff(options['older_than_days'])
+        products = orders = batches = 0
+        
+        while True:
+            purged, removed = ProductService.purge_batch(
+                cutoff, options['batch_size'], archive_orders=options['archive_orders']
+            )
+            if not purged and not removed:
+                break
+            
+            products += purged
+            orders += removed
+            batches += 1
+            self.stdout.write(f'Batch {batches}: {purged} product(s), {removed} order(s) removed')
+            
+            if options['max_batches'] and batches >= options['max_batches']:
+                break
+            time.sleep(options['pause'])
+        
+        action = 'archived' if options['archive_orders'] else 'deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{products} product(s) inactive since before {cutoff:%Y-%m-%d %H:%M} purged, '
+            f'{orders} order(s) {action}.'
+        ))
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from products.views import ForecastService
+
+
+class Command(BaseCommand):
+    help = (
+        "Decay consumption rates that orders haven't touched lately and fold the "
+        "ledger into flash-sale products. --rebuild recomputes every product from "
+        "the ledger (first run after upgrading). Run it hourly."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between batches')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute all rates from the ledger')
+    
+    def handle(self, *args, **options):
+        batches = 0
+        last_id = 0
+        while True:
+            last_id = ForecastService.refresh_batch(last_id, options['batch_size'], rebuild=options['rebuild'])
+            if last_id is None:
+                break
+            batches += 1
+            time.sleep(options['pause'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Stock forecasts refreshed in {batches} batch(es).'))
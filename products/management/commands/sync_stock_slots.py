@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from products.views import StockService
+
+
+class Command(BaseCommand):
+    help = "Refresh the stock snapshot of flash-sale products from their counter slots"
+    
+    def handle(self, *args, **options):
+        count = StockService.sync_slots()
+        self.stdout.write(self.style.SUCCESS(f'{count} flash-sale product(s) synced.'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.13 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_stock_slots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['company', 'last_updated_at', 'id'], name='products_pr_company_0c7f9b_idx'),
+        ),
+    ]
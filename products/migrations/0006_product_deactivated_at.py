@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-19 05:25
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_deactivated_at(apps, schema_editor):
+    """Products soft-deleted before this field existed start their retention at their last update"""
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(is_active=False).update(deactivated_at=F('last_updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_sync_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='deactivated_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_deactivated_at, migrations.RunPython.noop),
+    ]
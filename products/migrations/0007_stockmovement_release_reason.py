@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-19 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_deactivated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='reason',
+            field=models.CharField(choices=[('order', 'Order'), ('restock', 'Restock'), ('adjustment', 'Admin edit'), ('cancellation', 'Cancellation'), ('release', 'Reservation released')], max_length=20),
+        ),
+    ]
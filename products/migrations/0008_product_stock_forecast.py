@@ -0,0 +1,32 @@
+# Generated by Django 4.1.13 on 2026-10-19 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_stockmovement_release_reason'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='consumption_rate',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='days_until_stockout',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rate_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['company', 'days_until_stockout'], name='products_pr_company_53c176_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.13 on 2026-10-19 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_stock_forecast'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['company', 'created_at'], name='product_company_created'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['company', 'is_active', 'created_at'], name='product_company_active_created'),
+        ),
+    ]
@@ -2,6 +2,23 @@ from django.db import models
 from django.conf  import settings
 # Create your models here.
 
+class ProductQuerySet(models.QuerySet):
+    """Tenant scoping for products; the composite indexes on Product match these"""
+    
+    def for_company(self, company):
+        """A company's products, newest first (company, [is_active,] created_at indexes)"""
+        return self.filter(company=company).order_by('-created_at')
+    
+    def active(self):
+        return self.filter(is_active=True)
+    
+    def visible_to(self, user):
+        """Everything for superusers, the user's company otherwise (ordering untouched)"""
+        if user.is_superuser:
+            return self
+        return self.filter(company=user.company)
+
+
 class Product(models.Model):
     company = models.ForeignKey( 'companies.Company',
                                 on_delete= models.CASCADE, related_name='products')
@@ -18,10 +35,88 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     last_updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # When the product was soft-deleted; the purge job counts retention from here
+    deactivated_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
+    # Flash-sale mode: when > 0 the available stock lives in this many
+    # StockSlot counters and `stock` is a snapshot refreshed on rebalance
+    stock_slots = models.PositiveSmallIntegerField(default=0)
+    
+    # Stock velocity: exponentially decayed units ordered per day as of
+    # rate_updated_at, kept current by ForecastService on every stock change
+    consumption_rate = models.FloatField(default=0)
+    rate_updated_at = models.DateTimeField(null=True, blank=True)
+    # stock / consumption_rate; empty until the product is first ordered
+    days_until_stockout = models.FloatField(null=True, blank=True)
+    
+    objects = ProductQuerySet.as_manager()
     
     class Meta:
         ordering = ['name']
         unique_together = ['company', 'name']
+        indexes = [
+            # delta sync: changes of one company after a cursor
+            models.Index(fields=['company', 'last_updated_at', 'id']),
+            # low-stock list: a company's products soonest to run out first
+            models.Index(fields=['company', 'days_until_stockout']),
+            # for_company(): the dashboard (all products) and the API (active ones), newest first
+            models.Index(fields=['company', 'created_at'], name='product_company_created'),
+            models.Index(fields=['company', 'is_active', 'created_at'], name='product_company_active_created'),
+        ]
         
     def __str__(self):
-        return f"{self.name} ({self.company.name})"
\ No newline at end of file
+        return f"{self.name} ({self.company.name})"
+
+class StockSlot(models.Model):
+    """One counter slot of a product's stock in flash-sale (sharded) mode"""
+    product = models.ForeignKey('products.Product',
+                                on_delete=models.CASCADE,
+                                related_name='slots')
+    slot = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['product', 'slot']
+        unique_together = ['product', 'slot']
+    
+    def __str__(self):
+        return f"{self.product.name} slot {self.slot}: {self.stock}"
+
+
+class StockMovement(models.Model):
+    """Append-only ledger row: one entry per change to a product's stock"""
+    REASON_CHOICES = (
+        ('order', 'Order'),
+        ('restock', 'Restock'),
+        ('adjustment', 'Admin edit'),
+        ('cancellation', 'Cancellation'),
+        ('release', 'Reservation released'),
+    )
+    
+    product = models.ForeignKey('products.Product',
+                                on_delete=models.CASCADE,
+                                related_name='stock_movements')
+    
+    order = models.ForeignKey('orders.Order',
+                              on_delete=models.SET_NULL,
+                              null=True, blank=True,
+                              related_name='stock_movements')
+    
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL,
+                                   on_delete=models.SET_NULL,
+                                   null=True,
+                                   related_name='stock_movements')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name}: {self.delta:+d} ({self.get_reason_display()})"
@@ -1,10 +1,14 @@
 from rest_framework import serializers
+from core.serializers import ValuesSerializer
 from .models import Product
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ['id', 'name', 'price', 'stock', 'created_at', 'last_updated_at', 'is_active']
-        read_only_fields = ['created_at', 'last_updated_at']
-        
+        fields = ['id', 'name', 'price', 'stock', 'consumption_rate', 'days_until_stockout',
+                  'created_at', 'last_updated_at', 'is_active']
+        read_only_fields = ['consumption_rate', 'days_until_stockout', 'created_at', 'last_updated_at']
 
+
+# values_list() fast path with the same output, for list endpoints
+product_values_serializer = ValuesSerializer(ProductSerializer)
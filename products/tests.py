@@ -1,3 +1,472 @@
-from django.test import TestCase
+import json
+import math
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from core.testing import QueryBudgetMixin
+from companies.models import Company
+from users.models import User
+from orders.models import ArchivedOrder, Order
+from orders.views import OrderService
+from .models import Product, StockMovement, StockSlot
+from .views import ForecastService, ProductService, StockService
 
-# Create your tests here.
+
+class ProductQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Max SQL queries per product view, independent of catalog size"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user(
+            'admin1', company=cls.company, role='admin', is_staff=True, is_superuser=True
+        )
+    
+    def setUp(self):
+        self.client.force_login(self.admin)
+    
+    def grow_products(self, size):
+        existing = Product.objects.count()
+        Product.objects.bulk_create([
+            Product(company=self.company, name=f'Product {index}', price='9.99',
+                    stock=100, created_by=self.admin)
+            for index in range(existing, size)
+        ])
+    
+    def test_index_view(self):
+        self.assertQueryBudget(4, lambda: self.client.get('/'), self.grow_products)
+    
+    def test_product_list_api(self):
+        self.assertQueryBudget(4, lambda: self.client.get('/api/products/'), self.grow_products)
+    
+    def test_product_low_stock_api(self):
+        # Read sorted from the (company, days_until_stockout) index
+        def grow(size):
+            self.grow_products(size)
+            Product.objects.update(consumption_rate=10, days_until_stockout=F('stock') / 10.0)
+        
+        self.assertQueryBudget(4, lambda: self.client.get('/api/products/low-stock/?days=30'), grow)
+    
+    def test_product_bulk_delete_api(self):
+        def grow(size):
+            Product.objects.all().delete()
+            self.grow_products(size)
+            self.product_ids = list(Product.objects.values_list('id', flat=True))
+        
+        def delete_all():
+            return self.client.delete('/api/products/delete/', json.dumps({'product_ids': self.product_ids}),
+                                      content_type='application/json')
+        
+        self.assertQueryBudget(7, delete_all, grow)
+    
+    def test_product_bulk_restore_api(self):
+        def grow(size):
+            Product.objects.all().delete()
+            self.grow_products(size)
+            Product.objects.update(is_active=False)
+            self.product_ids = list(Product.objects.values_list('id', flat=True))
+        
+        def restore_all():
+            return self.client.post('/api/products/restore/', json.dumps({'product_ids': self.product_ids}),
+                                    content_type='application/json')
+        
+        self.assertQueryBudget(4, restore_all, grow)
+    
+    def test_admin_changelist(self):
+        self.assertQueryBudget(
+            8, lambda: self.client.get('/admin/products/product/'), self.grow_products
+        )
+    
+    def test_admin_change_form(self):
+        product = Product.objects.create(company=self.company, name='Feed', price='9.99', stock=1)
+        self.assertQueryBudget(
+            8, lambda: self.client.get(f'/admin/products/product/{product.pk}/change/'), self.grow_products
+        )
+    
+    def test_admin_stock_movement_changelist(self):
+        def grow(size):
+            self.grow_products(size)
+            for product in Product.objects.filter(stock_movements__isnull=True):
+                product.stock_movements.create(delta=product.stock, reason='restock', created_by=self.admin)
+        
+        self.assertQueryBudget(
+            8, lambda: self.client.get('/admin/products/stockmovement/'), grow
+        )
+
+
+class StockLedgerTests(TestCase):
+    """Every stock change goes through one guarded UPDATE and appends exactly one ledger row"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user(
+            'admin1', company=cls.company, role='admin', is_staff=True, is_superuser=True
+        )
+    
+    def setUp(self):
+        self.product = Product.objects.create(
+            company=self.company, name='Layer Feed', price=Decimal('9.99'), stock=10, created_by=self.admin
+        )
+        self.client.force_login(self.admin)
+    
+    def assertMovement(self, delta, reason, stock):
+        """Exactly one new ledger row, with `delta` and `reason`, and the stock it leaves"""
+        movements = list(self.product.stock_movements.values_list('delta', 'reason'))
+        self.assertEqual(movements, [(delta, reason)])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, stock)
+    
+    def test_process_order(self):
+        order = OrderService.process_order(self.product, 3, self.admin)
+        self.assertMovement(-3, 'order', 7)
+        self.assertEqual(self.product.stock_movements.get().order, order)
+    
+    def test_order_create_api(self):
+        response = self.client.post('/api/orders/', json.dumps({'product': self.product.pk, 'quantity': 4}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertMovement(-4, 'order', 6)
+    
+    def test_restock(self):
+        StockService.adjust(self.product, 5, 'restock', user=self.admin)
+        self.assertMovement(5, 'restock', 15)
+    
+    def test_admin_stock_edit(self):
+        response = self.client.post(f'/admin/products/product/{self.product.pk}/change/', {
+            'company': self.company.pk, 'name': 'Layer Feed', 'price': '9.99',
+            'stock': 25, 'stock_slots': 0, 'is_active': 'on',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertMovement(15, 'adjustment', 25)
+    
+    def test_cancellation(self):
+        order = OrderService.process_order(self.product, 3, self.admin)
+        StockMovement.objects.all().delete()
+        OrderService.cancel(Order.objects.filter(pk=order.pk), self.admin)
+        self.assertMovement(3, 'cancellation', 10)
+    
+    def test_admin_order_add_and_edit(self):
+        self.client.post('/admin/orders/order/add/', {
+            'product': self.product.pk, 'quantity': 2, 'status': 'pending',
+        })
+        order = Order.objects.get()
+        self.assertMovement(-2, 'order', 8)
+        
+        StockMovement.objects.all().delete()
+        self.client.post(f'/admin/orders/order/{order.pk}/change/', {
+            'product': self.product.pk, 'quantity': 5, 'status': 'pending',
+        })
+        self.assertMovement(-3, 'adjustment', 5)
+        
+        StockMovement.objects.all().delete()
+        self.client.post(f'/admin/orders/order/{order.pk}/change/', {
+            'product': self.product.pk, 'quantity': 5, 'status': 'cancelled',
+        })
+        self.assertMovement(5, 'cancellation', 10)
+    
+    def test_admin_order_edit_beyond_stock(self):
+        order = OrderService.process_order(self.product, 2, self.admin)
+        StockMovement.objects.all().delete()
+        response = self.client.post(f'/admin/orders/order/{order.pk}/change/', {
+            'product': self.product.pk, 'quantity': 20, 'status': 'pending',
+        })
+        self.assertContains(response, 'Insufficient stock. Available: 8')
+        self.assertFalse(StockMovement.objects.exists())
+    
+    def test_guarded_update_refuses_oversell(self):
+        # A stale in-memory value must not matter: the WHERE clause decides
+        Product.objects.filter(pk=self.product.pk).update(stock=2)
+        self.product.stock = 10
+        with self.assertRaisesMessage(ValueError, 'Insufficient stock. Available: 2'):
+            StockService.adjust(self.product, -3, 'order', user=self.admin)
+        self.assertFalse(StockMovement.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+
+
+class StockSlotTests(TestCase):
+    """Flash-sale slots hold the product's whole stock and never let it go below zero"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.user = User.objects.create_user('op1', company=cls.company, role='operator')
+    
+    def setUp(self):
+        self.product = Product.objects.create(company=self.company, name='Layer Feed', price=Decimal('9.99'), stock=10)
+    
+    def slot_stock(self):
+        return list(StockSlot.objects.filter(product=self.product).order_by('slot').values_list('stock', flat=True))
+    
+    def test_configure_and_sync_preserve_total(self):
+        StockService.configure_slots(self.product, 4)
+        self.assertEqual(self.slot_stock(), [3, 3, 2, 2])
+        
+        StockService.configure_slots(self.product, 3)
+        self.assertEqual(self.slot_stock(), [4, 3, 3])
+        
+        StockService.adjust(self.product, -2, 'order', user=self.user)
+        StockService.sync_slots(Product.objects.filter(pk=self.product.pk))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+        
+        StockService.configure_slots(self.product, 0)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.stock_slots), (8, 0))
+        self.assertEqual(self.slot_stock(), [])
+    
+    def test_no_oversell_when_slots_run_dry(self):
+        StockService.configure_slots(self.product, 4)
+        for _ in range(10):
+            StockService.adjust(self.product, -1, 'order', user=self.user)
+        with self.assertRaises(ValueError):
+            StockService.adjust(self.product, -1, 'order', user=self.user)
+        
+        self.assertEqual(self.slot_stock(), [0, 0, 0, 0])
+        self.assertEqual(self.product.stock_movements.filter(reason='order').count(), 10)
+    
+    def test_order_larger_than_any_slot_rebalances(self):
+        StockService.configure_slots(self.product, 4)
+        StockService.adjust(self.product, -5, 'order', user=self.user)
+        self.assertEqual(self.slot_stock(), [2, 1, 1, 1])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+        
+        with self.assertRaises(ValueError):
+            StockService.adjust(self.product, -6, 'order', user=self.user)
+        self.assertEqual(sum(self.slot_stock()), 5)
+    
+    def test_admin_changes_stock_and_slots_together(self):
+        superuser = User.objects.create_user('root', company=self.company, is_staff=True, is_superuser=True)
+        self.client.force_login(superuser)
+        
+        def edit(stock, slots):
+            response = self.client.post(f'/admin/products/product/{self.product.pk}/change/', {
+                'company': self.company.pk, 'name': 'Layer Feed', 'price': '9.99',
+                'stock': stock, 'stock_slots': slots, 'is_active': 'on',
+            })
+            self.assertEqual(response.status_code, 302)
+            self.product.refresh_from_db()
+        
+        edit(25, 4)
+        self.assertEqual((self.product.stock, self.product.stock_slots, sum(self.slot_stock())), (25, 4, 25))
+        edit(13, 2)
+        self.assertEqual((self.product.stock, self.product.stock_slots, self.slot_stock()), (13, 2, [7, 6]))
+        self.assertEqual(
+            list(StockMovement.objects.filter(product=self.product).order_by('id').values_list('delta', 'reason')),
+            [(15, 'adjustment'), (-12, 'adjustment')]
+        )
+    
+    def test_rebalance_keeps_total_and_writes_it_back(self):
+        StockService.configure_slots(self.product, 3)
+        StockSlot.objects.filter(product=self.product, slot=0).update(stock=0)
+        StockSlot.objects.filter(product=self.product, slot=2).update(stock=9)
+        
+        self.assertEqual(StockService.rebalance_slots(self.product), 12)
+        self.assertEqual(self.slot_stock(), [4, 4, 4])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 12)
+
+
+class ProductLifecycleTests(TestCase):
+    """Soft-delete, restore and purge of products and what hangs off them"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user('admin1', company=cls.company, role='admin')
+    
+    def setUp(self):
+        self.client.force_login(self.admin)
+    
+    def product(self, name, orders=0):
+        product = Product.objects.create(company=self.company, name=name, price=Decimal('2.50'), stock=10)
+        for _ in range(orders):
+            OrderService.process_order(product, 1, self.admin)
+        return product
+    
+    def deactivate(self, product, days_ago):
+        Product.objects.filter(pk=product.pk).update(
+            is_active=False, deactivated_at=timezone.now() - timedelta(days=days_ago)
+        )
+    
+    def post_ids(self, method, url, body):
+        return getattr(self.client, method)(url, json.dumps(body), content_type='application/json')
+    
+    def test_delete_and_restore(self):
+        products = [self.product('Layer Feed'), self.product('Egg Trays')]
+        other = Company.objects.create(name='Golden Egg Productions')
+        outsider = Product.objects.create(company=other, name='Other', price=Decimal('1.00'), stock=1, is_active=False)
+        ids = [product.id for product in products]
+        
+        response = self.post_ids('delete', '/api/products/delete/', {'product_ids': ids})
+        self.assertEqual(response.json()['count'], 2)
+        self.assertFalse(Product.objects.filter(id__in=ids, is_active=True).exists())
+        
+        response = self.post_ids('post', '/api/products/restore/', {'product_ids': [ids[0], outsider.id]})
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(
+            list(Product.objects.filter(id__in=ids).order_by('id').values_list('is_active', 'deactivated_at')),
+            [(True, None), (False, Product.objects.get(id=ids[1]).deactivated_at)]
+        )
+        outsider.refresh_from_db()
+        self.assertFalse(outsider.is_active)
+        
+        # Numeric strings from form posts are accepted; active products aren't "restored" again
+        response = self.client.post('/api/products/restore/', {'product_ids': str(ids[1])})
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(self.post_ids('post', '/api/products/restore/', {'product_ids': ids}).status_code, 404)
+    
+    def test_invalid_product_ids(self):
+        for body in ({}, {'product_ids': []}, {'product_ids': 'x'}, {'product_ids': ['a']},
+                     {'product_ids': [1.5]}, {'product_ids': [True]}, {'product_ids': {'id': 1}}, [1, 2]):
+            for method, url in (('post', '/api/products/restore/'), ('delete', '/api/products/delete/')):
+                response = self.post_ids(method, url, body)
+                self.assertEqual(response.status_code, 400, (url, body))
+                self.assertIn('error', response.json())
+    
+    def test_purge_batch_respects_retention_and_removes_dependents(self):
+        expired, recent = self.product('Expired', orders=3), self.product('Recent', orders=1)
+        self.product('Active', orders=1)
+        StockService.configure_slots(expired, 2)
+        self.deactivate(expired, days_ago=100)
+        self.deactivate(recent, days_ago=10)
+        
+        cutoff = ProductService.purge_cutoff()
+        # Orders go first, at most batch_size per step, then the product itself
+        self.assertEqual(ProductService.purge_batch(cutoff, batch_size=2), (0, 2))
+        self.assertEqual(ProductService.purge_batch(cutoff, batch_size=2), (0, 1))
+        self.assertEqual(ProductService.purge_batch(cutoff, batch_size=2), (1, 0))
+        self.assertEqual(ProductService.purge_batch(cutoff, batch_size=2), (0, 0))
+        
+        self.assertEqual(set(Product.objects.values_list('name', flat=True)), {'Recent', 'Active'})
+        self.assertFalse(Order.objects.filter(product_id=expired.id).exists())
+        self.assertFalse(StockMovement.objects.filter(product_id=expired.id).exists())
+        self.assertFalse(StockSlot.objects.filter(product_id=expired.id).exists())
+        self.assertEqual(Order.objects.count(), 2)
+    
+    def test_purge_batch_archives_orders(self):
+        expired = self.product('Expired', orders=1)
+        self.deactivate(expired, days_ago=100)
+        order = Order.objects.get(product=expired)
+        
+        cutoff = ProductService.purge_cutoff()
+        self.assertEqual(ProductService.purge_batch(cutoff, archive_orders=True), (0, 1))
+        self.assertEqual(ProductService.purge_batch(cutoff, archive_orders=True), (1, 0))
+        archived = ArchivedOrder.objects.get(id=order.id)
+        self.assertEqual((archived.product_id, archived.product_name, archived.quantity), (None, 'Expired', 1))
+
+
+@override_settings(STOCK_RATE_HALF_LIFE_DAYS=7)
+class ForecastTests(TestCase):
+    """Consumption rate: each ordered unit weighs k = ln 2 / half-life per day, halving every half-life"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user('admin1', company=cls.company, role='admin')
+    
+    def setUp(self):
+        self.k = math.log(2) / 7
+        self.product = Product.objects.create(company=self.company, name='Layer Feed', price=Decimal('9.99'), stock=100)
+        self.client.force_login(self.admin)
+    
+    def age(self, days):
+        """Pretend the last rate update (and every ledger row) happened `days` earlier"""
+        Product.objects.filter(pk=self.product.pk).update(rate_updated_at=F('rate_updated_at') - timedelta(days=days))
+        StockMovement.objects.filter(product=self.product).update(created_at=F('created_at') - timedelta(days=days))
+        self.product.refresh_from_db()
+    
+    def test_decay(self):
+        now = timezone.now()
+        self.product.rate_updated_at = None
+        self.assertEqual(ForecastService.decay(self.product, now), 1.0)
+        for days, left in ((0, 1.0), (7, 0.5), (14, 0.25), (3.5, 2 ** -0.5)):
+            self.product.rate_updated_at = now - timedelta(days=days)
+            self.assertAlmostEqual(ForecastService.decay(self.product, now), left)
+        # A clock that went backwards never grows the rate
+        self.product.rate_updated_at = now + timedelta(days=1)
+        self.assertEqual(ForecastService.decay(self.product, now), 1.0)
+    
+    def test_known_series(self):
+        StockService.adjust(self.product, -10, 'order', user=self.admin)
+        self.product.refresh_from_db()
+        self.assertAlmostEqual(self.product.consumption_rate, 10 * self.k)
+        self.assertAlmostEqual(self.product.days_until_stockout, 90 / (10 * self.k))
+        
+        # One half-life later the 10 units weigh 5; 4 new units are added at full weight
+        self.age(7)
+        StockService.adjust(self.product, -4, 'order', user=self.admin)
+        self.product.refresh_from_db()
+        self.assertAlmostEqual(self.product.consumption_rate, 9 * self.k, places=6)
+        self.assertAlmostEqual(self.product.days_until_stockout, 86 / (9 * self.k), places=3)
+        
+        # Read-only projection another half-life ahead
+        rate, days = ForecastService.current(self.product, self.product.rate_updated_at + timedelta(days=7))
+        self.assertAlmostEqual(rate, 4.5 * self.k, places=6)
+        self.assertAlmostEqual(days, 86 / (4.5 * self.k), places=3)
+        
+        # A cancellation takes its units back out; the rate never goes negative
+        StockService.adjust(self.product, 4, 'cancellation', user=self.admin)
+        self.product.refresh_from_db()
+        self.assertAlmostEqual(self.product.consumption_rate, 5 * self.k, places=6)
+        StockService.adjust(self.product, 50, 'cancellation', user=self.admin)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.consumption_rate, 0)
+        self.assertIsNone(self.product.days_until_stockout)
+    
+    def test_reused_instance_decays_from_current_row(self):
+        StockService.adjust(self.product, -10, 'order', user=self.admin)
+        self.age(7)
+        # Same instance for every call below: the one-half-life decay must apply once
+        StockService.adjust(self.product, -4, 'order', user=self.admin)
+        self.assertAlmostEqual(self.product.consumption_rate, 9 * self.k, places=6)
+        StockService.adjust(self.product, -2, 'order', user=self.admin)
+        self.assertAlmostEqual(self.product.consumption_rate, 11 * self.k, places=6)
+        
+        StockService.adjust_locked({self.product.id: self.product}, {self.product.id: -3}, 'order', user=self.admin)
+        self.assertAlmostEqual(self.product.consumption_rate, 14 * self.k, places=6)
+        StockService.adjust_locked({self.product.id: self.product}, {self.product.id: -1}, 'order', user=self.admin)
+        self.assertEqual(self.product.stock, 80)
+        self.assertAlmostEqual(self.product.days_until_stockout, 80 / (15 * self.k), places=3)
+        
+        self.product.refresh_from_db()
+        self.assertAlmostEqual(self.product.consumption_rate, 15 * self.k, places=6)
+    
+    def test_rebuild_matches_incremental(self):
+        StockService.adjust(self.product, -10, 'order', user=self.admin)
+        self.age(7)
+        StockService.adjust(self.product, -4, 'order', user=self.admin)
+        self.product.refresh_from_db()
+        incremental = self.product.consumption_rate
+        
+        Product.objects.filter(pk=self.product.pk).update(consumption_rate=0, days_until_stockout=None)
+        ForecastService.refresh_batch(rebuild=True)
+        self.product.refresh_from_db()
+        self.assertAlmostEqual(self.product.consumption_rate, incremental, places=6)
+        self.assertAlmostEqual(self.product.days_until_stockout, 86 / incremental, places=3)
+    
+    def test_low_stock_days(self):
+        # 20 units a day: 100 in stock last 5 days
+        Product.objects.filter(pk=self.product.pk).update(consumption_rate=20, days_until_stockout=5)
+        idle = Product.objects.create(company=self.company, name='Egg Trays', price=Decimal('1.00'), stock=0)
+        
+        def listed(days):
+            response = self.client.get('/api/products/low-stock/', {'days': days})
+            self.assertEqual(response.status_code, 200, days)
+            return [product['id'] for product in response.json()]
+        
+        self.assertEqual(listed('5'), [self.product.id])
+        self.assertEqual(listed('4.99'), [])
+        self.assertEqual(listed('0'), [])
+        self.assertEqual(listed('1e3'), [self.product.id])
+        # Products nobody orders have no forecast and are never listed
+        self.assertNotIn(idle.id, listed('1000000'))
+        
+        for days in ('nan', 'NaN', 'inf', '-inf', '-1', 'soon', ''):
+            response = self.client.get('/api/products/low-stock/', {'days': days})
+            self.assertEqual(response.status_code, 400, days)
+        self.assertEqual(self.client.get('/api/products/low-stock/').status_code, 200)
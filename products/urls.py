@@ -6,4 +6,6 @@ app_name = 'products'
 urlpatterns = [
     path('', views.ProductListAPIView.as_view(), name='list'),
     path('delete/', views.ProductBulkDeleteAPIView.as_view(), name='bulk-delete'),
+    path('restore/', views.ProductBulkRestoreAPIView.as_view(), name='bulk-restore'),
+    path('low-stock/', views.ProductLowStockAPIView.as_view(), name='low-stock'),
 ]
@@ -1,3 +1,7 @@
+import math
+import random
+from collections import defaultdict
+from datetime import timedelta
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -6,9 +10,433 @@ from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.contrib import messages
+from django.conf import settings
 from django.utils import timezone
-from .models import Product
-from .serializers import ProductSerializer
+from django.db import transaction
+from django.db.models import Case, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, NullIf
+from core.events import publish_on_commit
+from orders.models import Order
+from .models import Product, StockMovement, StockSlot
+from .serializers import ProductSerializer, product_values_serializer
+
+
+# ===== Shared Business Logic =====
+class StockService:
+    """Service class to change product stock and record it in the ledger"""
+    
+    @staticmethod
+    def adjust(product, delta, reason, user=None, order=None):
+        """
+        Apply a stock delta and append a StockMovement row.
+        
+        The change is a single guarded UPDATE (stock = stock + delta WHERE
+        stock >= -delta), so two concurrent orders can never both pass the
+        availability check on a stale value and oversell the product.
+        Products in flash-sale mode are adjusted on one of their slots instead.
+        Raises ValueError when there is not enough stock.
+        """
+        if delta == 0:
+            return product
+        
+        with transaction.atomic():
+            if product.stock_slots:
+                StockService._adjust_slots(product, delta)
+            else:
+                rows = Product.objects.filter(pk=product.pk)
+                if delta < 0:
+                    rows = rows.filter(stock__gte=-delta)
+                
+                now = timezone.now()
+                # The forecast goes first: see ForecastService.update_fields
+                if not rows.update(**ForecastService.update_fields(product, delta, reason, now),
+                                   stock=F('stock') + delta, last_updated_at=now):
+                    product.refresh_from_db(fields=['stock'])
+                    raise ValueError(f'Insufficient stock. Available: {product.stock}')
+            
+            StockMovement.objects.create(
+                product=product,
+                order=order,
+                delta=delta,
+                reason=reason,
+                created_by=user,
+            )
+            # The next update decays the rate from rate_updated_at, so keep it current
+            product.refresh_from_db(fields=['stock', *ForecastService.FIELDS])
+            publish_on_commit(product.company_id, 'stock', {'product': product.id, 'stock': product.stock})
+        
+        return product
+    
+    @staticmethod
+    def adjust_locked(products, deltas, reason, user=None, orders=None):
+        """
+        Apply many deltas at once: one UPDATE for all products and one ledger
+        insert. For bulk jobs only - the caller must already hold
+        select_for_update() locks on `products` (id -> product) and have
+        checked the deltas against the locked stock. `orders` optionally maps
+        product id -> the order the movement belongs to. Flash-sale products
+        still go through adjust().
+        """
+        orders = orders or {}
+        plain = {product_id: delta for product_id, delta in deltas.items()
+                 if delta and not products[product_id].stock_slots}
+        
+        with transaction.atomic():
+            for product_id, delta in deltas.items():
+                if delta and product_id not in plain:
+                    StockService.adjust(products[product_id], delta, reason,
+                                        user=user, order=orders.get(product_id))
+            if not plain:
+                return
+            
+            now = timezone.now()
+            forecasts = {
+                product_id: ForecastService.update_fields(products[product_id], delta, reason, now)
+                for product_id, delta in plain.items()
+            }
+            Product.objects.filter(id__in=plain).update(
+                **{
+                    name: Case(*[When(id=product_id, then=fields[name])
+                                 for product_id, fields in forecasts.items()])
+                    for name in ForecastService.FIELDS
+                },
+                stock=Case(*[When(id=product_id, then=F('stock') + delta)
+                             for product_id, delta in plain.items()]),
+                last_updated_at=now
+            )
+            StockMovement.objects.bulk_create([
+                StockMovement(product_id=product_id, order=orders.get(product_id),
+                              delta=delta, reason=reason, created_by=user)
+                for product_id, delta in plain.items()
+            ])
+            
+            fields = ['stock', *ForecastService.FIELDS]
+            for row in Product.objects.filter(id__in=plain).values('id', *fields):
+                product = products[row['id']]
+                for name in fields:
+                    setattr(product, name, row[name])
+                publish_on_commit(product.company_id, 'stock',
+                                  {'product': product.id, 'stock': product.stock})
+    
+    @staticmethod
+    def _adjust_slots(product, delta):
+        """
+        Flash-sale path: decrement one slot, starting at a random one so
+        concurrent orders lock different rows. Only when no single slot can
+        cover the quantity do we lock them all and rebalance.
+        """
+        slots = list(range(product.stock_slots))
+        start = random.randrange(len(slots))
+        slots = slots[start:] + slots[:start]
+        
+        if delta > 0:
+            # Restocks are rare: top up one slot and keep the snapshot in step
+            StockSlot.objects.filter(product=product, slot=slots[0]).update(stock=F('stock') + delta)
+            Product.objects.filter(pk=product.pk).update(
+                stock=F('stock') + delta, last_updated_at=timezone.now()
+            )
+            return
+        
+        for slot in slots:
+            taken = StockSlot.objects.filter(
+                product=product, slot=slot, stock__gte=-delta
+            ).update(stock=F('stock') + delta)
+            if taken:
+                return
+        
+        StockService.rebalance_slots(product, take=-delta)
+    
+    @staticmethod
+    def rebalance_slots(product, take=0):
+        """
+        Lock all slots of a product (in slot order), optionally take `take`
+        units, spread the rest evenly again and refresh the stock snapshot.
+        """
+        with transaction.atomic():
+            slots = list(
+                StockSlot.objects.select_for_update().filter(product=product).order_by('slot')
+            )
+            total = sum(slot.stock for slot in slots)
+            if not slots or take > total:
+                raise ValueError(f'Insufficient stock. Available: {total}')
+            
+            total -= take
+            share, extra = divmod(total, len(slots))
+            for index, slot in enumerate(slots):
+                slot.stock = share + (1 if index < extra else 0)
+            
+            StockSlot.objects.bulk_update(slots, ['stock'])
+            Product.objects.filter(pk=product.pk).update(stock=total, last_updated_at=timezone.now())
+        
+        return total
+    
+    @staticmethod
+    def configure_slots(product, count):
+        """
+        Switch flash-sale mode on (count > 0), off (0) or change the slot
+        count. `product` is updated in place, so later adjust() calls on it
+        take the right path.
+        """
+        with transaction.atomic():
+            locked = Product.objects.select_for_update().get(pk=product.pk)
+            slots = StockSlot.objects.select_for_update().filter(product=locked)
+            
+            if locked.stock_slots:
+                total = sum(slot.stock for slot in slots)
+            else:
+                total = locked.stock
+            
+            slots.delete()
+            if count:
+                share, extra = divmod(total, count)
+                StockSlot.objects.bulk_create([
+                    StockSlot(product=product, slot=index,
+                              stock=share + (1 if index < extra else 0))
+                    for index in range(count)
+                ])
+            
+            Product.objects.filter(pk=product.pk).update(
+                stock=total, stock_slots=count, last_updated_at=timezone.now()
+            )
+            product.stock, product.stock_slots = total, count
+        
+        return product
+    
+    @staticmethod
+    def sync_slots(products=None):
+        """
+        Refresh the stock snapshot of flash-sale products from their slots.
+        Orders only touch the slots, so run this periodically for fresh reads.
+        """
+        products = products if products is not None else Product.objects.all()
+        slot_total = StockSlot.objects.filter(
+            product=OuterRef('pk')
+        ).values('product').annotate(total=Sum('stock')).values('total')
+        
+        return products.filter(stock_slots__gt=0).update(
+            stock=Coalesce(Subquery(slot_total), 0),
+            last_updated_at=timezone.now()
+        )
+
+
+class ForecastService:
+    """
+    Low-stock forecasting without scanning orders. Each product keeps a
+    consumption rate in units/day: every ordered unit counts with a weight
+    that halves every STOCK_RATE_HALF_LIFE_DAYS, so the rate follows recent
+    demand. It is updated in the same UPDATE as the stock, together with
+    days_until_stockout (stock / rate), which the (company, days_until_stockout)
+    index serves sorted to the low-stock list.
+    """
+    # Assignment order matters: MySQL evaluates SET left to right and lets
+    # later assignments see updated values, so the forecast must come before
+    # the rate and the stock it is computed from
+    FIELDS = ['days_until_stockout', 'consumption_rate', 'rate_updated_at']
+    CONSUMED = ('order',)
+    RETURNED = ('cancellation', 'release')
+    
+    @staticmethod
+    def decay_constant():
+        """Per-day decay rate for the configured half-life"""
+        return math.log(2) / settings.STOCK_RATE_HALF_LIFE_DAYS
+    
+    @staticmethod
+    def decay(product, now):
+        """How much of the product's rate is left at `now`"""
+        if product.rate_updated_at is None:
+            return 1.0
+        days = max((now - product.rate_updated_at).total_seconds(), 0) / 86400
+        return math.exp(-ForecastService.decay_constant() * days)
+    
+    @staticmethod
+    def current(product, now=None):
+        """(rate, days until stockout) brought forward to `now`, without touching the database"""
+        rate = product.consumption_rate * ForecastService.decay(product, now or timezone.now())
+        return rate, (product.stock / rate if rate else None)
+    
+    @staticmethod
+    def update_fields(product, delta, reason, now, stock_delta=None):
+        """
+        UPDATE assignments (FIELDS order) for a stock change of `delta` on
+        `product`: ordered units raise the rate, cancelled and released ones
+        take it back, and every change refreshes the forecast. The decay
+        factor is computed here from `product.rate_updated_at`, so the
+        instance must match the row: adjust() and adjust_locked() read the
+        new values back after every update. A concurrent writer that updates
+        the row in between makes this one over-decay the rate by the time
+        between the two updates; refresh_batch(rebuild=True) corrects it.
+        """
+        rate = F('consumption_rate') * ForecastService.decay(product, now)
+        if reason in ForecastService.CONSUMED and delta < 0:
+            rate = rate - ForecastService.decay_constant() * delta
+        elif reason in ForecastService.RETURNED and delta > 0:
+            rate = Greatest(rate - ForecastService.decay_constant() * delta, Value(0.0))
+        
+        stock = F('stock') + (delta if stock_delta is None else stock_delta)
+        return {
+            'days_until_stockout': ExpressionWrapper(stock / NullIf(rate, Value(0.0)), output_field=FloatField()),
+            'consumption_rate': rate,
+            'rate_updated_at': now,
+        }
+    
+    @staticmethod
+    def low_stock(company, days=None):
+        """Active products of `company` expected to run out within `days`, soonest first"""
+        if days is None:
+            days = settings.LOW_STOCK_DAYS
+        return Product.objects.for_company(company).active().filter(
+            days_until_stockout__lte=days
+        ).order_by('days_until_stockout', 'id')
+    
+    @staticmethod
+    def refresh_batch(after_id=0, batch_size=500, rebuild=False, stale_after=timedelta(hours=1)):
+        """
+        Bring rates that haven't moved for `stale_after` forward to now (a
+        product nobody orders must drift off the low-stock list) and fold the
+        ledger into flash-sale products, whose orders only touch their slots.
+        `rebuild` recomputes every product from the last five half-lives of
+        the ledger instead. Handles up to `batch_size` products with
+        id > `after_id`; returns the last id seen, or None when done.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            products = Product.objects.select_for_update().filter(id__gt=after_id)
+            if not rebuild:
+                products = products.filter(
+                    Q(stock_slots__gt=0) | Q(consumption_rate__gt=0, rate_updated_at__lt=now - stale_after)
+                )
+            products = list(products.order_by('id')[:batch_size])
+            if not products:
+                return None
+            
+            decay_constant = ForecastService.decay_constant()
+            from_ledger = products if rebuild else [product for product in products if product.stock_slots]
+            consumed = defaultdict(list)
+            if from_ledger:
+                if rebuild:
+                    since = now - timedelta(days=5 * settings.STOCK_RATE_HALF_LIFE_DAYS)
+                else:
+                    since = min(product.rate_updated_at or product.created_at for product in from_ledger)
+                movements = StockMovement.objects.filter(
+                    product__in=from_ledger, created_at__gt=since,
+                    reason__in=ForecastService.CONSUMED + ForecastService.RETURNED
+                ).values_list('product_id', 'delta', 'created_at')
+                for product_id, delta, created_at in movements:
+                    # Orders are negative deltas, cancellations and releases give them back
+                    consumed[product_id].append((created_at, -delta))
+            
+            for product in products:
+                rate = 0.0 if rebuild else product.consumption_rate * ForecastService.decay(product, now)
+                for created_at, units in consumed.get(product.id, ()):
+                    if rebuild or product.rate_updated_at is None or created_at > product.rate_updated_at:
+                        age = max((now - created_at).total_seconds(), 0) / 86400
+                        rate += decay_constant * units * math.exp(-decay_constant * age)
+                product.consumption_rate = max(rate, 0.0)
+                product.rate_updated_at = now
+                product.days_until_stockout = (
+                    product.stock / product.consumption_rate if product.consumption_rate else None
+                )
+            
+            Product.objects.bulk_update(products, ['consumption_rate', 'rate_updated_at', 'days_until_stockout'])
+        
+        return products[-1].id
+
+
+class ProductService:
+    """Service class for product lifecycle operations shared by views and admin"""
+    
+    @staticmethod
+    def parse_ids(data):
+        """
+        The `product_ids` of a bulk request body as a list of ints (numeric
+        strings from form posts included). Raises ValueError otherwise.
+        """
+        product_ids = data.get('product_ids') if hasattr(data, 'get') else None
+        if not product_ids:
+            raise ValueError('No product IDs provided')
+        if not isinstance(product_ids, list):
+            product_ids = [product_ids]
+        
+        parsed = []
+        for value in product_ids:
+            if isinstance(value, str) and value.strip().isdecimal():
+                value = int(value)
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError('product_ids must be a list of integer product IDs')
+            parsed.append(value)
+        return parsed
+    
+    @staticmethod
+    def deactivate(products):
+        """Soft-delete the active products of a queryset and notify listeners. Returns the count"""
+        with transaction.atomic():
+            rows = list(products.filter(is_active=True).values_list('id', 'company_id'))
+            if not rows:
+                return 0
+            
+            now = timezone.now()
+            count = Product.objects.filter(id__in=[product_id for product_id, _ in rows]).update(
+                is_active=False, deactivated_at=now, last_updated_at=now
+            )
+            
+            by_company = defaultdict(list)
+            for product_id, company_id in rows:
+                by_company[company_id].append(product_id)
+            for company_id, product_ids in by_company.items():
+                publish_on_commit(company_id, 'products_deleted', {'products': product_ids})
+        
+        return count
+    
+    @staticmethod
+    def restore(products):
+        """Undo the soft-delete of the inactive products of a queryset. Returns the count"""
+        return products.filter(is_active=False).update(
+            is_active=True, deactivated_at=None, last_updated_at=timezone.now()
+        )
+    
+    @staticmethod
+    def purge_cutoff(days=None):
+        """Products soft-deleted before this moment may be purged"""
+        if days is None:
+            days = settings.PRODUCT_PURGE_AFTER_DAYS
+        return timezone.now() - timedelta(days=days)
+    
+    @staticmethod
+    def purge_batch(cutoff, batch_size=200, archive_orders=False):
+        """
+        Run one short step of the purge of products soft-deleted before `cutoff`.
+        The lowest `batch_size` product ids are locked; while they still have
+        orders, up to `batch_size` of those are deleted (or archived), otherwise
+        the products themselves go. Restored products drop out of the next step.
+        Returns (products, orders) removed; (0, 0) once nothing is left.
+        """
+        from orders.views import OrderArchiveService
+        
+        with transaction.atomic():
+            product_ids = list(
+                Product.objects.select_for_update()
+                .filter(is_active=False, deactivated_at__lt=cutoff)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not product_ids:
+                return 0, 0
+            
+            orders = list(
+                Order.objects.select_for_update()
+                .filter(product_id__in=product_ids)
+                .order_by('id')[:batch_size]
+            )
+            if orders:
+                if archive_orders:
+                    OrderArchiveService.archive_orders(orders)
+                else:
+                    Order.objects.filter(id__in=[order.id for order in orders]).delete()
+                return 0, len(orders)
+            
+            # Slots and stock movements cascade; archived orders keep product_name
+            Product.objects.filter(id__in=product_ids).delete()
+        
+        return len(product_ids), 0
 
 
 class IndexView(View):
@@ -16,15 +444,14 @@ class IndexView(View):
     
     def get(self, request):
         if request.user.is_authenticated:
-            products = Product.objects.filter(
-                company=request.user.company
-            ).select_related('company', 'created_by').order_by('-created_at')
+            products = Product.objects.for_company(request.user.company).select_related('company', 'created_by')
         else:
             products = []
         
         context = {
             'products': products,
-            'now': timezone.now()
+            'now': timezone.now(),
+            'live_events': settings.LIVE_EVENTS,
         }
         return render(request, 'index.html', context)
 
@@ -47,17 +474,25 @@ class ProductCreateView(View):
                 messages.error(request, 'All fields are required.')
                 return redirect('index')
             
-            if Product.objects.filter(company=request.user.company, name=name).exists():
+            if Product.objects.for_company(request.user.company).filter(name=name).exists():
                 messages.error(request, f'Product "{name}" already exists.')
                 return redirect('index')
             
-            product = Product.objects.create(
-                company=request.user.company,
-                name=name,
-                price=float(price),
-                stock=int(stock),
-                created_by=request.user,
-            )
+            with transaction.atomic():
+                product = Product.objects.create(
+                    company=request.user.company,
+                    name=name,
+                    price=float(price),
+                    stock=int(stock),
+                    created_by=request.user,
+                )
+                if product.stock:
+                    StockMovement.objects.create(
+                        product=product,
+                        delta=product.stock,
+                        reason='restock',
+                        created_by=request.user,
+                    )
             
             messages.success(request, f'Product "{product.name}" created successfully!')
         except ValueError:
@@ -74,10 +509,29 @@ class ProductListAPIView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Product.objects.filter(
-            company=self.request.user.company,
-            is_active=True
-        ).select_related('company', 'created_by').order_by('-created_at')
+        return Product.objects.for_company(self.request.user.company).active()
+    
+    def list(self, request, *args, **kwargs):
+        # Same JSON as ProductSerializer, built straight from values_list()
+        return Response(product_values_serializer.serialize(self.get_queryset()))
+
+
+class ProductLowStockAPIView(generics.GenericAPIView):
+    """API: Products expected to run out within `?days=` (default LOW_STOCK_DAYS), soonest first"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            days = float(request.query_params.get('days', settings.LOW_STOCK_DAYS))
+        except ValueError:
+            days = math.nan
+        # float() also accepts "nan" and "inf", which no forecast compares against
+        if not math.isfinite(days) or days < 0:
+            return Response({'error': 'days must be a non-negative number'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(product_values_serializer.serialize(
+            ForecastService.low_stock(request.user.company, days)
+        ))
 
 
 class ProductBulkDeleteAPIView(generics.GenericAPIView):
@@ -85,30 +539,47 @@ class ProductBulkDeleteAPIView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     
     def delete(self, request, *args, **kwargs):
-        product_ids = request.data.get('product_ids', [])
+        try:
+            product_ids = ProductService.parse_ids(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        if not product_ids:
+        count = ProductService.deactivate(Product.objects.for_company(request.user.company).filter(id__in=product_ids))
+        
+        if not count:
             return Response(
-                {'error': 'No product IDs provided'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': 'No valid products found'},
+                status=status.HTTP_404_NOT_FOUND
             )
         
-        products = Product.objects.filter(
-            id__in=product_ids,
-            company=request.user.company,
-            is_active=True
-        )
+        return Response({
+            'success': True,
+            'message': f'{count} product(s) marked as inactive',
+            'count': count
+        }, status=status.HTTP_200_OK)
+
+
+class ProductBulkRestoreAPIView(generics.GenericAPIView):
+    """API: Restore soft-deleted products (bulk operation)"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        try:
+            product_ids = ProductService.parse_ids(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        count = ProductService.restore(Product.objects.for_company(request.user.company).filter(id__in=product_ids))
         
-        if not products.exists():
+        if not count:
             return Response(
-                {'error': 'No valid products found'},
+                {'error': 'No inactive products found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        count = products.update(is_active=False)
         return Response({
             'success': True,
-            'message': f'{count} product(s) marked as inactive',
+            'message': f'{count} product(s) restored',
             'count': count
         }, status=status.HTTP_200_OK)
 
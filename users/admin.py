@@ -22,7 +22,4 @@ class UserAdmin(BaseUserAdmin):
         Superuser sees all users.
         Staff users (admin/operator) only see users from their company.
         """
-        qs = super().get_queryset(request)
-        if request.user.is_superuser:
-            return qs
-        return qs.filter(company=request.user.company)
+        return super().get_queryset(request).visible_to(request.user)
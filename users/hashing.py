@@ -0,0 +1,19 @@
+"""
+Password hashing for the bulk user import, run in process-pool workers.
+
+Workers forked from a configured process inherit Django's settings; spawned
+ones set Django up in `init_worker` before the first task arrives.
+"""
+
+
+def init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def hash_passwords(passwords):
+    """Hash one chunk of raw passwords with the configured default hasher"""
+    from django.contrib.auth.hashers import make_password
+    return [make_password(password) for password in passwords]
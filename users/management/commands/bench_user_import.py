@@ -0,0 +1,46 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+from companies.models import Company
+from users.models import User
+from users.views import UserImportService
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the bulk user import as hashing workers scale: provisions "
+        "generated users into a throwaway test database with the real password "
+        "hasher and reports users/s per worker count."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--workers', type=int, nargs='+',
+                            default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    
+    def handle(self, *args, **options):
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            company = Company.objects.create(name='Bench Co')
+            importer = User.objects.create_superuser('bench', company=company)
+            
+            for workers in options['workers']:
+                User.objects.exclude(pk=importer.pk).delete()
+                rows = [
+                    (index + 2, {'username': f'staff{index}', 'password': f'Coop-{index}-Feed!', 'role': 'operator'})
+                    for index in range(options['users'])
+                ]
+                
+                started = time.perf_counter()
+                created, errors = UserImportService.import_users(
+                    rows, importer, workers=workers, default_company=company
+                )
+                elapsed = time.perf_counter() - started
+                
+                self.stdout.write(
+                    f'workers={workers:<3} {created / elapsed:8.1f} users/s '
+                    f'({created} created, {len(errors)} rejected, {elapsed:.2f}s)'
+                )
+        finally:
+            teardown_databases(old_config, verbosity=0)
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from companies.models import Company
+from users.models import User
+from users.views import UserImportService
+
+
+class Command(BaseCommand):
+    help = (
+        "Provision users in bulk from a CSV (username, email, password, company, "
+        "role, first_name, last_name) or a JSON list of the same fields. Passwords "
+        "are hashed across a process pool; rejected rows go to an error CSV."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON (.json) file to import')
+        parser.add_argument('--as-user', required=True,
+                            help='Username the import runs as (a superuser, or an admin for their own company)')
+        parser.add_argument('--company', help='Company name for rows without a company column')
+        parser.add_argument('--workers', type=int, default=settings.USER_IMPORT_WORKERS)
+        parser.add_argument('--errors', help='Where to write rejected rows (default: <path>.errors.csv)')
+    
+    def handle(self, *args, **options):
+        try:
+            importer = User.objects.select_related('company').get(username=options['as_user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['as_user']!r}")
+        if not importer.is_superuser and importer.role != 'admin':
+            raise CommandError(f'{importer.username} cannot add users')
+        
+        default_company = importer.company
+        if options['company']:
+            try:
+                default_company = Company.objects.get(name=options['company'])
+            except Company.DoesNotExist:
+                raise CommandError(f"Unknown company {options['company']!r}")
+        
+        content_type = 'json' if options['path'].lower().endswith('.json') else 'csv'
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                rows = UserImportService.read_rows(stream, content_type)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        
+        created, errors = UserImportService.import_users(
+            rows, importer, workers=options['workers'], default_company=default_company
+        )
+        
+        if errors:
+            errors_path = options['errors'] or f"{options['path']}.errors.csv"
+            with open(errors_path, 'w', encoding='utf-8', newline='') as stream:
+                UserImportService.write_errors(stream, errors)
+            self.stdout.write(self.style.WARNING(f'{len(errors)} row(s) rejected, see {errors_path}'))
+        
+        self.stdout.write(self.style.SUCCESS(f'{created} user(s) created.'))
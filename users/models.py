@@ -1,7 +1,25 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
 # Create your models here.
+class UserQuerySet(models.QuerySet):
+    """Tenant scoping for users"""
+    
+    def for_company(self, company):
+        """A company's users by username ((company, username) index)"""
+        return self.filter(company=company).order_by('username')
+    
+    def visible_to(self, user):
+        """Everything for superusers, the user's company otherwise (ordering untouched)"""
+        if user.is_superuser:
+            return self
+        return self.filter(company=user.company)
+
+
+class CompanyUserManager(UserManager.from_queryset(UserQuerySet)):
+    """Django's UserManager (create_user, ...) with the tenant queryset methods"""
+
+
 class User(AbstractUser):
     ROLE_CHOICES = (
         ('admin', 'Admin'),
@@ -17,8 +35,13 @@ class User(AbstractUser):
     
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='viewer')
     
+    objects = CompanyUserManager()
+    
     class Meta:
         ordering = ['username']
+        indexes = [
+            models.Index(fields=['company', 'username'], name='user_company_username'),
+        ]
     
     def __str__(self):
         return f"{self.username} from: {self.company}"
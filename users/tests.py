@@ -1,3 +1,142 @@
-from django.test import TestCase
+import json
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import check_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from core.testing import QueryBudgetMixin
+from companies.models import Company
+from .models import User
+from .views import UserImportService
 
-# Create your tests here.
+
+class UserAdminQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Max SQL queries for the user admin, independent of staff count"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.admin = User.objects.create_user(
+            'admin1', company=cls.company, role='admin', is_staff=True, is_superuser=True
+        )
+    
+    def setUp(self):
+        self.client.force_login(self.admin)
+    
+    def grow_users(self, size):
+        existing = User.objects.count()
+        User.objects.bulk_create([
+            User(username=f'user{index}', company=self.company, role='viewer')
+            for index in range(existing, size + 1)
+        ])
+    
+    def test_admin_changelist(self):
+        self.assertQueryBudget(7, lambda: self.client.get('/admin/users/user/'), self.grow_users)
+    
+    def test_admin_change_form(self):
+        self.assertQueryBudget(
+            12, lambda: self.client.get(f'/admin/users/user/{self.admin.pk}/change/'), self.grow_users
+        )
+    
+    def test_user_import_api(self):
+        # Duplicate check, company lookup and inserts are batched
+        def grow(size):
+            self.rows = [{'username': f'staff{size}-{index}', 'role': 'operator'} for index in range(size)]
+        
+        self.assertQueryBudget(
+            8, lambda: self.client.post('/api/users/import/', json.dumps(self.rows),
+                                        content_type='application/json'), grow
+        )
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportTests(TestCase):
+    """Imported users can log in; bad rows are rejected one by one"""
+    
+    PASSWORD = 'Layer-feed-2026'
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Sunrise Poultry Farm')
+        cls.other = Company.objects.create(name='Golden Egg Productions')
+        cls.admin = User.objects.create_user('admin1', company=cls.company, role='admin', is_staff=True)
+    
+    def setUp(self):
+        self.client.force_login(self.admin)
+    
+    def post(self, rows):
+        return self.client.post('/api/users/import/', json.dumps(rows), content_type='application/json')
+    
+    def test_imported_users_authenticate(self):
+        response = self.post([
+            {'username': 'operator2', 'password': self.PASSWORD, 'role': 'operator', 'email': 'op2@example.com'},
+            {'username': 'viewer2'},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['count'], 2)
+        
+        operator = authenticate(username='operator2', password=self.PASSWORD)
+        self.assertIsNotNone(operator)
+        self.assertEqual((operator.company, operator.role, operator.is_staff), (self.company, 'operator', True))
+        viewer = User.objects.get(username='viewer2')
+        self.assertEqual((viewer.company, viewer.role, viewer.is_staff), (self.company, 'viewer', False))
+        self.assertFalse(viewer.has_usable_password())
+    
+    def test_other_company_rejected(self):
+        rows = [{'username': 'spy', 'password': self.PASSWORD, 'company': 'Golden Egg Productions'}]
+        response = self.post(rows)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [
+            {'line': 1, 'username': 'spy', 'error': 'You can only add users to your own company.'}
+        ])
+        self.assertFalse(User.objects.filter(username='spy').exists())
+        
+        # A superuser provisions any company, by name or id
+        superuser = User.objects.create_user('root', company=self.company, is_superuser=True)
+        self.client.force_login(superuser)
+        rows.append({'username': 'egg2', 'company': str(self.other.id)})
+        self.assertEqual(self.post(rows).json()['count'], 2)
+        self.assertEqual(set(User.objects.filter(company=self.other).values_list('username', flat=True)), {'spy', 'egg2'})
+    
+    def test_per_row_errors(self):
+        sheet = (
+            'username,password,role,email\n'
+            f'admin1,{self.PASSWORD},viewer,\n'
+            f'newbie,{self.PASSWORD},chief,\n'
+            f'mailer,{self.PASSWORD},viewer,not-an-email\n'
+            'weak,123,viewer,\n'
+            f',{self.PASSWORD},viewer,\n'
+            f'good,{self.PASSWORD},operator,\n'
+            f'good,{self.PASSWORD},viewer,\n'
+        )
+        response = self.client.post('/api/users/import/', {'file': SimpleUploadedFile('staff.csv', sheet.encode())})
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual([(error['line'], error['username']) for error in data['errors']], [
+            (2, 'admin1'), (3, 'newbie'), (4, 'mailer'), (5, 'weak'), (6, ''), (8, 'good'),
+        ])
+        messages = [error['error'] for error in data['errors']]
+        self.assertEqual(messages[0], 'Username already exists.')
+        self.assertTrue(messages[1].startswith('Invalid role "chief"'))
+        self.assertIn('valid email', messages[2])
+        self.assertIn('too short', messages[3])
+        self.assertEqual(messages[4:], ['Username is required.', 'Username already exists.'])
+        self.assertEqual(authenticate(username='good', password=self.PASSWORD).role, 'operator')
+    
+    @override_settings(USER_IMPORT_MAX_PASSWORDS=2)
+    def test_password_cap(self):
+        rows = [{'username': f'staff{index}', 'password': self.PASSWORD} for index in range(3)]
+        response = self.post(rows)
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('manage.py import_users', response.json()['error'])
+        self.assertFalse(User.objects.filter(username__startswith='staff').exists())
+        
+        # Rows without a password cost nothing to hash and don't count
+        rows[2].pop('password')
+        self.assertEqual(self.post(rows).json()['count'], 3)
+    
+    def test_parallel_hashing(self):
+        passwords = [f'{self.PASSWORD}-{index}' for index in range(30)]
+        hashed = UserImportService.hash_all(passwords, workers=2)
+        self.assertEqual(len(hashed), 30)
+        self.assertTrue(all(check_password(password, encoded) for password, encoded in zip(passwords, hashed)))
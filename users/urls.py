@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'users'
+
+urlpatterns = [
+    path('import/', views.UserImportAPIView.as_view(), name='api-import'),
+]
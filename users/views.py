@@ -1,3 +1,211 @@
-from django.shortcuts import render
+import csv
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+from rest_framework import generics, status
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from companies.models import Company
+from .hashing import hash_passwords, init_worker
+from .models import User
 
-# Create your views here.
+USER_IMPORT_FIELDS = ['username', 'email', 'password', 'company', 'role', 'first_name', 'last_name']
+HASH_CHUNK_SIZE = 25
+
+
+# ===== Shared Business Logic =====
+
+class UserImportService:
+    """Bulk user provisioning: validate, hash passwords across a process pool, bulk insert"""
+    
+    @staticmethod
+    def read_rows(stream, content_type='csv'):
+        """
+        Parse a CSV (with a header row) or a JSON list of objects into
+        (line, row dict) pairs. Raises ValueError for unreadable input.
+        """
+        if content_type == 'json':
+            try:
+                data = json.load(stream)
+            except json.JSONDecodeError as e:
+                raise ValueError(f'Invalid JSON: {e}')
+            if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+                raise ValueError('JSON input must be a list of user objects')
+            return [(index + 1, row) for index, row in enumerate(data)]
+        
+        reader = csv.DictReader(stream)
+        if not reader.fieldnames or 'username' not in [name.strip().lower() for name in reader.fieldnames]:
+            raise ValueError('CSV needs at least a "username" column')
+        return [
+            (reader.line_num, {key.strip().lower(): value for key, value in row.items() if key})
+            for row in reader
+        ]
+    
+    @staticmethod
+    def validate(rows, importer, default_company=None):
+        """
+        Check every row and build unsaved User objects. `importer` may only
+        provision users of its own company unless it is a superuser.
+        Returns (users with their raw password, errors as (line, username, message)).
+        """
+        companies = {company.name.casefold(): company for company in Company.objects.all()}
+        companies.update({str(company.id): company for company in companies.values()})
+        usernames = [str(row.get('username') or '').strip() for _, row in rows]
+        taken = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        roles = dict(User.ROLE_CHOICES)
+        
+        users = []
+        errors = []
+        for line, row in rows:
+            row = {field: str(row.get(field) or '').strip() for field in USER_IMPORT_FIELDS}
+            username = row['username']
+            
+            company = companies.get(row['company'].casefold()) if row['company'] else default_company
+            role = row['role'].lower() or 'viewer'
+            try:
+                if not username:
+                    raise ValidationError('Username is required.')
+                if username in taken:
+                    raise ValidationError('Username already exists.')
+                if company is None:
+                    raise ValidationError(f'Unknown company "{row["company"]}".')
+                if not importer.is_superuser and company.id != importer.company_id:
+                    raise ValidationError('You can only add users to your own company.')
+                if role not in roles:
+                    raise ValidationError(f'Invalid role "{row["role"]}". Use one of: {", ".join(roles)}.')
+                if row['email']:
+                    validate_email(row['email'])
+                
+                user = User(
+                    username=username,
+                    email=row['email'],
+                    first_name=row['first_name'],
+                    last_name=row['last_name'],
+                    company=company,
+                    role=role,
+                    # Company admins and operators use the admin site
+                    is_staff=role in ('admin', 'operator'),
+                )
+                # The company came from the lookup above; checking it again costs a query per row
+                user.full_clean(exclude=['password', 'company'], validate_unique=False)
+                if row['password']:
+                    validate_password(row['password'], user)
+            except ValidationError as e:
+                errors.append((line, username, ' '.join(e.messages)))
+                continue
+            
+            taken.add(username)
+            users.append((line, user, row['password']))
+        
+        return users, errors
+    
+    @staticmethod
+    def hash_all(passwords, workers=1):
+        """Hash passwords in chunks, across `workers` processes when there is more than one chunk"""
+        chunks = [passwords[i:i + HASH_CHUNK_SIZE] for i in range(0, len(passwords), HASH_CHUNK_SIZE)]
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                results = list(pool.map(hash_passwords, chunks))
+        else:
+            results = [hash_passwords(chunk) for chunk in chunks]
+        return [hashed for chunk in results for hashed in chunk]
+    
+    @staticmethod
+    def import_users(rows, importer, workers=1, default_company=None, batch_size=500):
+        """
+        Provision users from parsed rows. Blank passwords get an unusable
+        password (the user resets it). Returns (created count, errors as
+        (line, username, message) sorted by line).
+        """
+        users, errors = UserImportService.validate(rows, importer, default_company)
+        
+        to_hash = [(user, password) for _, user, password in users if password]
+        hashed = UserImportService.hash_all([password for _, password in to_hash], workers)
+        for (user, _), password_hash in zip(to_hash, hashed):
+            user.password = password_hash
+        for _, user, password in users:
+            if not password:
+                user.password = make_password(None)
+        
+        created = 0
+        for start in range(0, len(users), batch_size):
+            batch = users[start:start + batch_size]
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create([user for _, user, _ in batch])
+                created += len(batch)
+            except IntegrityError:
+                # A concurrent signup took a username: insert one by one to find it
+                for line, user, _ in batch:
+                    try:
+                        with transaction.atomic():
+                            user.save()
+                        created += 1
+                    except IntegrityError:
+                        errors.append((line, user.username, 'Username already exists.'))
+        
+        errors.sort(key=lambda error: error[0])
+        return created, errors
+    
+    @staticmethod
+    def write_errors(stream, errors):
+        """Write rejected rows as CSV: line number, username, error"""
+        writer = csv.writer(stream)
+        writer.writerow(['Line', 'Username', 'Error'])
+        for error in errors:
+            writer.writerow(error)
+
+
+# ===== API Views =====
+
+class UserImportAPIView(generics.GenericAPIView):
+    """API: Provision users in bulk from a CSV upload (`file`) or a JSON list"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_superuser and request.user.role != 'admin':
+            return Response(
+                {'error': 'Only admins can add users'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            upload = request.FILES.get('file')
+            if upload is not None:
+                rows = UserImportService.read_rows(io.TextIOWrapper(upload, encoding='utf-8-sig', newline=''))
+            elif isinstance(request.data, list):
+                rows = [(index + 1, row) for index, row in enumerate(request.data) if isinstance(row, dict)]
+            else:
+                return Response({'error': 'Upload a CSV file or post a JSON list'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Hashing runs inside the request: refuse more than it can finish before the worker timeout
+            passwords = sum(1 for _, row in rows if str(row.get('password') or '').strip())
+            if passwords > settings.USER_IMPORT_MAX_PASSWORDS:
+                return Response({
+                    'error': f'{passwords} passwords to set, at most {settings.USER_IMPORT_MAX_PASSWORDS} per request. '
+                             f'Split the file or run "manage.py import_users".'
+                }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            
+            created, errors = UserImportService.import_users(
+                rows, request.user, workers=settings.USER_IMPORT_WORKERS,
+                default_company=request.user.company
+            )
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        errors = [{'line': line, 'username': username, 'error': message} for line, username, message in errors]
+        if errors and not created:
+            return Response({'success': False, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'success': True,
+            'count': created,
+            'errors': errors,
+            'message': f'{created} user(s) created, {len(errors)} row(s) rejected'
+        }, status=status.HTTP_201_CREATED)